@@ -0,0 +1,329 @@
+"""Batch report: statistics and charts for every question in a survey
+
+Reads a long-format survey file (one row per response), computes per-question
+statistics in one vectorized pass (see grouped_means), writes them to
+summary.csv and renders a chart set per question in a pool of worker processes.
+
+Each worker builds its figures once and, for every question, only updates the
+artists (bar heights, mean lines, labels) before saving, which avoids paying
+matplotlib's figure and axes setup cost per question.
+
+Supported inputs:
+    *.csv   columns `question` and `response` (names configurable)
+    *.npz   one array of responses per question, keyed by question name
+
+Example:
+    python batch_report.py survey.csv -o report --workers 8
+"""
+
+import argparse
+import csv
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+from geometric_mean_polling import summarize_responses
+from grouped_means import grouped_means
+
+REPORT_CHARTS = ('distribution_histogram.png', 'log_scale_transformation.png', 'outlier_sensitivity.png')
+SUMMARY_COLUMNS = (
+    'question',
+    'count',
+    'arithmetic_mean',
+    'geometric_mean',
+    'min',
+    'max',
+    'n_zero',
+    'n_negative',
+    'n_missing',
+    'n_outliers',
+    'outlier_fraction',
+)
+
+
+def load_survey(path, question_column='question', response_column='response'):
+    """Read every question's responses from a survey file
+
+    Args:
+        path: Long-format CSV or .npz file (see module docstring)
+        question_column: CSV column holding the question name
+        response_column: CSV column holding the response value
+
+    Returns:
+        Tuple of (questions, groups, responses): question names, the question
+        index of each response, and the responses as float64
+    """
+    path = Path(path)
+    if path.suffix.lower() == '.npz':
+        with np.load(path) as arrays:
+            questions = np.array(list(arrays.keys()))
+            columns = [arrays[name].reshape(-1).astype(np.float64) for name in questions]
+        groups = np.repeat(np.arange(len(columns)), [len(c) for c in columns])
+        return questions, groups, np.concatenate(columns) if columns else np.empty(0)
+
+    frame = pd.read_csv(path, usecols=[question_column, response_column])
+    questions, groups = np.unique(frame[question_column].astype(str).to_numpy(), return_inverse=True)
+    return questions, groups, frame[response_column].to_numpy(np.float64)
+
+
+def question_slug(question):
+    """File-system safe directory name for a question"""
+    return re.sub(r'[^\w.-]+', '_', str(question)).strip('_') or 'question'
+
+
+def question_slugs(questions):
+    """Distinct directory names for all questions; a slug already taken gets the lowest free numeric suffix"""
+    slugs, used = [], set()
+    for question in questions:
+        base = slug = question_slug(question)
+        suffix = 1
+        while slug in used:
+            slug = f'{base}_{suffix}'
+            suffix += 1
+        used.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def _set_histogram(bars, counts, edges):
+    """Reshape an existing bar container to new histogram counts and edges"""
+    for bar, count, left, right in zip(bars, counts, edges[:-1], edges[1:]):
+        bar.set_x(left)
+        bar.set_width(right - left)
+        bar.set_height(count)
+
+
+def _set_vline(line, x, label):
+    line.set_xdata([x, x])
+    line.set_label(label)
+
+
+class QuestionCharts:
+    """One reusable figure per report chart, updated in place for each question
+
+    The figures are plain matplotlib Figures: pyplot does not track them (so they
+    never pile up in the caller's session) and they always render with Agg.
+    """
+
+    def __init__(self, bins=30, dpi=150):
+        """
+        Args:
+            bins: Histogram bins (must match the summaries drawn)
+            dpi: Resolution of the saved PNGs
+        """
+        self.bins = bins
+        self.dpi = dpi
+
+        # Distribution histogram with true value and both means
+        self.dist_fig = Figure(figsize=(10, 6))
+        ax = self.dist_fig.subplots()
+        self.dist_ax = ax
+        self.dist_bars = ax.bar(np.zeros(bins), np.zeros(bins), 1.0, align='edge', alpha=0.7, edgecolor='black')
+        self.dist_true = ax.axvline(0, color='green', linestyle='--', linewidth=2)
+        self.dist_arith = ax.axvline(0, color='red', linestyle='--', linewidth=2)
+        self.dist_geo = ax.axvline(0, color='blue', linestyle='--', linewidth=2)
+        ax.set_xlabel('Poll Response', fontsize=12)
+        ax.set_ylabel('Frequency', fontsize=12)
+        ax.grid(True, alpha=0.3)
+
+        # Log-space histogram
+        self.log_fig = Figure(figsize=(10, 6))
+        ax = self.log_fig.subplots()
+        self.log_ax = ax
+        self.log_bars = ax.bar(
+            np.zeros(bins), np.zeros(bins), 1.0, align='edge', alpha=0.7, edgecolor='black', color='lightcoral'
+        )
+        self.log_mean = ax.axvline(
+            0, color='purple', linestyle='--', linewidth=2, label='Mean in Log Space = log(Geometric Mean)'
+        )
+        self.log_text = ax.text(
+            0.05,
+            0.95,
+            '',
+            transform=ax.transAxes,
+            fontsize=11,
+            verticalalignment='top',
+            bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5),
+        )
+        ax.set_xlabel('log(Response Value)', fontsize=12)
+        ax.set_ylabel('Frequency', fontsize=12)
+        ax.legend()
+        ax.grid(True, alpha=0.3)
+
+        # Means with and without the highest response
+        self.sens_fig = Figure(figsize=(10, 6))
+        ax = self.sens_fig.subplots()
+        self.sens_ax = ax
+        x = np.arange(2)
+        width = 0.35
+        self.sens_arith = ax.bar(x - width / 2, [0, 0], width, label='Arithmetic Mean', color='red', alpha=0.7)
+        self.sens_geo = ax.bar(x + width / 2, [0, 0], width, label='Geometric Mean', color='blue', alpha=0.7)
+        self.sens_true = ax.axhline(0, color='green', linestyle='--', linewidth=2, alpha=0.7)
+        self.sens_labels = [
+            ax.text(bar.get_x() + bar.get_width() / 2.0, 0, '', ha='center', va='bottom', fontsize=9)
+            for bar in [*self.sens_arith, *self.sens_geo]
+        ]
+        ax.set_xticks(x)
+        ax.set_xticklabels(['With Highest\nOutlier', 'Without Highest\nOutlier'])
+        ax.set_ylabel('Mean Value', fontsize=12)
+        ax.grid(True, alpha=0.3, axis='y')
+
+        # Reserve room for the per-question titles before fixing the layout
+        for ax in (self.dist_ax, self.log_ax, self.sens_ax):
+            ax.set_title('Title', fontsize=14, fontweight='bold')
+        for fig in (self.dist_fig, self.log_fig, self.sens_fig):
+            fig.tight_layout()
+
+    def draw(self, question, summary, output_dir):
+        """Update every figure for one question and save it
+
+        Args:
+            question: Question name, used in the titles
+            summary: PollSummary of the question's responses (true_value may be None)
+            output_dir: Directory to write the question's charts to
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        true_value = summary.true_value
+        has_truth = true_value is not None
+
+        ax = self.dist_ax
+        _set_histogram(self.dist_bars, summary.hist_counts, summary.hist_edges)
+        self.dist_true.set_visible(has_truth)
+        _set_vline(self.dist_true, true_value if has_truth else 0, f'True Value ({true_value})' if has_truth else '_')
+        _set_vline(self.dist_arith, summary.arithmetic_mean, f'Arithmetic Mean ({summary.arithmetic_mean:.2f})')
+        _set_vline(self.dist_geo, summary.geometric_mean, f'Geometric Mean ({summary.geometric_mean:.2f})')
+        ax.set_title(f'Distribution of Responses: {question}', fontsize=14, fontweight='bold')
+        ax.legend(handles=[h for h in (self.dist_true, self.dist_arith, self.dist_geo) if h.get_visible()])
+        ax.relim(visible_only=True)
+        ax.autoscale_view()
+        self.dist_fig.savefig(output_dir / REPORT_CHARTS[0], dpi=self.dpi)
+
+        ax = self.log_ax
+        _set_histogram(self.log_bars, summary.log_hist_counts, summary.log_hist_edges)
+        self.log_mean.set_xdata([summary.log_mean, summary.log_mean])
+        self.log_text.set_text(f'exp(mean(log(x))) = {summary.geometric_mean:.2f}\n= Geometric Mean')
+        ax.set_title(f'Log-Scale Transformation: {question}', fontsize=14, fontweight='bold')
+        ax.relim()
+        ax.autoscale_view()
+        self.log_fig.savefig(output_dir / REPORT_CHARTS[1], dpi=self.dpi)
+
+        ax = self.sens_ax
+        highest = np.argmax(summary.responses)
+        arith = [summary.arithmetic_mean, summary.loo_arithmetic_mean[highest]]
+        geo = [summary.geometric_mean, summary.loo_geometric_mean[highest]]
+        for bar, label, height in zip([*self.sens_arith, *self.sens_geo], self.sens_labels, arith + geo):
+            bar.set_height(height)
+            label.set_y(height)
+            label.set_text(f'{height:.2f}')
+        self.sens_true.set_visible(has_truth)
+        self.sens_true.set_ydata([true_value, true_value] if has_truth else [0, 0])
+        self.sens_true.set_label(f'True Value ({true_value})' if has_truth else '_')
+        ax.set_title(f'Sensitivity to Outliers: {question}', fontsize=14, fontweight='bold')
+        handles = [self.sens_arith, self.sens_geo] + ([self.sens_true] if has_truth else [])
+        ax.legend(handles=handles)
+        ax.relim(visible_only=True)
+        ax.autoscale_view()
+        self.sens_fig.savefig(output_dir / REPORT_CHARTS[2], dpi=self.dpi)
+
+
+# Chart set of a pool worker, built on the first task it receives
+_worker_charts = {}
+
+
+def _render_questions(task, charts=None):
+    """Render a chunk of questions, by default with this worker's reusable figures"""
+    questions, slugs, arrays, true_values, output_dir, bins, dpi = task
+    if charts is None:
+        charts = _worker_charts.get((bins, dpi))
+        if charts is None:
+            charts = _worker_charts[(bins, dpi)] = QuestionCharts(bins, dpi)
+    for question, slug, responses in zip(questions, slugs, arrays):
+        # The charts work in log space, so they show the positive responses only
+        responses = responses[responses > 0]
+        if len(responses) < 2:
+            continue
+        summary = summarize_responses(responses, true_values.get(question), bins)
+        charts.draw(question, summary, Path(output_dir) / slug)
+    return len(questions)
+
+
+def write_summary(path, questions, stats):
+    """Write per-question statistics from grouped_means as a CSV"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(SUMMARY_COLUMNS)
+        for i, question in enumerate(questions):
+            writer.writerow([question] + [stats[column][i] for column in SUMMARY_COLUMNS[1:]])
+
+
+def batch_report(questions, groups, responses, output_dir, true_values=None, workers=1, bins=30, dpi=150):
+    """Compute per-question statistics and render each question's charts
+
+    Args:
+        questions: Question names (see load_survey)
+        groups: Question index of each response
+        responses: Response values
+        output_dir: Report directory; gets summary.csv and one subdirectory per question
+        true_values: Optional mapping of question name to its true value
+        workers: Worker processes for rendering (1 = render in this process)
+        bins: Histogram bins per chart
+        dpi: Resolution of the saved PNGs
+
+    Returns:
+        The grouped_means statistics, indexed like `questions`
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    true_values = dict(true_values or {})
+    groups = np.asarray(groups)
+    responses = np.asarray(responses, dtype=np.float64)
+
+    stats = grouped_means(responses, groups, n_groups=len(questions))
+    write_summary(output_dir / 'summary.csv', questions, stats)
+
+    # One stable sort groups each question's responses contiguously
+    order = np.argsort(groups, kind='stable')
+    arrays = np.split(responses[order], np.cumsum(np.bincount(groups, minlength=len(questions)))[:-1])
+    questions = [str(q) for q in questions]
+    slugs = question_slugs(questions)
+
+    n_tasks = 1 if workers == 1 else 4 * workers
+    step = max(1, -(-len(questions) // n_tasks))
+    tasks = [
+        (questions[i : i + step], slugs[i : i + step], arrays[i : i + step], true_values, str(output_dir), bins, dpi)
+        for i in range(0, len(questions), step)
+    ]
+    if workers == 1:
+        # A chart set for this call only, so nothing outlives it in the caller's process
+        charts = QuestionCharts(bins, dpi)
+        for task in tasks:
+            _render_questions(task, charts)
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            list(pool.map(_render_questions, tasks))
+    return stats
+
+
+def main(argv=None):
+    """Build a report for every question in a survey file"""
+    parser = argparse.ArgumentParser(description="Geometric vs arithmetic mean report for every survey question.")
+    parser.add_argument('survey', type=Path, help="long-format CSV (question, response) or .npz of arrays")
+    parser.add_argument('-o', '--output-dir', type=Path, default=Path('report'), help="report directory")
+    parser.add_argument('--question-column', default='question', help="CSV column with the question name")
+    parser.add_argument('--response-column', default='response', help="CSV column with the response")
+    parser.add_argument('--workers', type=int, default=1, help="rendering processes (default: 1)")
+    parser.add_argument('--dpi', type=int, default=150, help="PNG resolution (default: 150)")
+    args = parser.parse_args(argv)
+
+    questions, groups, responses = load_survey(args.survey, args.question_column, args.response_column)
+    print(f"Loaded {len(responses):,} responses to {len(questions):,} questions")
+    batch_report(questions, groups, responses, args.output_dir, workers=args.workers, dpi=args.dpi)
+    print(f"Report written to '{args.output_dir}/' (summary.csv and one folder per question)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Bootstrap and jackknife uncertainty for the arithmetic and geometric means
+
+Replicates are computed in vectorized batches: each batch draws a
+(replicates x responses) resample as an index matrix (or as multinomial counts
+applied to the values and log-values with one matrix product), and the batch
+size is chosen so the batch fits in a memory budget. Each batch draws from its
+own spawned SeedSequence stream, as in poll_generator, so the result for a
+given seed does not depend on the number of workers.
+
+Example:
+    >>> result = bootstrap_means(responses, n_resamples=10_000, seed=0)
+    >>> result['geometric_mean']['ci_low'], result['geometric_mean']['ci_high']
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sensitivity import leave_one_out_means, log_responses
+
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024  # bytes of temporaries per batch
+BOOTSTRAP_METHODS = ('index', 'multinomial')
+
+# Per-worker copies of the responses, set once by the pool initializer
+_worker_data = {}
+
+
+def _set_worker_data(values, log_values):
+    _worker_data['values'] = values
+    _worker_data['log_values'] = log_values
+
+
+def _batch_size(n, method, memory_budget):
+    """Replicates per batch that keep the batch's temporaries within the budget"""
+    # index: int64 indices plus two float64 gathers; multinomial: int64 counts plus their float64 copy
+    bytes_per_replicate = (24 if method == 'index' else 16) * n
+    return max(1, memory_budget // bytes_per_replicate)
+
+
+def _bootstrap_batch(task):
+    """Arithmetic and log-space means of one batch of resamples"""
+    seed, size, method = task
+    values, log_values = _worker_data['values'], _worker_data['log_values']
+    n = len(values)
+    rng = np.random.default_rng(seed)
+    if method == 'index':
+        index = rng.integers(0, n, size=(size, n))
+        return values[index].mean(axis=1), log_values[index].mean(axis=1)
+    counts = rng.multinomial(n, np.full(n, 1.0 / n), size=size).astype(np.float64)
+    return counts @ values / n, counts @ log_values / n
+
+
+def _interval(replicates, estimate, confidence):
+    """Percentile interval and standard error of a set of replicates"""
+    alpha = 1 - confidence
+    low, high = np.nanquantile(replicates, [alpha / 2, 1 - alpha / 2])
+    return {'estimate': estimate, 'ci_low': low, 'ci_high': high, 'std_error': np.nanstd(replicates, ddof=1)}
+
+
+def bootstrap_means(
+    responses,
+    n_resamples=10_000,
+    confidence=0.95,
+    seed=None,
+    method='index',
+    memory_budget=DEFAULT_MEMORY_BUDGET,
+    workers=1,
+):
+    """Percentile bootstrap confidence intervals for both means
+
+    Args:
+        responses: Array of poll responses
+        n_resamples: Number of bootstrap replicates
+        confidence: Coverage of the intervals (e.g. 0.95)
+        seed: Seed (int or SeedSequence) for reproducible replicates
+        method: 'index' draws an index matrix per batch; 'multinomial' draws
+            resample counts and applies them with a matrix product, which
+            needs two thirds of the memory per replicate
+        memory_budget: Approximate bytes of temporaries allowed per batch
+        workers: Processes to spread batches over (1 = run in this process)
+
+    Returns:
+        Dictionary with 'arithmetic_mean' and 'geometric_mean' entries, each a
+        dict of 'estimate', 'ci_low', 'ci_high' and 'std_error', plus the raw
+        'replicates' as a (2, n_resamples) array (arithmetic, geometric)
+    """
+    if method not in BOOTSTRAP_METHODS:
+        raise ValueError(f"method must be one of {BOOTSTRAP_METHODS}, got {method!r}")
+    values = np.asarray(responses, dtype=np.float64).reshape(-1)
+    if len(values) == 0:
+        raise ValueError("Cannot bootstrap an empty set of responses")
+    log_values = log_responses(values)
+
+    batch = _batch_size(len(values), method, memory_budget)
+    sizes = [min(batch, n_resamples - start) for start in range(0, n_resamples, batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(s, size, method) for s, size in zip(seeds, sizes)]
+
+    if workers == 1 or len(tasks) == 1:
+        _set_worker_data(values, log_values)
+        try:
+            results = [_bootstrap_batch(task) for task in tasks]
+        finally:
+            _worker_data.clear()
+    else:
+        with ProcessPoolExecutor(workers, initializer=_set_worker_data, initargs=(values, log_values)) as pool:
+            results = list(pool.map(_bootstrap_batch, tasks))
+
+    arithmetic = np.concatenate([r[0] for r in results])
+    geometric = np.exp(np.concatenate([r[1] for r in results]))
+    return {
+        'arithmetic_mean': _interval(arithmetic, values.mean(), confidence),
+        'geometric_mean': _interval(geometric, np.exp(log_values.mean()), confidence),
+        'replicates': np.vstack([arithmetic, geometric]),
+    }
+
+
+def jackknife_means(responses):
+    """Jackknife standard errors of both means, from all n leave-one-out means in O(n)
+
+    Args:
+        responses: Array of at least two poll responses
+
+    Returns:
+        Dictionary with 'arithmetic_mean' and 'geometric_mean' entries, each a
+        dict of 'estimate', 'std_error' and 'bias' (the jackknife bias estimate)
+    """
+    values = np.asarray(responses, dtype=np.float64).reshape(-1)
+    n = len(values)
+    loo = leave_one_out_means(values)
+    estimates = {'arithmetic_mean': values.mean(), 'geometric_mean': np.exp(log_responses(values).mean())}
+
+    result = {}
+    for name, estimate in estimates.items():
+        means = loo[name]
+        result[name] = {
+            'estimate': estimate,
+            'std_error': np.sqrt((n - 1) / n * np.sum((means - means.mean()) ** 2)),
+            'bias': (n - 1) * (means.mean() - estimate),
+        }
+    return result
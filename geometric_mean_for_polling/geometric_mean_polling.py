@@ -1,110 +1,502 @@
 """Visualization showing geometric mean advantage for polling data"""
 
+import math
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import NamedTuple
 
 import matplotlib.pyplot as plt
 import numpy as np
+from poll_generator import generate_responses
+from sensitivity import (
+    default_k_max,
+    leave_one_out_from_totals,
+    leave_one_out_means,
+    remove_top_k_from_totals,
+    remove_top_k_means,
+)
 
 
-def generate_poll_responses(n_responses, true_value):
+def generate_poll_responses(n_responses, true_value, seed=42):
     """Generate synthetic poll responses with realistic distribution
 
+    Most responses are log-normal around the true value and a quarter are clear
+    outliers (see poll_generator.default_components). The global NumPy random
+    state is left untouched.
+
     Args:
         n_responses: Number of poll responses to generate
         true_value: The actual correct percentage (e.g., 1.0 for 1%)
+        seed: Seed for reproducibility (None for fresh entropy)
 
     Returns:
         Array of poll responses (percentages)
     """
-    np.random.seed(42)  # For reproducibility
+    return generate_responses(n_responses, true_value, seed=seed)
+
 
-    # Add some clear outliers (15-50%)
-    n_outliers = int(n_responses * 0.25)
+def _neumaier_add(total, compensation, value):
+    """Add value to a compensated (Kahan-Babuska/Neumaier) running sum
 
-    # Most responses centered around 2-3% with log-normal distribution
-    n_main = n_responses - n_outliers
-    main_responses = np.random.lognormal(mean=0.8, sigma=0.6, size=n_main)
+    Returns:
+        Tuple of (total, compensation); the exact sum is total + compensation
+    """
+    new_total = total + value
+    if abs(total) >= abs(value):
+        compensation += (total - new_total) + value
+    else:
+        compensation += (value - new_total) + total
+    return new_total, compensation
 
-    outliers = np.random.uniform(15, 99, size=n_outliers)
 
-    # Combine and shuffle
-    all_responses = np.concatenate([main_responses, outliers])
-    np.random.shuffle(all_responses)
+class GeometricMeanAccumulator:
+    """Running arithmetic and geometric mean of a stream of poll responses
 
-    return all_responses
+    Responses can be added one at a time or in chunks of any size; large chunks
+    (including memory-mapped arrays) are processed in blocks of `block_size`, so
+    memory use stays constant however many responses are seen. Each block is
+    summed pairwise by NumPy and the block totals are combined with compensated
+    summation, so the result does not drift over hundreds of millions of values.
+
+    Partial accumulators from different chunks, files or processes can be
+    combined with merge().
+
+    As with calculate_geometric_mean, any zero response makes the geometric mean
+    0 and any negative response makes it NaN. NaN responses are counted as
+    missing and otherwise ignored.
+    """
+
+    def __init__(self, block_size=1 << 20):
+        """
+        Args:
+            block_size: Maximum number of values to take logs of at once
+        """
+        self.block_size = block_size
+        self.count = 0  # non-missing responses
+        self.n_zero = 0
+        self.n_negative = 0
+        self.n_missing = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.min_positive = np.inf  # smallest response > 0, the low end of a log-space range
+        self._sum = (0.0, 0.0)  # (total, compensation)
+        self._log_sum = (0.0, 0.0)  # over positive responses only
+
+    def add(self, value):
+        """Add a single response
+
+        Returns:
+            self, so calls can be chained
+        """
+        value = float(value)
+        if math.isnan(value):
+            self.n_missing += 1
+            return self
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self._sum = _neumaier_add(*self._sum, value)
+        if value > 0:
+            self.min_positive = min(self.min_positive, value)
+            self._log_sum = _neumaier_add(*self._log_sum, math.log(value))
+        elif value == 0:
+            self.n_zero += 1
+        else:
+            self.n_negative += 1
+        return self
+
+    def update(self, values):
+        """Add a chunk of responses
+
+        Args:
+            values: Array-like of responses (any shape; flattened)
+
+        Returns:
+            self, so calls can be chained
+        """
+        values = np.asarray(values).reshape(-1)
+        for start in range(0, len(values), self.block_size):
+            # Convert per block so float32 or memory-mapped input is never copied whole
+            self._update_block(np.asarray(values[start : start + self.block_size], dtype=np.float64))
+        return self
+
+    def _update_block(self, block):
+        missing = np.isnan(block)
+        if missing.any():
+            self.n_missing += int(missing.sum())
+            block = block[~missing]
+        if len(block) == 0:
+            return
+        self.count += len(block)
+        self.min = min(self.min, float(block.min()))
+        self.max = max(self.max, float(block.max()))
+        self._sum = _neumaier_add(*self._sum, float(block.sum()))
+
+        if self.min > 0:
+            # Common case: no zeros or negatives anywhere, no masking needed
+            self.min_positive = self.min
+            self._log_sum = _neumaier_add(*self._log_sum, float(np.log(block).sum()))
+            return
+        positive = block > 0
+        self.n_zero += int(np.count_nonzero(block == 0))
+        self.n_negative += int(np.count_nonzero(block < 0))
+        if positive.any():
+            self.min_positive = min(self.min_positive, float(block[positive].min()))
+        self._log_sum = _neumaier_add(*self._log_sum, float(np.log(block[positive]).sum()))
+
+    def merge(self, other):
+        """Fold another accumulator's responses into this one
+
+        Args:
+            other: GeometricMeanAccumulator built from a different part of the data
+
+        Returns:
+            self, so calls can be chained
+        """
+        self.count += other.count
+        self.n_zero += other.n_zero
+        self.n_negative += other.n_negative
+        self.n_missing += other.n_missing
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.min_positive = min(self.min_positive, other.min_positive)
+        for name in ('_sum', '_log_sum'):
+            total, compensation = getattr(self, name)
+            other_total, other_compensation = getattr(other, name)
+            total, compensation = _neumaier_add(total, compensation, other_total)
+            setattr(self, name, (total, compensation + other_compensation))
+        return self
+
+    @property
+    def n_positive(self):
+        """Number of responses that contribute to the log sum"""
+        return self.count - self.n_zero - self.n_negative
+
+    @property
+    def total(self):
+        """Sum of all non-missing responses"""
+        return self._sum[0] + self._sum[1]
+
+    @property
+    def log_total(self):
+        """Sum of log(x) over the positive responses"""
+        return self._log_sum[0] + self._log_sum[1]
+
+    def arithmetic_mean(self):
+        """Arithmetic mean of the non-missing responses (NaN if there are none)"""
+        return self.total / self.count if self.count else np.nan
+
+    def geometric_mean(self, positive_only=False):
+        """Geometric mean exp(mean(log(x))) of the non-missing responses
+
+        Args:
+            positive_only: Ignore zero and negative responses instead of letting
+                them force the result to 0 or NaN
+
+        Returns:
+            Geometric mean (NaN if there are no usable responses)
+        """
+        if positive_only or (self.n_zero == 0 and self.n_negative == 0):
+            n = self.n_positive
+            return math.exp(self.log_total / n) if n else np.nan
+        return np.nan if self.n_negative else 0.0
 
 
 def calculate_geometric_mean(data):
     """Calculate geometric mean using exp(mean(log(x)))
 
+    The logs are taken block by block (see GeometricMeanAccumulator), so large
+    or memory-mapped arrays are never copied whole.
+
     Args:
         data: Array of positive numbers
 
     Returns:
         Geometric mean of the data
     """
-    return np.exp(np.mean(np.log(data)))
+    accumulator = GeometricMeanAccumulator().update(data)
+    if accumulator.n_missing:
+        return np.nan
+    return accumulator.geometric_mean()
 
 
-def create_visualizations(responses, true_value, output_dir='.'):
-    """Create visualizations showing geometric vs arithmetic mean
+class HistogramAccumulator:
+    """Fixed-bin histograms of a stream of poll responses, in linear and log space
+
+    Counts are kept for `bins` equal-width bins over [low, high] and over
+    [log_low, log_high], together with the `top_k` largest responses for the
+    outlier charts, so a summary of any number of responses is a few kilobytes.
+    Bins match np.histogram with the same range (the last bin includes its right
+    edge); responses outside a range are only counted in n_outside /
+    n_log_outside. NaN responses are skipped, and only positive responses enter
+    the log-space histogram.
+
+    Accumulators with the same edges can be combined with merge().
+    """
+
+    def __init__(self, low, high, log_low, log_high, bins=30, top_k=1000, block_size=1 << 20):
+        """
+        Args:
+            low, high: Range of the linear histogram
+            log_low, log_high: Range of the log-space histogram
+            bins: Number of bins in each histogram
+            top_k: Number of largest responses to keep
+            block_size: Maximum number of values to bin at once
+        """
+        self.edges = self._edges(low, high, bins)
+        self.log_edges = self._edges(log_low, log_high, bins)
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.log_counts = np.zeros(bins, dtype=np.int64)
+        self.n_outside = 0
+        self.n_log_outside = 0
+        self.top_k = top_k
+        self.top = np.empty(0)  # largest responses, descending
+        self.block_size = block_size
+
+    @staticmethod
+    def _edges(low, high, bins):
+        if low == high:
+            # Same widening np.histogram applies to an empty range
+            low, high = low - 0.5, high + 0.5
+        return np.linspace(low, high, bins + 1)
+
+    @classmethod
+    def for_totals(cls, totals, bins=30, **kwargs):
+        """Histograms spanning every response a first pass has seen
+
+        Args:
+            totals: GeometricMeanAccumulator over the same responses
+            bins: Number of bins in each histogram
+            **kwargs: Passed on to HistogramAccumulator
+
+        Returns:
+            Empty HistogramAccumulator whose ranges cover the responses
+        """
+        if totals.n_positive == 0:
+            raise ValueError("A log-space histogram needs at least one positive response")
+        log_low, log_high = math.log(totals.min_positive), math.log(totals.max)
+        return cls(totals.min, totals.max, log_low, log_high, bins, **kwargs)
+
+    def update(self, values):
+        """Bin a chunk of responses
+
+        Args:
+            values: Array-like of responses (any shape; flattened)
+
+        Returns:
+            self, so calls can be chained
+        """
+        values = np.asarray(values).reshape(-1)
+        for start in range(0, len(values), self.block_size):
+            self._update_block(np.asarray(values[start : start + self.block_size], dtype=np.float64))
+        return self
+
+    def _update_block(self, block):
+        block = block[~np.isnan(block)]
+        bins = len(self.counts)
+        counts = np.histogram(block, bins=bins, range=(self.edges[0], self.edges[-1]))[0]
+        self.counts += counts
+        self.n_outside += len(block) - int(counts.sum())
+
+        log_values = np.log(block[block > 0])
+        log_counts = np.histogram(log_values, bins=bins, range=(self.log_edges[0], self.log_edges[-1]))[0]
+        self.log_counts += log_counts
+        self.n_log_outside += len(log_values) - int(log_counts.sum())
+
+        if len(self.top) == self.top_k:
+            # Only responses above the current k-th largest can enter the top
+            block = block[block > self.top[-1]]
+        self._keep_top(block)
+
+    def _keep_top(self, values):
+        values = np.concatenate([self.top, values])
+        if len(values) > self.top_k:
+            values = np.partition(values, len(values) - self.top_k)[len(values) - self.top_k :]
+        self.top = np.sort(values)[::-1]
+
+    def merge(self, other):
+        """Fold another accumulator's counts into this one
+
+        Args:
+            other: HistogramAccumulator with the same edges, built from a different part of the data
+
+        Returns:
+            self, so calls can be chained
+        """
+        if not (np.array_equal(self.edges, other.edges) and np.array_equal(self.log_edges, other.log_edges)):
+            raise ValueError("Only histograms with the same edges can be merged")
+        self.counts += other.counts
+        self.log_counts += other.log_counts
+        self.n_outside += other.n_outside
+        self.n_log_outside += other.n_log_outside
+        self._keep_top(other.top)
+        return self
+
+
+class PollSummary(NamedTuple):
+    """Everything the charts need, computed once per set of responses"""
+
+    true_value: float
+    count: int
+    arithmetic_mean: float
+    geometric_mean: float
+    log_mean: float
+    hist_counts: np.ndarray
+    hist_edges: np.ndarray
+    log_hist_counts: np.ndarray
+    log_hist_edges: np.ndarray
+    top_k: dict  # see sensitivity.remove_top_k_means
+    responses: np.ndarray  # x-values of the leave-one-out influence chart (bin centres if pre-binned)
+    loo_arithmetic_mean: np.ndarray
+    loo_geometric_mean: np.ndarray
+
+
+def summarize_responses(responses, true_value, bins=30):
+    """Compute the statistics, histograms and sensitivity curves for all charts in one pass
 
     Args:
         responses: Array of poll responses
         true_value: The actual correct value
-        output_dir: Directory to save visualization files
+        bins: Number of histogram bins (linear and log space)
+
+    Returns:
+        PollSummary shared by every chart
     """
-    output_path = Path(output_dir)
-    output_path.mkdir(parents=True, exist_ok=True)
+    responses = np.asarray(responses, dtype=np.float64)
+    log_values = np.log(responses)
+    log_mean = np.mean(log_values)
+    hist_counts, hist_edges = np.histogram(responses, bins=bins)
+    log_hist_counts, log_hist_edges = np.histogram(log_values, bins=bins)
+    if len(responses) >= 2:
+        loo = leave_one_out_means(responses)
+    else:
+        # Nothing is left once the only response is dropped
+        loo = {'arithmetic_mean': np.full(len(responses), np.nan), 'geometric_mean': np.full(len(responses), np.nan)}
+    return PollSummary(
+        true_value=true_value,
+        count=len(responses),
+        arithmetic_mean=np.mean(responses),
+        geometric_mean=np.exp(log_mean),
+        log_mean=log_mean,
+        hist_counts=hist_counts,
+        hist_edges=hist_edges,
+        log_hist_counts=log_hist_counts,
+        log_hist_edges=log_hist_edges,
+        top_k=remove_top_k_means(responses),
+        responses=responses,
+        loo_arithmetic_mean=loo['arithmetic_mean'],
+        loo_geometric_mean=loo['geometric_mean'],
+    )
 
-    # Calculate statistics
-    arithmetic_mean = np.mean(responses)
-    geometric_mean = calculate_geometric_mean(responses)
 
-    # 1. Distribution histogram
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ax.hist(responses, bins=30, alpha=0.7, edgecolor='black')
-    ax.axvline(true_value, color='green', linestyle='--', linewidth=2, label=f'True Value ({true_value}%)')
-    ax.axvline(
-        arithmetic_mean, color='red', linestyle='--', linewidth=2, label=f'Arithmetic Mean ({arithmetic_mean:.2f}%)'
+def summarize_histogram(totals, histogram, true_value):
+    """Build the chart summary from streamed totals and histograms instead of raw responses
+
+    The leave-one-out influence chart gets one point per occupied log-space bin
+    (at the bin centre) and the top-k curve stops at the responses the histogram
+    kept, so the summary stays small however many responses were streamed.
+
+    Args:
+        totals: GeometricMeanAccumulator over the responses
+        histogram: HistogramAccumulator over the same responses
+        true_value: The actual correct value
+
+    Returns:
+        PollSummary shared by every chart
+    """
+    count = totals.count
+    log_mean = totals.log_total / totals.n_positive
+    centres = np.exp((histogram.log_edges[:-1] + histogram.log_edges[1:]) / 2)[histogram.log_counts > 0]
+    loo = leave_one_out_from_totals(centres, count, totals.total, totals.log_total)
+    k_max = min(len(histogram.top), default_k_max(count))
+    return PollSummary(
+        true_value=true_value,
+        count=count,
+        arithmetic_mean=totals.arithmetic_mean(),
+        geometric_mean=totals.geometric_mean(),
+        log_mean=log_mean,
+        hist_counts=histogram.counts.copy(),
+        hist_edges=histogram.edges.copy(),
+        log_hist_counts=histogram.log_counts.copy(),
+        log_hist_edges=histogram.log_edges.copy(),
+        top_k=remove_top_k_from_totals(histogram.top[:k_max], count, totals.total, totals.log_total),
+        responses=centres,
+        loo_arithmetic_mean=loo['arithmetic_mean'],
+        loo_geometric_mean=loo['geometric_mean'],
     )
-    # ax.axvline(
-    #     geometric_mean, color='blue', linestyle='--', linewidth=2, label=f'Geometric Mean ({geometric_mean:.2f}%)'
-    # )
-    ax.set_xlabel('Poll Response (% of budget)', fontsize=12)
-    ax.set_ylabel('Frequency', fontsize=12)
-    ax.set_title('Simulated Distribution of Poll Responses: Foreign Aid % of US Budget', fontsize=14, fontweight='bold')
-    ax.legend()
-    ax.grid(True, alpha=0.3)
-    plt.tight_layout()
-    plt.savefig(output_path / 'distribution_histogram.png', dpi=150)
-    plt.close()
 
-    # 2. Histogram with geometric mean
+
+def summarize_chunks(chunks, true_value, bins=30, top_k=1000):
+    """Summarize responses that do not fit in memory, in two streaming passes
+
+    The first pass finds the totals and ranges, the second bins the responses
+    (see HistogramAccumulator), so memory use does not grow with the number of
+    responses.
+
+    Args:
+        chunks: Re-iterable of response arrays, e.g. a list of memory-mapped files
+        true_value: The actual correct value
+        bins: Number of histogram bins (linear and log space)
+        top_k: Number of largest responses kept for the outlier charts
+
+    Returns:
+        PollSummary shared by every chart
+    """
+    totals = GeometricMeanAccumulator()
+    for chunk in chunks:
+        totals.update(chunk)
+    histogram = HistogramAccumulator.for_totals(totals, bins, top_k=top_k)
+    for chunk in chunks:
+        histogram.update(chunk)
+    return summarize_histogram(totals, histogram, true_value)
+
+
+def _draw_histogram(ax, counts, edges, **kwargs):
+    """Draw precomputed histogram counts, styled like ax.hist"""
+    ax.hist(edges[:-1], bins=edges, weights=counts, alpha=0.7, edgecolor='black', **kwargs)
+
+
+def plot_distribution_histogram(summary, output_file, show_geometric_mean=False):
+    """Histogram of responses with the true value and the mean(s)
+
+    Args:
+        summary: PollSummary from summarize_responses
+        output_file: Path of the PNG to write
+        show_geometric_mean: Also mark the geometric mean
+    """
+    true_value, arithmetic_mean, geometric_mean = summary.true_value, summary.arithmetic_mean, summary.geometric_mean
+
     fig, ax = plt.subplots(figsize=(10, 6))
-    ax.hist(responses, bins=30, alpha=0.7, edgecolor='black')
+    _draw_histogram(ax, summary.hist_counts, summary.hist_edges)
     ax.axvline(true_value, color='green', linestyle='--', linewidth=2, label=f'True Value ({true_value}%)')
     ax.axvline(
         arithmetic_mean, color='red', linestyle='--', linewidth=2, label=f'Arithmetic Mean ({arithmetic_mean:.2f}%)'
     )
-    ax.axvline(
-        geometric_mean, color='blue', linestyle='--', linewidth=2, label=f'Geometric Mean ({geometric_mean:.2f}%)'
-    )
+    if show_geometric_mean:
+        ax.axvline(
+            geometric_mean, color='blue', linestyle='--', linewidth=2, label=f'Geometric Mean ({geometric_mean:.2f}%)'
+        )
     ax.set_xlabel('Poll Response (% of budget)', fontsize=12)
     ax.set_ylabel('Frequency', fontsize=12)
     ax.set_title('Simulated Distribution of Poll Responses: Foreign Aid % of US Budget', fontsize=14, fontweight='bold')
     ax.legend()
     ax.grid(True, alpha=0.3)
     plt.tight_layout()
-    plt.savefig(output_path / 'distribution_histogram_geometric_mean.png', dpi=150)
-    plt.close()
+    plt.savefig(output_file, dpi=150)
+    plt.close(fig)
+
 
-    # 3. Log-scale transformation
-    log_responses = np.log(responses)
-    log_mean = np.mean(log_responses)  # This is mean(log(x))
+def plot_log_scale_transformation(summary, output_file):
+    """Histogram of log(responses) showing that the geometric mean is exp(mean(log(x)))
+
+    Args:
+        summary: PollSummary from summarize_responses
+        output_file: Path of the PNG to write
+    """
+    log_mean = summary.log_mean  # This is mean(log(x))
 
     fig, ax = plt.subplots(figsize=(10, 6))
-    ax.hist(log_responses, bins=30, alpha=0.7, edgecolor='black', color='lightcoral')
+    _draw_histogram(ax, summary.log_hist_counts, summary.log_hist_edges, color='lightcoral')
     ax.axvline(log_mean, color='purple', linestyle='--', linewidth=2, label=f'Mean in Log Space = log(Geometric Mean)')
     ax.set_xlabel('log(Response Value)', fontsize=12)
     ax.set_ylabel('Frequency', fontsize=12)
@@ -121,18 +513,24 @@ def create_visualizations(responses, true_value, output_dir='.'):
         bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5),
     )
     plt.tight_layout()
-    plt.savefig(output_path / 'log_scale_transformation.png', dpi=150)
-    plt.close()
+    plt.savefig(output_file, dpi=150)
+    plt.close(fig)
 
-    # 4. Outlier sensitivity analysis
-    # Remove the largest value and recalculate
-    sorted_responses = np.sort(responses)
-    responses_no_outlier = sorted_responses[:-1]
 
-    arith_mean_with = arithmetic_mean
-    geo_mean_with = geometric_mean
-    arith_mean_without = np.mean(responses_no_outlier)
-    geo_mean_without = calculate_geometric_mean(responses_no_outlier)
+def plot_outlier_sensitivity(summary, output_file):
+    """Bar chart of both means with and without the single largest response
+
+    Args:
+        summary: PollSummary from summarize_responses
+        output_file: Path of the PNG to write
+    """
+    true_value = summary.true_value
+    arith_mean_with = summary.arithmetic_mean
+    geo_mean_with = summary.geometric_mean
+    # A single response has no "without" point; NaN leaves those bars empty
+    removed_one = len(summary.top_k['k']) > 1
+    arith_mean_without = summary.top_k['arithmetic_mean'][1] if removed_one else np.nan
+    geo_mean_without = summary.top_k['geometric_mean'][1] if removed_one else np.nan
 
     fig, ax = plt.subplots(figsize=(10, 6))
 
@@ -174,5 +572,136 @@ def create_visualizations(responses, true_value, output_dir='.'):
     )
 
     plt.tight_layout()
-    plt.savefig(output_path / 'outlier_sensitivity.png', dpi=150)
-    plt.close()
+    plt.savefig(output_file, dpi=150)
+    plt.close(fig)
+
+
+def plot_outlier_influence(summary, output_file):
+    """Chart how much each response, and the k largest together, move each mean
+
+    Args:
+        summary: PollSummary from summarize_responses
+        output_file: Path of the PNG to write
+    """
+    top_k = summary.top_k
+
+    fig, (ax_loo, ax_top) = plt.subplots(1, 2, figsize=(16, 6))
+
+    # Left: shift in each mean when that single response is dropped
+    ax_loo.scatter(
+        summary.responses,
+        summary.arithmetic_mean - summary.loo_arithmetic_mean,
+        s=12,
+        color='red',
+        alpha=0.6,
+        label='Arithmetic Mean',
+    )
+    ax_loo.scatter(
+        summary.responses,
+        summary.geometric_mean - summary.loo_geometric_mean,
+        s=12,
+        color='blue',
+        alpha=0.6,
+        label='Geometric Mean',
+    )
+    ax_loo.axhline(0, color='black', linewidth=0.8)
+    if np.isfinite(summary.loo_arithmetic_mean).any():
+        # A single response has no leave-one-out points, and an empty axis cannot be log-scaled
+        ax_loo.set_xscale('log')
+    ax_loo.set_xlabel('Poll Response (% of budget, log scale)', fontsize=12)
+    ax_loo.set_ylabel('Influence on Mean (percentage points)', fontsize=12)
+    ax_loo.set_title('Leave-One-Out Influence of Each Response', fontsize=14, fontweight='bold')
+    ax_loo.legend()
+    ax_loo.grid(True, alpha=0.3)
+
+    # Right: each mean as the largest responses are removed one by one
+    true_value = summary.true_value
+    ax_top.plot(top_k['k'], top_k['arithmetic_mean'], color='red', linewidth=2, label='Arithmetic Mean')
+    ax_top.plot(top_k['k'], top_k['geometric_mean'], color='blue', linewidth=2, label='Geometric Mean')
+    ax_top.axhline(true_value, color='green', linestyle='--', linewidth=2, label=f'True Value ({true_value}%)')
+    ax_top.set_xlabel('Number of Largest Responses Removed', fontsize=12)
+    ax_top.set_ylabel('Mean Value (%)', fontsize=12)
+    ax_top.set_title('Removing the Top-k Responses', fontsize=14, fontweight='bold')
+    ax_top.legend()
+    ax_top.grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    plt.savefig(output_file, dpi=150)
+    plt.close(fig)
+
+
+# Output file name -> (chart function, extra keyword arguments)
+CHARTS = {
+    'distribution_histogram.png': (plot_distribution_histogram, {}),
+    'distribution_histogram_geometric_mean.png': (plot_distribution_histogram, {'show_geometric_mean': True}),
+    'log_scale_transformation.png': (plot_log_scale_transformation, {}),
+    'outlier_sensitivity.png': (plot_outlier_sensitivity, {}),
+    'outlier_influence.png': (plot_outlier_influence, {}),
+}
+
+# Summary for pool workers, set once per worker by the initializer
+_render_state = {}
+
+
+def use_agg_backend():
+    """Draw with the non-interactive Agg backend in this process (for pool workers, which only write files)"""
+    plt.switch_backend('Agg')
+
+
+def _set_render_summary(summary):
+    _render_state['summary'] = summary
+
+
+def _init_render_worker(summary):
+    use_agg_backend()
+    _set_render_summary(summary)
+
+
+def _render_chart(task):
+    """Draw one chart from the worker's shared summary"""
+    filename, output_path = task
+    plot, kwargs = CHARTS[filename]
+    plot(_render_state['summary'], Path(output_path) / filename, **kwargs)
+    return filename
+
+
+def render_charts(summary, output_dir='.', workers=1):
+    """Draw every chart in CHARTS from a precomputed summary
+
+    Args:
+        summary: PollSummary from summarize_responses
+        output_dir: Directory to save visualization files
+        workers: Processes to draw the charts in (1 = draw in this process)
+
+    Returns:
+        List of the files written
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    tasks = [(filename, str(output_path)) for filename in CHARTS]
+
+    if workers == 1:
+        _set_render_summary(summary)
+        try:
+            filenames = [_render_chart(task) for task in tasks]
+        finally:
+            _render_state.clear()
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_render_worker, initargs=(summary,)) as pool:
+            filenames = list(pool.map(_render_chart, tasks))
+    return [output_path / filename for filename in filenames]
+
+
+def create_visualizations(responses, true_value, output_dir='.', workers=1):
+    """Create visualizations showing geometric vs arithmetic mean
+
+    Statistics, histogram bins and sensitivity curves are computed once and
+    shared by every chart; with workers > 1 the charts are drawn in parallel.
+
+    Args:
+        responses: Array of poll responses
+        true_value: The actual correct value
+        output_dir: Directory to save visualization files
+        workers: Processes to draw the charts in (1 = draw in this process)
+    """
+    render_charts(summarize_responses(responses, true_value), output_dir, workers)
@@ -0,0 +1,115 @@
+"""Arithmetic and geometric means per group (question, crosstab cell, ...) in one pass
+
+Responses come with integer group keys; every statistic is a segment reduction
+over those keys (np.bincount, np.minimum.at / np.maximum.at), so the cost is
+linear in the number of responses and independent of the number of groups.
+
+Example:
+    >>> group, cells = combine_keys(question_ids, age_band_ids)
+    >>> stats = grouped_means(responses, group, n_groups=len(cells))
+    >>> stats['geometric_mean'][i]  # geometric mean for question cells[i, 0], age band cells[i, 1]
+"""
+
+import numpy as np
+
+DEFAULT_OUTLIER_THRESHOLD = 15.0  # responses above this (in %) count as outliers
+
+
+def combine_keys(*keys):
+    """Turn one or more parallel integer key arrays into a single dense group id
+
+    Args:
+        *keys: Integer arrays of equal length, e.g. question id and demographic id
+
+    Returns:
+        Tuple of (group, cells): `group` is each response's group id in
+        range(len(cells)); `cells` has one row per group holding its key values
+    """
+    keys = [np.asarray(k, dtype=np.int64).reshape(-1) for k in keys]
+    lows = [int(k.min()) if len(k) else 0 for k in keys]
+    dims = [int(k.max()) - low + 1 if len(k) else 1 for k, low in zip(keys, lows)]
+    if np.prod(dims, dtype=float) >= 2**63:
+        # Key space too large to pack into one integer; fall back to a row-wise unique
+        cells, group = np.unique(np.column_stack(keys), axis=0, return_inverse=True)
+        return group.reshape(-1), cells
+
+    # Pack the keys into one integer per response
+    packed = np.ravel_multi_index([k - low for k, low in zip(keys, lows)], dims)
+    n_cells = int(np.prod(dims))
+    if n_cells <= 4 * len(packed) + 1024:
+        # Dense key space: number the occupied cells with a counting pass instead of a sort
+        occupied = np.bincount(packed, minlength=n_cells) > 0
+        uniques = np.flatnonzero(occupied)
+        group = (np.cumsum(occupied) - 1)[packed]
+    else:
+        uniques, group = np.unique(packed, return_inverse=True)
+    cells = np.column_stack(np.unravel_index(uniques, dims)) + np.array(lows)
+    return group.reshape(-1), cells
+
+
+def grouped_means(responses, groups, n_groups=None, outlier_threshold=DEFAULT_OUTLIER_THRESHOLD):
+    """Per-group statistics of poll responses, without a Python loop over groups
+
+    Zero, negative and missing (NaN) responses are handled like
+    GeometricMeanAccumulator: a zero makes the group's geometric mean 0, a
+    negative makes it NaN, and NaNs are skipped. Groups without responses get NaN
+    means.
+
+    Args:
+        responses: Array of poll responses
+        groups: Integer group id of each response, in range(n_groups)
+        n_groups: Number of groups (default: max(groups) + 1)
+        outlier_threshold: Responses above this count towards n_outliers
+
+    Returns:
+        Dictionary of length-n_groups arrays: 'count', 'arithmetic_mean',
+        'geometric_mean', 'min', 'max', 'n_zero', 'n_negative', 'n_missing',
+        'n_outliers' and 'outlier_fraction'
+    """
+    responses = np.asarray(responses, dtype=np.float64).reshape(-1)
+    groups = np.asarray(groups, dtype=np.int64).reshape(-1)
+    if n_groups is None:
+        n_groups = int(groups.max()) + 1 if len(groups) else 0
+
+    missing = np.isnan(responses)
+    n_missing = np.bincount(groups[missing], minlength=n_groups)
+    if missing.any():
+        responses, groups = responses[~missing], groups[~missing]
+
+    count = np.bincount(groups, minlength=n_groups)
+    total = np.bincount(groups, weights=responses, minlength=n_groups)
+
+    positive = responses > 0
+    # log(1) = 0 keeps non-positive responses out of the log sum without a second mask pass
+    log_total = np.bincount(groups, weights=np.log(np.where(positive, responses, 1.0)), minlength=n_groups)
+    n_zero = np.bincount(groups, weights=responses == 0, minlength=n_groups).astype(np.int64)
+    n_negative = np.bincount(groups, weights=responses < 0, minlength=n_groups).astype(np.int64)
+    n_outliers = np.bincount(groups, weights=responses > outlier_threshold, minlength=n_groups).astype(np.int64)
+
+    minimum = np.full(n_groups, np.inf)
+    np.minimum.at(minimum, groups, responses)
+    maximum = np.full(n_groups, -np.inf)
+    np.maximum.at(maximum, groups, responses)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        arithmetic_mean = total / count
+        geometric_mean = np.exp(log_total / count)
+        outlier_fraction = n_outliers / count
+    geometric_mean[n_zero > 0] = 0.0
+    geometric_mean[n_negative > 0] = np.nan
+    empty = count == 0
+    minimum[empty] = np.nan
+    maximum[empty] = np.nan
+
+    return {
+        'count': count,
+        'arithmetic_mean': arithmetic_mean,
+        'geometric_mean': geometric_mean,
+        'min': minimum,
+        'max': maximum,
+        'n_zero': n_zero,
+        'n_negative': n_negative,
+        'n_missing': n_missing,
+        'n_outliers': n_outliers,
+        'outlier_fraction': outlier_fraction,
+    }
@@ -60,6 +60,7 @@ def main():
     print(f"  2. {output_dir}/linear_scale_comparison.png")
     print(f"  3. {output_dir}/log_scale_transformation.png")
     print(f"  4. {output_dir}/outlier_sensitivity.png")
+    print(f"  5. {output_dir}/outlier_influence.png")
     print("\nDone!")
 
 
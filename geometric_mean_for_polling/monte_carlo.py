@@ -0,0 +1,204 @@
+"""Monte Carlo comparison of mean estimators across outlier fraction, spread and poll size
+
+Every grid cell (outlier fraction x log-normal sigma x sample size) simulates
+many polls. A poll has a log-normal bulk whose median is the true value, plus
+an exact share of uniform outliers (15-99%, like poll_generator's default
+components). Polls are generated as 2-D batches (replicates x responses), with
+the batch size chosen to fit a memory budget. Each estimator is computed
+row-wise in one vectorized pass per batch: the arithmetic, geometric and median
+means, and a symmetric trimmed mean. Only the running error sums are kept.
+
+Each grid cell draws from its own spawned SeedSequence stream, as in
+poll_generator, so the tables for a given seed and memory budget do not depend
+on the number of workers.
+
+Example:
+    python monte_carlo.py --fractions 0 0.05 0.25 --sigmas 0.3 0.6 1.0 --sizes 50 200 1000 --workers 8
+"""
+
+import argparse
+import csv
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from bootstrap import DEFAULT_MEMORY_BUDGET
+from poll_generator import OUTLIER_RANGE
+
+ESTIMATORS = ('arithmetic', 'geometric', 'median', 'trimmed')
+
+
+def estimate_batch(polls, trim=0.1):
+    """Every estimator for each row of a (replicates x responses) batch
+
+    Args:
+        polls: 2-D array of positive responses, one poll per row; partially
+            reordered in place
+        trim: Fraction trimmed from each end for the trimmed mean
+
+    Returns:
+        Dictionary of length-replicates arrays, one per name in ESTIMATORS
+    """
+    n = polls.shape[1]
+    arithmetic = polls.mean(axis=1)
+    geometric = np.exp(np.log(polls).mean(axis=1))
+
+    # One multi-pivot partition places the median and both trim points
+    cut = int(trim * n)
+    low, high = (n - 1) // 2, n // 2
+    polls.partition(sorted({cut, low, high, n - cut - 1}), axis=1)
+    return {
+        'arithmetic': arithmetic,
+        'geometric': geometric,
+        'median': (polls[:, low] + polls[:, high]) / 2,
+        'trimmed': polls[:, cut : n - cut].mean(axis=1),
+    }
+
+
+def _simulate_cell(task):
+    """Bias and RMSE of every estimator for one grid cell"""
+    outlier_fraction, sigma, n, n_replicates, true_value, trim, stream, memory_budget = task
+    rng = np.random.default_rng(stream)
+    n_outliers = int(round(outlier_fraction * n))
+    # values, log-values and the partition's working copy
+    batch = max(1, memory_budget // (24 * n))
+
+    error_sum = dict.fromkeys(ESTIMATORS, 0.0)
+    squared_sum = dict.fromkeys(ESTIMATORS, 0.0)
+    for start in range(0, n_replicates, batch):
+        size = min(batch, n_replicates - start)
+        polls = rng.lognormal(np.log(true_value), sigma, size=(size, n))
+        # Estimators ignore order, so the outliers can simply fill the first columns
+        polls[:, :n_outliers] = rng.uniform(*OUTLIER_RANGE, size=(size, n_outliers))
+        for name, estimates in estimate_batch(polls, trim).items():
+            errors = estimates - true_value
+            error_sum[name] += errors.sum()
+            squared_sum[name] += (errors**2).sum()
+
+    bias = {name: error_sum[name] / n_replicates for name in ESTIMATORS}
+    rmse = {name: np.sqrt(squared_sum[name] / n_replicates) for name in ESTIMATORS}
+    return bias, rmse
+
+
+def simulate_grid(
+    outlier_fractions,
+    sigmas,
+    sample_sizes,
+    n_replicates=1_000,
+    true_value=1.0,
+    trim=0.1,
+    seed=None,
+    memory_budget=DEFAULT_MEMORY_BUDGET,
+    workers=1,
+):
+    """Bias and RMSE of every estimator over a parameter grid
+
+    Args:
+        outlier_fractions: Shares of uniform outliers per poll
+        sigmas: Log-normal sigmas of the non-outlier responses
+        sample_sizes: Responses per poll
+        n_replicates: Simulated polls per grid cell
+        true_value: The actual correct percentage (median of the non-outliers)
+        trim: Fraction trimmed from each end for the trimmed mean
+        seed: Seed (int or SeedSequence) for reproducible tables
+        memory_budget: Approximate bytes of temporaries allowed per batch
+        workers: Processes to spread grid cells over (1 = run in this process)
+
+    Returns:
+        Dictionary with length-n_cells arrays 'outlier_fraction', 'sigma' and
+        'n' describing the cells, and 'bias' and 'rmse' dicts holding one
+        length-n_cells array per name in ESTIMATORS
+    """
+    cells = list(itertools.product(outlier_fractions, sigmas, sample_sizes))
+    streams = np.random.SeedSequence(seed).spawn(len(cells))
+    tasks = [
+        (fraction, sigma, int(n), n_replicates, true_value, trim, stream, memory_budget)
+        for (fraction, sigma, n), stream in zip(cells, streams)
+    ]
+    if workers == 1 or len(tasks) <= 1:
+        results = [_simulate_cell(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(_simulate_cell, tasks))
+
+    return {
+        'outlier_fraction': np.array([cell[0] for cell in cells], dtype=np.float64),
+        'sigma': np.array([cell[1] for cell in cells], dtype=np.float64),
+        'n': np.array([cell[2] for cell in cells], dtype=np.int64),
+        'bias': {name: np.array([r[0][name] for r in results]) for name in ESTIMATORS},
+        'rmse': {name: np.array([r[1][name] for r in results]) for name in ESTIMATORS},
+    }
+
+
+def format_table(result, metric='rmse'):
+    """Render one metric of simulate_grid's result as a fixed-width text table
+
+    Args:
+        result: Dictionary from simulate_grid
+        metric: 'bias' or 'rmse'
+
+    Returns:
+        Table with one row per grid cell and one column per estimator
+    """
+    header = f"{'outliers':>8} {'sigma':>6} {'n':>7} " + ' '.join(f'{name:>11}' for name in ESTIMATORS)
+    lines = [header, '-' * len(header)]
+    for i in range(len(result['n'])):
+        values = ' '.join(f"{result[metric][name][i]:>11.4f}" for name in ESTIMATORS)
+        lines.append(f"{result['outlier_fraction'][i]:>8.3f} {result['sigma'][i]:>6.2f} {result['n'][i]:>7} {values}")
+    return '\n'.join(lines)
+
+
+def write_csv(path, result):
+    """Write simulate_grid's result as one row per grid cell and estimator"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['outlier_fraction', 'sigma', 'n', 'estimator', 'bias', 'rmse'])
+        for i in range(len(result['n'])):
+            for name in ESTIMATORS:
+                writer.writerow(
+                    [
+                        result['outlier_fraction'][i],
+                        result['sigma'][i],
+                        result['n'][i],
+                        name,
+                        result['bias'][name][i],
+                        result['rmse'][name][i],
+                    ]
+                )
+
+
+def main(argv=None):
+    """Run a simulation grid and print the bias and RMSE tables"""
+    parser = argparse.ArgumentParser(description="Monte Carlo bias/RMSE of mean estimators for outlier-prone polls.")
+    parser.add_argument('--fractions', type=float, nargs='+', default=[0.0, 0.05, 0.1, 0.25], help="outlier shares")
+    parser.add_argument('--sigmas', type=float, nargs='+', default=[0.3, 0.6, 1.0], help="log-normal sigmas")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 200, 1000], help="responses per poll")
+    parser.add_argument('--replicates', type=int, default=1_000, help="polls per grid cell (default: 1000)")
+    parser.add_argument('--true-value', type=float, default=1.0, help="true percentage (default: 1.0)")
+    parser.add_argument('--trim', type=float, default=0.1, help="trimmed mean cut per side (default: 0.1)")
+    parser.add_argument('--seed', type=int, help="seed for reproducible tables")
+    parser.add_argument('--workers', type=int, default=1, help="processes (default: 1)")
+    parser.add_argument('--memory-mb', type=int, default=DEFAULT_MEMORY_BUDGET >> 20, help="batch budget in MiB")
+    parser.add_argument('--csv', type=Path, help="also write the results to this CSV file")
+    args = parser.parse_args(argv)
+
+    result = simulate_grid(
+        args.fractions,
+        args.sigmas,
+        args.sizes,
+        args.replicates,
+        args.true_value,
+        args.trim,
+        args.seed,
+        args.memory_mb << 20,
+        args.workers,
+    )
+    print(f"Bias (true value {args.true_value}%)\n{format_table(result, 'bias')}\n")
+    print(f"RMSE (true value {args.true_value}%)\n{format_table(result, 'rmse')}")
+    if args.csv:
+        write_csv(args.csv, result)
+
+
+if __name__ == '__main__':
+    main()
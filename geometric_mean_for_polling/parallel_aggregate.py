@@ -0,0 +1,162 @@
+"""Aggregate poll responses from many large files across all cores
+
+Every input file is split into chunks of roughly `chunk_bytes`. Worker processes
+memory-map (binary) or seek into (CSV) their chunk, reduce it to a mergeable
+GeometricMeanAccumulator, and the partials are merged in the parent. Only the
+chunk coordinates and the small partials cross process boundaries, so the work
+scales with the number of cores rather than with pickling cost.
+
+Supported inputs:
+    *.npy         NumPy arrays (memory-mapped)
+    *.csv         one numeric column, selected by name or index (no quoted delimiters)
+    anything else raw binary of the given dtype, e.g. float64 or float32 (memory-mapped)
+
+Example:
+    python parallel_aggregate.py responses_*.f32 --dtype float32 --workers 8
+"""
+
+import argparse
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from geometric_mean_polling import GeometricMeanAccumulator
+
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+
+
+def _csv_column_index(path, column):
+    """Resolve a CSV column name (or index) against the file's header"""
+    if isinstance(column, int):
+        return column
+    with open(path, 'rb') as f:
+        header = f.readline().decode().rstrip('\r\n').split(',')
+    names = [name.strip().strip('"') for name in header]
+    if column not in names:
+        raise ValueError(f"Column {column!r} not found in {path} (columns: {', '.join(names)})")
+    return names.index(column)
+
+
+def plan_chunks(path, dtype='float64', column=None, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """Split one input file into independent chunk tasks
+
+    Args:
+        path: Input file (.npy, .csv or raw binary)
+        dtype: Element type of raw binary files
+        column: CSV column name, or index for headerless files (required for .csv files)
+        chunk_bytes: Target size of each chunk
+
+    Returns:
+        List of (kind, path, start, stop, option) tuples for aggregate_chunk;
+        start/stop are element offsets for binary files and byte offsets for CSV
+    """
+    path = str(path)
+    suffix = Path(path).suffix.lower()
+    if suffix == '.csv':
+        if column is None:
+            raise ValueError(f"A column is required to read {path}")
+        size = os.path.getsize(path)
+        index = _csv_column_index(path, column)
+        has_header = not isinstance(column, int)
+        bounds = list(range(0, size, chunk_bytes)) + [size]
+        return [('csv', path, start, stop, (index, has_header)) for start, stop in zip(bounds, bounds[1:])]
+
+    if suffix == '.npy':
+        array = np.load(path, mmap_mode='r')
+        n, itemsize = array.size, array.dtype.itemsize
+        kind, option = 'npy', None
+    else:
+        itemsize = np.dtype(dtype).itemsize
+        n = os.path.getsize(path) // itemsize
+        kind, option = 'raw', np.dtype(dtype).str
+    step = max(1, chunk_bytes // itemsize)
+    return [(kind, path, start, min(start + step, n), option) for start in range(0, n, step)]
+
+
+def _read_csv_chunk(path, start, stop, index, has_header):
+    """Parse one column from the CSV lines that start within [start, stop)"""
+    with open(path, 'rb') as f:
+        if start == 0:
+            if has_header:
+                f.readline()
+        else:
+            # Skip the line straddling `start`; the previous chunk owns it
+            f.seek(start - 1)
+            f.readline()
+        position = f.tell()
+        if position >= stop:
+            return np.empty(0)
+        block = f.read(stop - position)
+        if not block.endswith(b'\n'):
+            # Finish the last line, which started inside this chunk
+            block += f.readline()
+
+    try:
+        return np.loadtxt(io.BytesIO(block), delimiter=',', usecols=index, ndmin=1)
+    except ValueError:
+        # Blank or malformed cells; the slower parser turns them into NaN (missing)
+        return np.genfromtxt(io.BytesIO(block), delimiter=',', usecols=index, ndmin=1)
+
+
+def aggregate_chunk(task):
+    """Reduce one chunk task (see plan_chunks) to a GeometricMeanAccumulator"""
+    kind, path, start, stop, option = task
+    if kind == 'csv':
+        values = _read_csv_chunk(path, start, stop, *option)
+    elif kind == 'npy':
+        values = np.load(path, mmap_mode='r').reshape(-1)[start:stop]
+    else:
+        values = np.memmap(path, dtype=np.dtype(option), mode='r')[start:stop]
+    return GeometricMeanAccumulator().update(values)
+
+
+def aggregate_files(paths, dtype='float64', column=None, workers=None, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """Compute arithmetic/geometric mean partials over many files in parallel
+
+    Args:
+        paths: Input files
+        dtype: Element type of raw binary files
+        column: Column name, or index for headerless CSV files
+        workers: Worker processes (None = all cores, 1 = run in this process)
+        chunk_bytes: Target chunk size; several chunks per core keeps the pool balanced
+
+    Returns:
+        GeometricMeanAccumulator holding the merged totals of every file
+    """
+    tasks = [task for path in paths for task in plan_chunks(path, dtype, column, chunk_bytes)]
+    total = GeometricMeanAccumulator()
+    if workers == 1 or len(tasks) <= 1:
+        for task in tasks:
+            total.merge(aggregate_chunk(task))
+        return total
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for partial in pool.map(aggregate_chunk, tasks):
+            total.merge(partial)
+    return total
+
+
+def main(argv=None):
+    """Aggregate the given files and print the means"""
+    parser = argparse.ArgumentParser(description="Arithmetic and geometric means over many large response files.")
+    parser.add_argument('paths', nargs='+', type=Path, help="input files (.npy, .csv or raw binary)")
+    parser.add_argument('--dtype', default='float64', help="element type of raw binary files (default: float64)")
+    parser.add_argument('--column', help="CSV column name, or index when the files have no header")
+    parser.add_argument('--workers', type=int, help="worker processes (default: all cores)")
+    parser.add_argument('--chunk-mb', type=int, default=DEFAULT_CHUNK_BYTES >> 20, help="chunk size in MiB")
+    args = parser.parse_args(argv)
+
+    column = int(args.column) if args.column is not None and args.column.isdigit() else args.column
+    total = aggregate_files(args.paths, args.dtype, column, args.workers, args.chunk_mb << 20)
+
+    print(f"Files:             {len(args.paths)}")
+    print(f"Responses:         {total.count:,} ({total.n_missing:,} missing)")
+    print(f"Zero / negative:   {total.n_zero:,} / {total.n_negative:,}")
+    print(f"Arithmetic mean:   {total.arithmetic_mean():.4f}")
+    print(f"Geometric mean:    {total.geometric_mean():.4f}")
+
+
+if __name__ == '__main__':
+    main()
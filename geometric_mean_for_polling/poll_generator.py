@@ -0,0 +1,174 @@
+"""Seedable synthetic poll responses, from a few hundred to billions
+
+Responses are drawn from a mixture of components (e.g. a log-normal bulk of
+reasonable answers plus a uniform band of wild outliers) with
+np.random.Generator. The output is produced in fixed-size chunks, and chunk i
+always draws from the i-th stream spawned from one SeedSequence, so for a given
+seed and chunk size the responses are identical whether they are generated in
+one process, chunk by chunk, or across a process pool filling a memory-mapped
+array. No global NumPy random state is touched.
+
+Example:
+    >>> responses = generate_responses(1_000, true_value=1.0, seed=0)
+    >>> out = np.lib.format.open_memmap('responses.npy', 'w+', np.float64, (10**9,))
+    >>> fill_responses(out, default_components(1.0), seed=0, workers=8)
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+
+DEFAULT_CHUNK_SIZE = 1 << 22  # responses per chunk (and per random stream)
+COMPONENT_KINDS = ('lognormal', 'uniform', 'normal')
+OUTLIER_RANGE = (15.0, 99.0)  # (low, high) of the default uniform outliers, in percent
+
+
+class Component(NamedTuple):
+    """One mixture component of a poll
+
+    `a` and `b` are (mean, sigma) of log(x) for 'lognormal', (low, high) for
+    'uniform' and (mean, std) for 'normal'.
+    """
+
+    kind: str
+    weight: float
+    a: float
+    b: float
+
+
+def default_components(true_value):
+    """The classic poll: three quarters log-normal around the true value, a quarter wild outliers
+
+    Args:
+        true_value: The actual correct percentage (e.g., 1.0 for 1%)
+
+    Returns:
+        List of Components
+    """
+    return [
+        # Most responses overestimate by a factor of about e^0.8 with log-normal spread
+        Component('lognormal', 0.75, np.log(true_value) + 0.8, 0.6),
+        # Clear outliers (15-99%)
+        Component('uniform', 0.25, *OUTLIER_RANGE),
+    ]
+
+
+def _draw(rng, component, size):
+    if component.kind == 'lognormal':
+        return rng.lognormal(component.a, component.b, size)
+    if component.kind == 'uniform':
+        return rng.uniform(component.a, component.b, size)
+    return rng.normal(component.a, component.b, size)
+
+
+def sample_responses(rng, size, components):
+    """Draw responses from a mixture with one Generator
+
+    Args:
+        rng: np.random.Generator to draw from
+        size: Number of responses
+        components: Mixture components; weights are normalized and each
+            component gets its exact share of the responses
+
+    Returns:
+        Array of `size` responses, in random order
+    """
+    for component in components:
+        if component.kind not in COMPONENT_KINDS:
+            raise ValueError(f"Component kind must be one of {COMPONENT_KINDS}, got {component.kind!r}")
+    if len(components) == 1:
+        return _draw(rng, components[0], size)
+
+    # Exact share per component (largest remainder), so e.g. a 0.25 outlier weight means 25% outliers
+    weights = np.array([component.weight for component in components], dtype=np.float64)
+    quotas = weights / weights.sum() * size
+    counts = np.floor(quotas).astype(np.int64)
+    counts[np.argsort(counts - quotas)[: size - counts.sum()]] += 1
+
+    out = np.concatenate([_draw(rng, component, count) for component, count in zip(components, counts)])
+    rng.shuffle(out)
+    return out
+
+
+def _chunk_tasks(n, seed, chunk_size):
+    """(start, stop, stream) for every chunk of n responses"""
+    starts = range(0, n, chunk_size)
+    streams = np.random.SeedSequence(seed).spawn(len(starts))
+    return [(start, min(start + chunk_size, n), stream) for start, stream in zip(starts, streams)]
+
+
+def iter_response_chunks(n, components, seed=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield n responses chunk by chunk, so any n fits in memory
+
+    Args:
+        n: Total number of responses
+        components: Mixture components
+        seed: Seed (int or SeedSequence); None draws fresh entropy
+        chunk_size: Responses per chunk
+
+    Yields:
+        Arrays of at most chunk_size responses
+    """
+    for start, stop, stream in _chunk_tasks(n, seed, chunk_size):
+        yield sample_responses(np.random.default_rng(stream), stop - start, components)
+
+
+def _fill_chunk(task):
+    """Generate one chunk into a memory-mapped array opened in this process"""
+    filename, offset, dtype, n, start, stop, stream, components = task
+    out = np.memmap(filename, dtype=dtype, mode='r+', offset=offset, shape=(n,))
+    out[start:stop] = sample_responses(np.random.default_rng(stream), stop - start, components)
+    out.flush()
+    return stop - start
+
+
+def fill_responses(out, components, seed=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=1):
+    """Fill a preallocated array with responses, optionally across processes
+
+    Args:
+        out: 1-D array to fill; must be an np.memmap (e.g. from
+            np.lib.format.open_memmap) when workers > 1
+        components: Mixture components
+        seed: Seed (int or SeedSequence); None draws fresh entropy
+        chunk_size: Responses per chunk and random stream
+        workers: Processes to fill chunks in (1 = fill in this process)
+
+    Returns:
+        out
+    """
+    n = len(out)
+    tasks = _chunk_tasks(n, seed, chunk_size)
+    if workers == 1 or len(tasks) <= 1:
+        for start, stop, stream in tasks:
+            out[start:stop] = sample_responses(np.random.default_rng(stream), stop - start, components)
+        return out
+
+    if not isinstance(out, np.memmap):
+        raise ValueError("Filling across processes needs a memory-mapped array")
+    # Flush pending writes (e.g. the .npy header) before workers map the file
+    out.flush()
+    offset = out.offset
+    dtype = out.dtype.str
+    tasks = [(out.filename, offset, dtype, n, start, stop, stream, components) for start, stop, stream in tasks]
+    with ProcessPoolExecutor(workers) as pool:
+        list(pool.map(_fill_chunk, tasks))
+    return out
+
+
+def generate_responses(n, true_value=1.0, components=None, seed=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Generate n synthetic poll responses in memory
+
+    Args:
+        n: Number of responses
+        true_value: The actual correct percentage, used by the default components
+        components: Mixture components (default: default_components(true_value))
+        seed: Seed (int or SeedSequence); None draws fresh entropy
+        chunk_size: Responses per chunk and random stream
+
+    Returns:
+        Array of n responses
+    """
+    if components is None:
+        components = default_components(true_value)
+    return fill_responses(np.empty(n), components, seed, chunk_size)
@@ -0,0 +1,112 @@
+"""Outlier sensitivity of the arithmetic and geometric means
+
+Both analyses are derived from running totals rather than recomputing means:
+removing response i changes the sum by x_i and the log-sum by log(x_i), so all
+n leave-one-out means cost O(n), and the "remove the k largest" curve needs only
+a partial sort (np.partition) of the top k responses. The *_from_totals variants
+take the running totals directly, for responses that were only ever streamed.
+"""
+
+import numpy as np
+
+
+def log_responses(responses):
+    """Natural log of each response, with log(0) = -inf and log(negative) = NaN, without warnings
+
+    Args:
+        responses: Array of poll responses
+
+    Returns:
+        Array of log-values as float64
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.log(np.asarray(responses, dtype=np.float64))
+
+
+def leave_one_out_from_totals(values, count, total, log_total):
+    """Both means with a single response of each given value left out, from running totals
+
+    Args:
+        values: Response values to leave out (one result per value)
+        count: Number of responses the totals cover
+        total: Sum of the responses
+        log_total: Sum of log(x) over the responses
+
+    Returns:
+        Dictionary of arrays 'arithmetic_mean' and 'geometric_mean', one entry per value
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return {
+        'arithmetic_mean': (total - values) / (count - 1),
+        'geometric_mean': np.exp((log_total - log_responses(values)) / (count - 1)),
+    }
+
+
+def leave_one_out_means(responses):
+    """Arithmetic and geometric mean of the responses with each one left out in turn
+
+    Args:
+        responses: Array of at least two poll responses
+
+    Returns:
+        Dictionary of length-n arrays 'arithmetic_mean' and 'geometric_mean';
+        entry i is the mean of every response except responses[i]
+    """
+    values = np.asarray(responses, dtype=np.float64).reshape(-1)
+    n = len(values)
+    if n < 2:
+        raise ValueError("Leaving one out needs at least two responses")
+    return leave_one_out_from_totals(values, n, values.sum(), log_responses(values).sum())
+
+
+def default_k_max(n):
+    """Default number of largest responses to remove: a quarter of n, but at least one when n >= 2"""
+    return max(min(1, n - 1), n // 4)
+
+
+def remove_top_k_from_totals(top, count, total, log_total):
+    """Means after removing the k largest responses, given only the largest ones and running totals
+
+    Args:
+        top: The k_max largest responses, in descending order
+        count: Number of responses the totals cover (more than len(top))
+        total: Sum of the responses
+        log_total: Sum of log(x) over the responses
+
+    Returns:
+        Same dictionary as remove_top_k_means, for k from 0 to len(top)
+    """
+    top = np.asarray(top, dtype=np.float64)
+    k = np.arange(len(top) + 1)
+    removed_sum = np.concatenate([[0.0], np.cumsum(top)])
+    removed_log_sum = np.concatenate([[0.0], np.cumsum(log_responses(top))])
+    return {
+        'k': k,
+        'removed': np.concatenate([[np.nan], top]),
+        'arithmetic_mean': (total - removed_sum) / (count - k),
+        'geometric_mean': np.exp((log_total - removed_log_sum) / (count - k)),
+    }
+
+
+def remove_top_k_means(responses, k_max=None):
+    """Means after removing the k largest responses, for every k from 0 to k_max
+
+    Args:
+        responses: Array of poll responses
+        k_max: Largest number of responses to remove (default: default_k_max(n))
+
+    Returns:
+        Dictionary of length-(k_max + 1) arrays: 'k', 'removed' (the k-th largest
+        response, NaN for k = 0), 'arithmetic_mean' and 'geometric_mean'
+    """
+    values = np.asarray(responses, dtype=np.float64).reshape(-1)
+    n = len(values)
+    if k_max is None:
+        k_max = default_k_max(n)
+    k_max = min(k_max, n - 1)
+    if k_max < 0:
+        raise ValueError("Cannot remove responses from an empty set")
+
+    # Only the k_max largest responses need ordering
+    top = np.sort(np.partition(values, n - k_max - 1)[n - k_max :])[::-1] if k_max else np.empty(0)
+    return remove_top_k_from_totals(top, n, values.sum(), log_responses(values).sum())
@@ -1,9 +1,29 @@
 """Tests for geometric mean polling visualization"""
 import pytest
 import numpy as np
+import matplotlib.pyplot as plt
 import os
+import subprocess
+import sys
 from pathlib import Path
-from geometric_mean_polling import generate_poll_responses, calculate_geometric_mean, create_visualizations
+from geometric_mean_polling import (
+    CHARTS,
+    GeometricMeanAccumulator,
+    HistogramAccumulator,
+    render_charts,
+    summarize_chunks,
+    summarize_responses,
+    generate_poll_responses,
+    calculate_geometric_mean,
+    create_visualizations,
+)
+from bootstrap import bootstrap_means, jackknife_means
+from grouped_means import combine_keys, grouped_means
+from sensitivity import leave_one_out_means, remove_top_k_means
+from parallel_aggregate import aggregate_files, plan_chunks
+from poll_generator import Component, default_components, fill_responses, generate_responses, iter_response_chunks
+from monte_carlo import ESTIMATORS, estimate_batch, format_table, simulate_grid
+from batch_report import REPORT_CHARTS, batch_report, load_survey, question_slugs
 
 
 class TestDataGeneration:
@@ -40,6 +60,46 @@ class TestDataGeneration:
         assert len(reasonable) > n_responses * 0.7  # At least 70%
 
 
+class TestPollGenerator:
+    def test_seeded_output_is_reproducible_and_leaves_global_state(self):
+        """Same seed gives the same responses without touching np.random's global state"""
+        np.random.seed(1)
+        expected_next = np.random.random()
+        np.random.seed(1)
+
+        first = generate_poll_responses(500, 2.0, seed=7)
+        second = generate_poll_responses(500, 2.0, seed=7)
+
+        np.testing.assert_array_equal(first, second)
+        assert np.random.random() == expected_next
+
+    def test_components_get_exact_shares(self):
+        """Each mixture component contributes its weight's share of the responses"""
+        components = [Component('lognormal', 3, 0.0, 0.5), Component('uniform', 1, 100.0, 200.0)]
+
+        responses = generate_responses(1000, components=components, seed=0)
+
+        assert np.count_nonzero(responses >= 100) == 250
+
+    def test_chunked_and_parallel_memmap_output_match(self, tmp_path):
+        """Chunk iteration and a process pool filling a memory-mapped file give identical responses"""
+        components = default_components(1.0)
+        expected = generate_responses(1000, components=components, seed=3, chunk_size=128)
+        out = np.lib.format.open_memmap(tmp_path / 'responses.npy', 'w+', np.float64, (1000,))
+
+        fill_responses(out, components, seed=3, chunk_size=128, workers=2)
+        chunks = list(iter_response_chunks(1000, components, seed=3, chunk_size=128))
+
+        np.testing.assert_array_equal(np.load(tmp_path / 'responses.npy'), expected)
+        np.testing.assert_array_equal(np.concatenate(chunks), expected)
+        assert max(len(chunk) for chunk in chunks) == 128
+
+    def test_parallel_fill_needs_memmap(self):
+        """Filling an in-memory array across processes is rejected"""
+        with pytest.raises(ValueError):
+            fill_responses(np.empty(1000), default_components(1.0), chunk_size=100, workers=2)
+
+
 class TestGeometricMean:
     def test_calculate_geometric_mean_simple_values(self):
         """Geometric mean of simple values is correct"""
@@ -78,6 +138,359 @@ class TestGeometricMean:
         assert geo_change < arith_change
 
 
+class TestGeometricMeanAccumulator:
+    def test_chunked_matches_in_memory(self):
+        """Feeding responses in chunks gives the same means as the whole array"""
+        data = np.random.default_rng(0).lognormal(0.8, 0.6, size=10_001)
+
+        accumulator = GeometricMeanAccumulator(block_size=1000)
+        for chunk in np.array_split(data, 7):
+            accumulator.update(chunk)
+
+        assert accumulator.count == len(data)
+        assert np.isclose(accumulator.geometric_mean(), np.exp(np.mean(np.log(data))), rtol=1e-12)
+        assert np.isclose(accumulator.arithmetic_mean(), np.mean(data), rtol=1e-12)
+        assert (accumulator.min, accumulator.max) == (data.min(), data.max())
+
+    def test_merge_equals_single_pass(self):
+        """Merging partial accumulators matches accumulating everything at once"""
+        data = np.array([1.5, 2.3, 5.7, 12.4, 25.6, 0.8])
+
+        merged = GeometricMeanAccumulator().update(data[:2]).merge(GeometricMeanAccumulator().update(data[2:]))
+        single = GeometricMeanAccumulator()
+        for value in data:
+            single.add(value)
+
+        assert np.isclose(merged.geometric_mean(), single.geometric_mean(), rtol=1e-14)
+        assert np.isclose(merged.geometric_mean(), calculate_geometric_mean(data), rtol=1e-14)
+        assert merged.count == single.count == len(data)
+
+    def test_zero_negative_and_missing_counters(self):
+        """Zeros force the geometric mean to 0, negatives to NaN, and NaNs are skipped"""
+        accumulator = GeometricMeanAccumulator().update([0.0, 4.0, np.nan, 1.0])
+
+        assert (accumulator.n_zero, accumulator.n_negative, accumulator.n_missing) == (1, 0, 1)
+        assert accumulator.geometric_mean() == 0.0
+        assert np.isclose(accumulator.geometric_mean(positive_only=True), 2.0)
+        assert np.isnan(accumulator.add(-1.0).geometric_mean())
+
+    def test_compensated_sum_does_not_drift(self):
+        """Many tiny values added to a large one are not lost to rounding"""
+        accumulator = GeometricMeanAccumulator().add(1e16)
+        for _ in range(10):
+            accumulator.update(np.ones(1000))
+
+        assert accumulator.total == 1e16 + 10_000
+
+
+class TestHistogramAccumulator:
+    @pytest.fixture
+    def responses(self):
+        return np.random.default_rng(0).lognormal(1.0, 1.2, 10_001)
+
+    def test_chunked_bins_match_np_histogram(self, responses):
+        """Binning in chunks gives the same counts as np.histogram over the whole range"""
+        histogram = HistogramAccumulator(0, 50, -2, 4, bins=20, block_size=999)
+        for chunk in np.array_split(responses, 7):
+            histogram.update(chunk)
+
+        np.testing.assert_array_equal(histogram.counts, np.histogram(responses, bins=20, range=(0, 50))[0])
+        np.testing.assert_array_equal(histogram.log_counts, np.histogram(np.log(responses), bins=20, range=(-2, 4))[0])
+        assert histogram.counts.sum() + histogram.n_outside == len(responses)
+
+    def test_merge_keeps_largest_responses(self, responses):
+        """Merged partial histograms add their counts and keep the overall top responses"""
+        first = HistogramAccumulator(0, 50, -2, 4, top_k=5).update(responses[:100])
+        second = HistogramAccumulator(0, 50, -2, 4, top_k=5).update(responses[100:])
+
+        first.merge(second)
+
+        np.testing.assert_array_equal(first.top, np.sort(responses)[::-1][:5])
+        with pytest.raises(ValueError):
+            first.merge(HistogramAccumulator(0, 10, -2, 4))
+
+    def test_summarize_chunks_matches_in_memory_summary(self, responses):
+        """Streamed summaries carry the same means, histograms and top-k curve as in-memory ones"""
+        exact = summarize_responses(responses, 3.0)
+
+        streamed = summarize_chunks(np.array_split(responses, 4), 3.0, top_k=50)
+
+        assert np.isclose(streamed.arithmetic_mean, exact.arithmetic_mean)
+        assert np.isclose(streamed.geometric_mean, exact.geometric_mean)
+        np.testing.assert_array_equal(streamed.hist_counts, exact.hist_counts)
+        np.testing.assert_array_equal(streamed.log_hist_counts, exact.log_hist_counts)
+        np.testing.assert_allclose(streamed.top_k['arithmetic_mean'], exact.top_k['arithmetic_mean'][:51])
+        assert len(streamed.responses) <= 30
+
+    def test_charts_render_from_streamed_summary(self, responses, tmp_path):
+        """Every chart draws from a pre-binned summary"""
+        summary = summarize_chunks([responses], 3.0)
+
+        written = render_charts(summary, tmp_path)
+
+        assert all(path.exists() for path in written)
+
+
+class TestGroupedMeans:
+    def test_matches_per_group_loop(self):
+        """Vectorized per-group means equal computing each group separately"""
+        rng = np.random.default_rng(2)
+        responses = rng.lognormal(0.8, 0.6, size=2000)
+        question = rng.integers(0, 5, size=2000)
+        demographic = rng.integers(0, 3, size=2000)
+
+        group, cells = combine_keys(question, demographic)
+        stats = grouped_means(responses, group, n_groups=len(cells))
+
+        for i, (q, d) in enumerate(cells):
+            in_cell = (question == q) & (demographic == d)
+            assert stats['count'][i] == in_cell.sum()
+            assert np.isclose(stats['geometric_mean'][i], calculate_geometric_mean(responses[in_cell]), rtol=1e-12)
+            assert np.isclose(stats['arithmetic_mean'][i], np.mean(responses[in_cell]), rtol=1e-12)
+
+    def test_outlier_and_special_value_counts(self):
+        """Outliers, zeros, negatives and missing values are counted per group"""
+        responses = [1.0, 20.0, 0.0, np.nan, -1.0, 4.0]
+        groups = [0, 0, 1, 1, 2, 2]
+
+        stats = grouped_means(responses, groups, n_groups=4, outlier_threshold=15)
+
+        assert list(stats['n_outliers']) == [1, 0, 0, 0]
+        assert list(stats['outlier_fraction'][:3]) == [0.5, 0.0, 0.0]
+        assert (stats['n_zero'][1], stats['n_missing'][1], stats['n_negative'][2]) == (1, 1, 1)
+        assert stats['geometric_mean'][1] == 0.0
+        assert np.isnan(stats['geometric_mean'][2])
+        assert stats['count'][3] == 0 and np.isnan(stats['arithmetic_mean'][3])
+
+    def test_combine_keys_handles_sparse_keys(self):
+        """Widely spread keys still get dense group ids"""
+        group, cells = combine_keys([10**12, 5, 10**12], [1, 2, 1])
+
+        assert list(group) == [1, 0, 1]
+        assert cells.tolist() == [[5, 2], [10**12, 1]]
+
+
+class TestBootstrap:
+    @pytest.fixture
+    def responses(self):
+        return np.random.default_rng(0).lognormal(0.8, 0.6, size=200)
+
+    def test_intervals_bracket_the_estimates(self, responses):
+        """Both methods give intervals around the sample means with similar widths"""
+        for method in ('index', 'multinomial'):
+            result = bootstrap_means(responses, n_resamples=2000, seed=1, method=method)
+
+            expected = {'arithmetic_mean': np.mean(responses), 'geometric_mean': calculate_geometric_mean(responses)}
+            for name, estimate in expected.items():
+                interval = result[name]
+                assert np.isclose(interval['estimate'], estimate)
+                assert interval['ci_low'] < estimate < interval['ci_high']
+            assert result['replicates'].shape == (2, 2000)
+
+    def test_same_seed_same_replicates_across_batches_and_workers(self, responses):
+        """Replicates depend only on the seed, not on how batches are spread over processes"""
+        serial = bootstrap_means(responses, n_resamples=500, seed=7, memory_budget=1 << 16)
+        parallel = bootstrap_means(responses, n_resamples=500, seed=7, memory_budget=1 << 16, workers=2)
+
+        np.testing.assert_array_equal(serial['replicates'], parallel['replicates'])
+
+    def test_jackknife_matches_explicit_leave_one_out(self, responses):
+        """O(n) jackknife standard errors equal the ones from n explicit leave-one-out means"""
+        result = jackknife_means(responses)
+
+        n = len(responses)
+        loo = np.array([calculate_geometric_mean(np.delete(responses, i)) for i in range(n)])
+        expected = np.sqrt((n - 1) / n * np.sum((loo - loo.mean()) ** 2))
+        assert np.isclose(result['geometric_mean']['std_error'], expected, rtol=1e-9)
+        assert result['geometric_mean']['std_error'] < result['arithmetic_mean']['std_error']
+
+
+class TestSensitivity:
+    def test_leave_one_out_matches_explicit_removal(self):
+        """Each leave-one-out mean equals the mean with that response deleted"""
+        responses = np.array([1.5, 2.3, 5.7, 12.4, 25.6, 80.0])
+
+        loo = leave_one_out_means(responses)
+
+        for i in range(len(responses)):
+            rest = np.delete(responses, i)
+            assert np.isclose(loo['arithmetic_mean'][i], np.mean(rest))
+            assert np.isclose(loo['geometric_mean'][i], calculate_geometric_mean(rest))
+
+    def test_remove_top_k_matches_sorted_truncation(self):
+        """The top-k curve equals recomputing the means without the k largest responses"""
+        responses = np.random.default_rng(3).lognormal(0.8, 1.0, size=101)
+
+        curve = remove_top_k_means(responses, k_max=10)
+
+        ordered = np.sort(responses)
+        assert list(curve['k']) == list(range(11))
+        for k in range(11):
+            kept = ordered[: len(ordered) - k]
+            assert np.isclose(curve['arithmetic_mean'][k], np.mean(kept))
+            assert np.isclose(curve['geometric_mean'][k], calculate_geometric_mean(kept))
+        assert curve['removed'][1] == responses.max()
+
+    @pytest.mark.parametrize('responses', [[1.0, 30.0], [1.0, 2.0, 30.0]])
+    def test_tiny_polls_still_remove_the_top_response(self, responses, tmp_path):
+        """Two or three responses still give a 'without the highest response' point and every chart"""
+        top_k = remove_top_k_means(responses)
+        streamed = summarize_chunks([np.array(responses)], 1.0)
+
+        create_visualizations(np.array(responses), 1.0, str(tmp_path))
+
+        assert top_k['k'].tolist() == [0, 1]
+        assert np.isclose(top_k['arithmetic_mean'][1], np.mean(responses[:-1]))
+        assert streamed.top_k['k'].tolist() == [0, 1]
+        assert (tmp_path / 'outlier_sensitivity.png').exists()
+
+    def test_influence_chart_is_created(self, tmp_path):
+        """create_visualizations also writes the leave-one-out / top-k chart"""
+        create_visualizations(np.array([1.0, 1.5, 2.0, 2.5, 3.0, 20.0, 30.0]), 1.0, str(tmp_path))
+
+        assert (tmp_path / 'outlier_influence.png').exists()
+
+
+class TestParallelAggregate:
+    @pytest.fixture
+    def responses(self):
+        return np.random.default_rng(1).lognormal(0.8, 0.6, size=5_003)
+
+    def test_raw_and_npy_files_match_in_memory(self, responses, tmp_path):
+        """Memory-mapped binary inputs, split into many chunks, give the in-memory result"""
+        responses.tofile(tmp_path / 'a.f64')
+        np.save(tmp_path / 'b.npy', responses)
+
+        total = aggregate_files([tmp_path / 'a.f64', tmp_path / 'b.npy'], workers=2, chunk_bytes=4096)
+
+        assert total.count == 2 * len(responses)
+        assert np.isclose(total.geometric_mean(), calculate_geometric_mean(responses), rtol=1e-12)
+        assert np.isclose(total.arithmetic_mean(), np.mean(responses), rtol=1e-12)
+
+    def test_csv_chunks_split_on_line_boundaries(self, responses, tmp_path):
+        """Every CSV row is counted exactly once whatever the chunk size"""
+        path = tmp_path / 'responses.csv'
+        rows = np.column_stack([np.arange(len(responses)), responses])
+        np.savetxt(path, rows, delimiter=',', header='id,response', comments='', fmt=['%d', '%.17g'])
+
+        for chunk_bytes in (7, 1000, 1 << 20):
+            total = aggregate_files([path], column='response', workers=1, chunk_bytes=chunk_bytes)
+            assert total.count == len(responses)
+            assert np.isclose(total.geometric_mean(), calculate_geometric_mean(responses), rtol=1e-12)
+
+    def test_float32_and_blank_csv_cells(self, tmp_path):
+        """float32 files are read with their dtype and blank CSV cells count as missing"""
+        np.array([1.0, 4.0], dtype=np.float32).tofile(tmp_path / 'a.f32')
+        (tmp_path / 'b.csv').write_text('id,response\n0,2\n1,\n')
+
+        binary = aggregate_files([tmp_path / 'a.f32'], dtype='float32', workers=1)
+        text = aggregate_files([tmp_path / 'b.csv'], column='response', workers=1)
+
+        assert binary.geometric_mean() == 2.0
+        assert (text.count, text.n_missing) == (1, 1)
+        assert len(plan_chunks(tmp_path / 'a.f32', dtype='float32', chunk_bytes=4)) == 2
+
+
+class TestMonteCarlo:
+    def test_estimate_batch_matches_row_wise_reference(self):
+        """Partition-based median and trimmed mean match sorting each poll"""
+        polls = np.random.default_rng(0).lognormal(0.0, 1.0, size=(20, 51))
+        ordered = np.sort(polls, axis=1)
+
+        estimates = estimate_batch(polls.copy(), trim=0.1)
+
+        np.testing.assert_allclose(estimates['median'], np.median(ordered, axis=1))
+        np.testing.assert_allclose(estimates['trimmed'], ordered[:, 5:46].mean(axis=1))
+        np.testing.assert_allclose(estimates['geometric'], np.exp(np.log(ordered).mean(axis=1)))
+
+    def test_grid_is_reproducible_across_workers(self):
+        """Seeded grids give the same tables in one process and in a process pool"""
+        args = ([0.0, 0.1], [0.6], [40], 300)
+
+        serial = simulate_grid(*args, seed=0)
+        parallel = simulate_grid(*args, seed=0, workers=2)
+
+        assert serial['n'].tolist() == [40, 40] and serial['outlier_fraction'].tolist() == [0.0, 0.1]
+        for name in ESTIMATORS:
+            np.testing.assert_array_equal(serial['rmse'][name], parallel['rmse'][name])
+        assert len(format_table(serial).splitlines()) == 4
+
+    def test_outliers_hurt_arithmetic_mean_most(self):
+        """With outliers (simulated in small batches) the arithmetic mean errs most and the median least"""
+        result = simulate_grid([0.1], [0.6], [200], 200, seed=1, memory_budget=200 * 24 * 16)
+
+        rmse = {name: result['rmse'][name][0] for name in ESTIMATORS}
+        assert rmse['arithmetic'] > rmse['geometric'] > rmse['trimmed'] > rmse['median']
+        assert result['bias']['arithmetic'][0] > 0
+
+
+class TestBatchReport:
+    def test_load_survey_csv_and_npz(self, tmp_path):
+        """Long-format CSV and per-question npz arrays load to the same groups"""
+        (tmp_path / 'survey.csv').write_text('question,response\nb,1\na,2\nb,\na,4\n')
+        np.savez(tmp_path / 'survey.npz', a=np.array([2.0, 4.0]), b=np.array([1.0, np.nan]))
+
+        questions, groups, responses = load_survey(tmp_path / 'survey.csv')
+        npz_questions, npz_groups, npz_responses = load_survey(tmp_path / 'survey.npz')
+
+        assert list(questions) == list(npz_questions) == ['a', 'b']
+        for loaded_groups, loaded_responses in [(groups, responses), (npz_groups, npz_responses)]:
+            assert np.bincount(loaded_groups).tolist() == [2, 2]
+            assert sorted(loaded_responses[loaded_groups == 0]) == [2.0, 4.0]
+            assert np.isnan(loaded_responses[loaded_groups == 1]).sum() == 1
+
+    def test_load_survey_handles_quoted_commas(self, tmp_path):
+        """Question texts with quoted commas stay in one column"""
+        (tmp_path / 'survey.csv').write_text('question,response\n"Aid, in %",1.5\n"Aid, in %",2\nOther,3\n')
+
+        questions, groups, responses = load_survey(tmp_path / 'survey.csv')
+
+        assert list(questions) == ['Aid, in %', 'Other']
+        assert responses[groups == 0].tolist() == [1.5, 2.0]
+
+    def test_batch_report_writes_summary_and_charts(self, tmp_path):
+        """Every question with enough positive responses gets a chart folder and a summary row"""
+        rng = np.random.default_rng(0)
+        responses = np.concatenate([rng.lognormal(0.8, 0.6, 50), rng.lognormal(2.4, 0.6, 50), [3.0]])
+        groups = np.repeat([0, 1, 2], [50, 50, 1])
+        questions = np.array(['Foreign aid %', 'Q2', 'Q3'])
+
+        stats = batch_report(questions, groups, responses, tmp_path, true_values={'Q2': 5.0}, workers=2, dpi=50)
+
+        rows = (tmp_path / 'summary.csv').read_text().splitlines()
+        assert len(rows) == 4 and rows[1].startswith('Foreign aid %,50,')
+        assert np.isclose(stats['geometric_mean'][1], calculate_geometric_mean(responses[50:100]))
+        for slug in question_slugs(questions)[:2]:
+            assert all((tmp_path / slug / chart).exists() for chart in REPORT_CHARTS)
+        assert not (tmp_path / 'Q3').exists()
+
+    def test_questions_with_the_same_slug_get_separate_folders(self, tmp_path):
+        """Questions whose names normalize to the same slug do not overwrite each other's charts"""
+        rng = np.random.default_rng(0)
+        questions = np.array(['Aid %', 'Aid ?'])
+
+        batch_report(questions, np.repeat([0, 1], 20), rng.lognormal(1.0, 0.5, 40), tmp_path, dpi=50)
+
+        assert question_slugs(questions) == ['Aid', 'Aid_1']
+        assert all((tmp_path / slug / REPORT_CHARTS[0]).exists() for slug in ['Aid', 'Aid_1'])
+
+    def test_suffixed_slugs_skip_names_already_taken(self):
+        """A suffixed slug never lands on another question's slug"""
+        slugs = question_slugs(['Aid_2', 'Aid %', 'Aid ?', 'Aid !'])
+
+        assert slugs == ['Aid_2', 'Aid', 'Aid_1', 'Aid_3']
+
+    def test_serial_report_leaves_no_pyplot_figures_open(self, tmp_path):
+        """Rendering in this process does not leave figures registered with pyplot"""
+        rng = np.random.default_rng(0)
+        before = plt.get_fignums()
+
+        for bins in (10, 20):
+            batch_report(np.array(['Q1']), np.zeros(20, dtype=int), rng.lognormal(1.0, 0.5, 20), tmp_path, bins=bins)
+
+        assert plt.get_fignums() == before
+
+
 class TestVisualization:
     def test_create_visualizations_runs_without_error(self, tmp_path):
         """Visualization function runs without error"""
@@ -107,3 +520,40 @@ class TestVisualization:
         for filename in expected_files:
             filepath = tmp_path / filename
             assert filepath.exists(), f"{filename} was not created"
+
+    def test_summary_is_computed_once_for_all_charts(self):
+        """The shared summary holds the statistics and histograms the charts draw"""
+        responses = np.array([1.0, 1.5, 2.0, 2.5, 3.0, 20.0, 30.0])
+
+        summary = summarize_responses(responses, 1.0, bins=5)
+
+        assert np.isclose(summary.geometric_mean, calculate_geometric_mean(responses))
+        assert np.isclose(summary.top_k['arithmetic_mean'][1], np.mean(responses[:-1]))
+        assert summary.hist_counts.sum() == summary.log_hist_counts.sum() == len(responses)
+        np.testing.assert_array_equal(summary.hist_edges, np.histogram(responses, bins=5)[1])
+
+    def test_single_response_renders_every_chart(self, tmp_path):
+        """One response has no leave-one-out means but still produces every chart"""
+        summary = summarize_responses(np.array([2.0]), 1.0)
+
+        create_visualizations(np.array([2.0]), 1.0, str(tmp_path))
+
+        assert np.isnan(summary.loo_arithmetic_mean).all() and len(summary.loo_geometric_mean) == 1
+        assert all((tmp_path / filename).exists() for filename in CHARTS)
+
+    def test_import_keeps_the_callers_backend(self):
+        """Importing the module leaves the matplotlib backend chosen by the caller alone"""
+        code = "import matplotlib; matplotlib.use('pdf'); import geometric_mean_polling; print(matplotlib.get_backend())"
+
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=Path(__file__).parent)
+
+        assert result.stdout.strip() == 'pdf'
+
+    def test_render_charts_in_worker_processes(self, tmp_path):
+        """Charts drawn in a process pool land in the output directory"""
+        summary = summarize_responses(np.array([1.0, 1.5, 2.0, 2.5, 3.0, 20.0, 30.0]), 1.0)
+
+        written = render_charts(summary, tmp_path, workers=2)
+
+        assert sorted(path.name for path in written) == sorted(CHARTS)
+        assert all(path.exists() for path in written)
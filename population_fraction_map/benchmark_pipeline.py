@@ -0,0 +1,270 @@
+"""
+Benchmarks for the population fraction pipeline.
+
+Runs on synthetic data and a local mock API server (see mock_api.py), so no API
+key or network access is needed:
+
+    python benchmark_pipeline.py --sizes 1000 10000 100000
+    python benchmark_pipeline.py --pipeline-sizes 200 2000 20000 --latency 0.02 --save-baseline
+
+The end-to-end pipeline timings are compared against a stored baseline, and the
+run exits non-zero when a stage is slower than the baseline by more than the
+tolerance.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+from history_store import save_history
+from mock_api import MockApiServer
+from population_fraction_map_api import (
+    COUNTRIES,
+    calculate_population_fractions,
+    create_map,
+    fetch_all_country_data,
+    write_map,
+)
+from rate_limiter import RateLimiter
+
+DEFAULT_BASELINE_PATH = Path(__file__).parent / 'benchmark_baseline.json'
+DEFAULT_TOLERANCE = 0.25
+
+
+def synthetic_history(n_regions: int, n_years: int = 50, seed: int = 0) -> pd.DataFrame:
+    """
+    Generate a history frame shaped like fetch_all_country_data's output.
+
+    Args:
+        n_regions: Number of distinct countries/regions
+        n_years: Years of history per region
+        seed: Seed for the random populations
+
+    Returns:
+        DataFrame with country, country_code, year and population columns
+    """
+    rng = np.random.default_rng(seed)
+    names = pd.Categorical([f"Region {i}" for i in range(n_regions)])
+    codes = pd.Categorical([f"R{i:05d}" for i in range(n_regions)])
+    region = np.repeat(np.arange(n_regions), n_years)
+    years = np.tile(np.arange(2024 - n_years, 2024, dtype=np.int16), n_regions)
+
+    # Random walk around a per-region base so peaks land in different years
+    base = rng.integers(10_000, 100_000_000, size=n_regions)
+    growth = rng.normal(0.01, 0.02, size=(n_regions, n_years)).cumsum(axis=1)
+    populations = (base[:, None] * np.exp(growth)).astype(np.int64).ravel()
+
+    return pd.DataFrame(
+        {
+            'country': pd.Categorical.from_codes(region, dtype=names.dtype),
+            'country_code': pd.Categorical.from_codes(region, dtype=codes.dtype),
+            'year': years,
+            'population': populations,
+        }
+    )
+
+
+def time_call(func, *args, repeat: int = 3) -> float:
+    """Best wall-clock time in seconds over `repeat` calls."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_population_fractions(sizes: list[int], n_years: int = 50) -> pd.DataFrame:
+    """
+    Time calculate_population_fractions over growing inputs.
+
+    A roughly constant ns/row column shows the computation scales linearly.
+
+    Args:
+        sizes: Numbers of regions to benchmark
+        n_years: Years of history per region
+
+    Returns:
+        DataFrame with rows, seconds and ns_per_row for each size
+    """
+    results = []
+    for n_regions in sizes:
+        df = synthetic_history(n_regions, n_years)
+        seconds = time_call(calculate_population_fractions, df)
+        results.append(
+            {'regions': n_regions, 'rows': len(df), 'seconds': seconds, 'ns_per_row': seconds / len(df) * 1e9}
+        )
+    return pd.DataFrame(results)
+
+
+def benchmark_countries(n: int) -> list[str]:
+    """The real country list, padded with synthetic "Region i" names up to n."""
+    return COUNTRIES[:n] + [f"Region {i}" for i in range(len(COUNTRIES), n)]
+
+
+def bench_pipeline(
+    sizes: list[int],
+    workers: int = 32,
+    latency: float = 0.0,
+    error_rate: float = 0.0,
+    throttle_rate: float = 0.0,
+    n_years: int = 50,
+    repeat: int = 3,
+) -> pd.DataFrame:
+    """
+    Time each pipeline stage end to end against a local mock API.
+
+    The fetch runs once per size (it is the slow part and is dominated by the
+    simulated latency); the other stages report their best of `repeat` runs.
+    The request rate is left effectively unlimited so the limiter does not mask
+    client-side throughput.
+
+    Args:
+        sizes: Numbers of countries to fetch
+        workers: Concurrent requests for fetch_all_country_data
+        latency: Seconds the mock API waits before each response
+        error_rate: Fraction of requests the mock API answers with 503
+        throttle_rate: Fraction of requests the mock API answers with 429
+        n_years: Years of history per country
+        repeat: Runs per non-fetch stage
+
+    Returns:
+        DataFrame with stage, countries, seconds and us_per_country for each stage and size
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for n in sizes:
+            countries = benchmark_countries(n)
+            limiter = RateLimiter(rate=1e6, backoff_base=0.001)
+            with MockApiServer(latency, error_rate, throttle_rate=throttle_rate, n_years=n_years) as server:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    start = time.perf_counter()
+                    df = fetch_all_country_data(countries, 'benchmark', workers, server.url, limiter)
+                    fetch_seconds = time.perf_counter() - start
+
+            df_fractions = calculate_population_fractions(df)
+            fig = create_map(df_fractions)
+            timings = {
+                'fetch': fetch_seconds,
+                'fractions': time_call(calculate_population_fractions, df, repeat=repeat),
+                'create_map': time_call(create_map, df_fractions, repeat=repeat),
+                'write_html': time_call(write_map, fig, tmp / 'map.html', 'html', repeat=repeat),
+                'write_json': time_call(write_map, fig, tmp / 'map.json', 'json', repeat=repeat),
+                'write_csv': time_call(df_fractions.to_csv, tmp / 'fractions.csv', repeat=repeat),
+                'save_history': time_call(save_history, df, tmp / 'history.feather', repeat=repeat),
+            }
+            for stage, seconds in timings.items():
+                results.append(
+                    {'stage': stage, 'countries': n, 'seconds': seconds, 'us_per_country': seconds / n * 1e6}
+                )
+    return pd.DataFrame(results)
+
+
+def load_baseline(path: Union[str, Path] = DEFAULT_BASELINE_PATH) -> Optional[pd.DataFrame]:
+    """Stored pipeline timings, or None if no baseline has been saved yet."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    return pd.DataFrame(json.loads(path.read_text()))
+
+
+def save_baseline(results: pd.DataFrame, path: Union[str, Path] = DEFAULT_BASELINE_PATH) -> None:
+    """Store pipeline timings as the baseline for later runs."""
+    records = results[['stage', 'countries', 'seconds']].to_dict(orient='records')
+    Path(path).write_text(json.dumps(records, indent=2) + "\n")
+
+
+def compare_to_baseline(
+    results: pd.DataFrame, baseline: pd.DataFrame, tolerance: float = DEFAULT_TOLERANCE
+) -> pd.DataFrame:
+    """
+    Line up pipeline timings with the baseline and flag regressions.
+
+    Args:
+        results: Output of bench_pipeline
+        baseline: Previously stored timings (see load_baseline)
+        tolerance: Allowed slowdown as a fraction of the baseline time
+
+    Returns:
+        DataFrame with seconds, baseline_seconds, ratio and regression for each
+        stage and size present in both
+    """
+    merged = results[['stage', 'countries', 'seconds']].merge(
+        baseline[['stage', 'countries', 'seconds']].rename(columns={'seconds': 'baseline_seconds'}),
+        on=['stage', 'countries'],
+    )
+    merged['ratio'] = merged['seconds'] / merged['baseline_seconds']
+    merged['regression'] = merged['ratio'] > 1 + tolerance
+    return merged
+
+
+def main(argv: Optional[list[str]] = None):
+    """Run the benchmarks and print a results table."""
+    parser = argparse.ArgumentParser(description="Benchmark the population fraction pipeline.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[200, 2_000, 20_000, 200_000], help="region counts")
+    parser.add_argument('--years', type=int, default=50, help="years of history per region")
+    parser.add_argument(
+        '--pipeline-sizes',
+        type=int,
+        nargs='*',
+        default=[200, 2_000, 20_000],
+        help="country counts for the end-to-end benchmark (none to skip it)",
+    )
+    parser.add_argument('--workers', type=int, default=32, help="concurrent requests to the mock API")
+    parser.add_argument('--latency', type=float, default=0.0, help="mock API response delay in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of mock requests failing with 503")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="fraction of mock requests answered 429")
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE_PATH, help="stored baseline timings")
+    parser.add_argument('--save-baseline', action='store_true', help="store this run as the new baseline")
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help=f"allowed slowdown before a stage counts as a regression (default: {DEFAULT_TOLERANCE:g})",
+    )
+    args = parser.parse_args(argv)
+
+    print("=" * 70)
+    print("calculate_population_fractions")
+    print("=" * 70)
+    print(bench_population_fractions(args.sizes, args.years).to_string(index=False))
+
+    if not args.pipeline_sizes:
+        return
+
+    print("\n" + "=" * 70)
+    print("END-TO-END PIPELINE (mock API)")
+    print("=" * 70)
+    results = bench_pipeline(
+        args.pipeline_sizes, args.workers, args.latency, args.error_rate, args.throttle_rate, args.years
+    )
+    print(results.to_string(index=False))
+
+    baseline = load_baseline(args.baseline)
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"\n✅ Baseline saved to: {args.baseline}")
+    elif baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
+    else:
+        comparison = compare_to_baseline(results, baseline, args.tolerance)
+        print("\n=== COMPARED TO BASELINE ===")
+        print(comparison.to_string(index=False))
+        regressions = comparison[comparison['regression']]
+        if not regressions.empty:
+            print(f"\n❌ {len(regressions)} stage(s) slower than baseline by more than {args.tolerance:.0%}")
+            sys.exit(1)
+        print("\n✅ No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
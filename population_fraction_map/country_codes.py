@@ -0,0 +1,347 @@
+"""
+ISO 3166-1 alpha-3 lookup for country names as written by people and by APIs.
+
+The index is built once at import time: every official name and common alias
+is normalized (accents, case, punctuation, "&" and "the" folded away) and
+stored in a read-only dict, so a lookup is one normalization and one hash
+probe.
+"""
+
+import re
+import unicodedata
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+# (ISO3, name, *aliases). Names follow common English usage; aliases cover the
+# official long forms, older names and the abbreviations APIs tend to return.
+_COUNTRIES = (
+    ("AFG", "Afghanistan"),
+    ("ALA", "Aland Islands", "Åland"),
+    ("ALB", "Albania"),
+    ("DZA", "Algeria"),
+    ("ASM", "American Samoa"),
+    ("AND", "Andorra"),
+    ("AGO", "Angola"),
+    ("AIA", "Anguilla"),
+    ("ATA", "Antarctica"),
+    ("ATG", "Antigua and Barbuda"),
+    ("ARG", "Argentina"),
+    ("ARM", "Armenia"),
+    ("ABW", "Aruba"),
+    ("AUS", "Australia"),
+    ("AUT", "Austria"),
+    ("AZE", "Azerbaijan"),
+    ("BHS", "Bahamas", "Bahamas, The"),
+    ("BHR", "Bahrain"),
+    ("BGD", "Bangladesh"),
+    ("BRB", "Barbados"),
+    ("BLR", "Belarus", "Byelorussia"),
+    ("BEL", "Belgium"),
+    ("BLZ", "Belize"),
+    ("BEN", "Benin"),
+    ("BMU", "Bermuda"),
+    ("BTN", "Bhutan"),
+    ("BOL", "Bolivia", "Bolivia (Plurinational State of)", "Plurinational State of Bolivia"),
+    ("BES", "Bonaire, Sint Eustatius and Saba", "Caribbean Netherlands"),
+    ("BIH", "Bosnia and Herzegovina", "Bosnia"),
+    ("BWA", "Botswana"),
+    ("BVT", "Bouvet Island"),
+    ("BRA", "Brazil"),
+    ("IOT", "British Indian Ocean Territory"),
+    ("VGB", "British Virgin Islands", "Virgin Islands, British"),
+    ("BRN", "Brunei", "Brunei Darussalam"),
+    ("BGR", "Bulgaria"),
+    ("BFA", "Burkina Faso"),
+    ("BDI", "Burundi"),
+    ("CPV", "Cabo Verde", "Cape Verde"),
+    ("KHM", "Cambodia", "Kampuchea"),
+    ("CMR", "Cameroon"),
+    ("CAN", "Canada"),
+    ("CYM", "Cayman Islands"),
+    ("CAF", "Central African Republic", "CAR"),
+    ("TCD", "Chad"),
+    ("CHL", "Chile"),
+    ("CHN", "China", "People's Republic of China", "PRC", "Mainland China"),
+    ("CXR", "Christmas Island"),
+    ("CCK", "Cocos (Keeling) Islands", "Cocos Islands"),
+    ("COL", "Colombia"),
+    ("COM", "Comoros"),
+    ("COG", "Congo", "Republic of the Congo", "Congo, Rep.", "Congo-Brazzaville", "Congo (Brazzaville)"),
+    (
+        "COD",
+        "DR Congo",
+        "Democratic Republic of the Congo",
+        "Congo, Dem. Rep.",
+        "Congo, Democratic Republic of the",
+        "DRC",
+        "Congo-Kinshasa",
+        "Congo (Kinshasa)",
+        "Zaire",
+    ),
+    ("COK", "Cook Islands"),
+    ("CRI", "Costa Rica"),
+    ("CIV", "Cote d'Ivoire", "Côte d'Ivoire", "Ivory Coast"),
+    ("HRV", "Croatia"),
+    ("CUB", "Cuba"),
+    ("CUW", "Curacao", "Curaçao"),
+    ("CYP", "Cyprus"),
+    ("CZE", "Czech Republic", "Czechia"),
+    ("DNK", "Denmark"),
+    ("DJI", "Djibouti"),
+    ("DMA", "Dominica"),
+    ("DOM", "Dominican Republic"),
+    ("ECU", "Ecuador"),
+    ("EGY", "Egypt", "Egypt, Arab Rep."),
+    ("SLV", "El Salvador"),
+    ("GNQ", "Equatorial Guinea"),
+    ("ERI", "Eritrea"),
+    ("EST", "Estonia"),
+    ("SWZ", "Eswatini", "Swaziland"),
+    ("ETH", "Ethiopia"),
+    ("FLK", "Falkland Islands", "Falkland Islands (Malvinas)"),
+    ("FRO", "Faroe Islands", "Faeroe Islands"),
+    ("FJI", "Fiji"),
+    ("FIN", "Finland"),
+    ("FRA", "France"),
+    ("GUF", "French Guiana"),
+    ("PYF", "French Polynesia"),
+    ("ATF", "French Southern Territories"),
+    ("GAB", "Gabon"),
+    ("GMB", "Gambia", "Gambia, The"),
+    ("GEO", "Georgia"),
+    ("DEU", "Germany"),
+    ("GHA", "Ghana"),
+    ("GIB", "Gibraltar"),
+    ("GRC", "Greece"),
+    ("GRL", "Greenland"),
+    ("GRD", "Grenada"),
+    ("GLP", "Guadeloupe"),
+    ("GUM", "Guam"),
+    ("GTM", "Guatemala"),
+    ("GGY", "Guernsey"),
+    ("GIN", "Guinea"),
+    ("GNB", "Guinea-Bissau"),
+    ("GUY", "Guyana"),
+    ("HTI", "Haiti"),
+    ("HMD", "Heard Island and McDonald Islands"),
+    ("VAT", "Vatican City", "Holy See", "Vatican"),
+    ("HND", "Honduras"),
+    ("HKG", "Hong Kong", "Hong Kong SAR", "Hong Kong SAR, China"),
+    ("HUN", "Hungary"),
+    ("ISL", "Iceland"),
+    ("IND", "India"),
+    ("IDN", "Indonesia"),
+    ("IRN", "Iran", "Iran, Islamic Rep.", "Iran (Islamic Republic of)", "Islamic Republic of Iran"),
+    ("IRQ", "Iraq"),
+    ("IRL", "Ireland"),
+    ("IMN", "Isle of Man"),
+    ("ISR", "Israel"),
+    ("ITA", "Italy"),
+    ("JAM", "Jamaica"),
+    ("JPN", "Japan"),
+    ("JEY", "Jersey"),
+    ("JOR", "Jordan"),
+    ("KAZ", "Kazakhstan"),
+    ("KEN", "Kenya"),
+    ("KIR", "Kiribati"),
+    (
+        "PRK",
+        "North Korea",
+        "Korea, Dem. People's Rep.",
+        "Korea, Democratic People's Republic of",
+        "Democratic People's Republic of Korea",
+        "DPRK",
+    ),
+    ("KOR", "South Korea", "Korea, Rep.", "Korea, Republic of", "Republic of Korea", "Korea"),
+    ("XKX", "Kosovo"),
+    ("KWT", "Kuwait"),
+    ("KGZ", "Kyrgyzstan", "Kyrgyz Republic"),
+    ("LAO", "Laos", "Lao PDR", "Lao People's Democratic Republic"),
+    ("LVA", "Latvia"),
+    ("LBN", "Lebanon"),
+    ("LSO", "Lesotho"),
+    ("LBR", "Liberia"),
+    ("LBY", "Libya"),
+    ("LIE", "Liechtenstein"),
+    ("LTU", "Lithuania"),
+    ("LUX", "Luxembourg"),
+    ("MAC", "Macao", "Macau", "Macao SAR, China"),
+    ("MDG", "Madagascar"),
+    ("MWI", "Malawi"),
+    ("MYS", "Malaysia"),
+    ("MDV", "Maldives"),
+    ("MLI", "Mali"),
+    ("MLT", "Malta"),
+    ("MHL", "Marshall Islands"),
+    ("MTQ", "Martinique"),
+    ("MRT", "Mauritania"),
+    ("MUS", "Mauritius"),
+    ("MYT", "Mayotte"),
+    ("MEX", "Mexico"),
+    ("FSM", "Micronesia", "Micronesia, Fed. Sts.", "Federated States of Micronesia"),
+    ("MDA", "Moldova", "Republic of Moldova"),
+    ("MCO", "Monaco"),
+    ("MNG", "Mongolia"),
+    ("MNE", "Montenegro"),
+    ("MSR", "Montserrat"),
+    ("MAR", "Morocco"),
+    ("MOZ", "Mozambique"),
+    ("MMR", "Myanmar", "Burma"),
+    ("NAM", "Namibia"),
+    ("NRU", "Nauru"),
+    ("NPL", "Nepal"),
+    ("NLD", "Netherlands", "Holland"),
+    ("NCL", "New Caledonia"),
+    ("NZL", "New Zealand"),
+    ("NIC", "Nicaragua"),
+    ("NER", "Niger"),
+    ("NGA", "Nigeria"),
+    ("NIU", "Niue"),
+    ("NFK", "Norfolk Island"),
+    ("MKD", "North Macedonia", "Macedonia", "FYROM", "Republic of North Macedonia"),
+    ("MNP", "Northern Mariana Islands"),
+    ("NOR", "Norway"),
+    ("OMN", "Oman"),
+    ("PAK", "Pakistan"),
+    ("PLW", "Palau"),
+    ("PSE", "Palestine", "State of Palestine", "West Bank and Gaza", "Palestinian Territories"),
+    ("PAN", "Panama"),
+    ("PNG", "Papua New Guinea"),
+    ("PRY", "Paraguay"),
+    ("PER", "Peru"),
+    ("PHL", "Philippines"),
+    ("PCN", "Pitcairn", "Pitcairn Islands"),
+    ("POL", "Poland"),
+    ("PRT", "Portugal"),
+    ("PRI", "Puerto Rico"),
+    ("QAT", "Qatar"),
+    ("REU", "Reunion", "Réunion"),
+    ("ROU", "Romania", "Rumania"),
+    ("RUS", "Russia", "Russian Federation"),
+    ("RWA", "Rwanda"),
+    ("BLM", "Saint Barthelemy", "Saint Barthélemy"),
+    ("SHN", "Saint Helena", "Saint Helena, Ascension and Tristan da Cunha"),
+    ("KNA", "Saint Kitts and Nevis", "St. Kitts and Nevis", "Saint Kitts & Nevis"),
+    ("LCA", "Saint Lucia", "St. Lucia"),
+    ("MAF", "Saint Martin", "Saint Martin (French part)"),
+    ("SPM", "Saint Pierre and Miquelon"),
+    (
+        "VCT",
+        "Saint Vincent and the Grenadines",
+        "St. Vincent and the Grenadines",
+        "Saint Vincent & the Grenadines",
+    ),
+    ("WSM", "Samoa"),
+    ("SMR", "San Marino"),
+    ("STP", "Sao Tome and Principe", "São Tomé and Príncipe", "Sao Tome & Principe"),
+    ("SAU", "Saudi Arabia"),
+    ("SEN", "Senegal"),
+    ("SRB", "Serbia"),
+    ("SYC", "Seychelles"),
+    ("SLE", "Sierra Leone"),
+    ("SGP", "Singapore"),
+    ("SXM", "Sint Maarten", "Sint Maarten (Dutch part)"),
+    ("SVK", "Slovakia", "Slovak Republic"),
+    ("SVN", "Slovenia"),
+    ("SLB", "Solomon Islands"),
+    ("SOM", "Somalia"),
+    ("ZAF", "South Africa"),
+    ("SGS", "South Georgia and the South Sandwich Islands"),
+    ("SSD", "South Sudan"),
+    ("ESP", "Spain"),
+    ("LKA", "Sri Lanka", "Ceylon"),
+    ("SDN", "Sudan"),
+    ("SUR", "Suriname", "Surinam"),
+    ("SJM", "Svalbard and Jan Mayen"),
+    ("SWE", "Sweden"),
+    ("CHE", "Switzerland"),
+    ("SYR", "Syria", "Syrian Arab Republic"),
+    ("TWN", "Taiwan", "Taiwan, China", "Republic of China", "Chinese Taipei"),
+    ("TJK", "Tajikistan"),
+    ("TZA", "Tanzania", "United Republic of Tanzania"),
+    ("THA", "Thailand"),
+    ("TLS", "Timor-Leste", "East Timor"),
+    ("TGO", "Togo"),
+    ("TKL", "Tokelau"),
+    ("TON", "Tonga"),
+    ("TTO", "Trinidad and Tobago"),
+    ("TUN", "Tunisia"),
+    ("TUR", "Turkey", "Türkiye", "Turkiye"),
+    ("TKM", "Turkmenistan"),
+    ("TCA", "Turks and Caicos Islands"),
+    ("TUV", "Tuvalu"),
+    ("UGA", "Uganda"),
+    ("UKR", "Ukraine"),
+    ("ARE", "United Arab Emirates", "UAE"),
+    ("GBR", "United Kingdom", "UK", "Great Britain", "Britain", "United Kingdom of Great Britain and Northern Ireland"),
+    ("USA", "United States", "United States of America", "USA", "US", "U.S.", "America"),
+    ("UMI", "United States Minor Outlying Islands"),
+    ("URY", "Uruguay"),
+    ("VIR", "U.S. Virgin Islands", "Virgin Islands (U.S.)", "United States Virgin Islands"),
+    ("UZB", "Uzbekistan"),
+    ("VUT", "Vanuatu"),
+    ("VEN", "Venezuela", "Venezuela, RB", "Bolivarian Republic of Venezuela"),
+    ("VNM", "Vietnam", "Viet Nam"),
+    ("WLF", "Wallis and Futuna"),
+    ("ESH", "Western Sahara"),
+    ("YEM", "Yemen", "Yemen, Rep."),
+    ("ZMB", "Zambia"),
+    ("ZWE", "Zimbabwe"),
+)
+
+_PARENTHESIZED = re.compile(r"\(([^)]*)\)")
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_country_name(name: str) -> str:
+    """
+    Fold a country name to the key used by the index.
+
+    Accents are stripped, case is folded, "&" becomes "and", "St." becomes
+    "saint", and punctuation and the word "the" are dropped, so "São Tomé &
+    Príncipe" and "Sao Tome and Principe" share one key.
+    """
+    decomposed = unicodedata.normalize('NFKD', name)
+    ascii_name = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    folded = ascii_name.casefold().replace('&', ' and ').replace("'", '')
+    words = _NON_ALNUM.sub(' ', folded).split()
+    words = ['saint' if w == 'st' else w for w in words if w != 'the']
+    return ' '.join(words)
+
+
+def _build_index() -> Mapping[str, str]:
+    index = {}
+    for iso3, *names in _COUNTRIES:
+        for name in (iso3, *names):
+            key = normalize_country_name(name)
+            if index.setdefault(key, iso3) != iso3:
+                raise ValueError(f"{name!r} is listed for both {index[key]} and {iso3}")
+            # "Congo (Brazzaville)" should also match without the parenthetical
+            bare = normalize_country_name(_PARENTHESIZED.sub('', name))
+            if bare and bare != key:
+                index.setdefault(bare, iso3)
+    return MappingProxyType(index)
+
+
+ISO3_INDEX: Mapping[str, str] = _build_index()
+
+# Every listed name and alias, as written, mapped to its ISO3 code
+ISO3_BY_NAME: Mapping[str, str] = MappingProxyType({name: iso3 for iso3, *names in _COUNTRIES for name in names})
+
+# Canonical display name for every ISO3 code in the index
+ISO3_NAMES: Mapping[str, str] = MappingProxyType({iso3: name for iso3, name, *_ in _COUNTRIES})
+
+
+def lookup_iso3(name: Optional[str]) -> Optional[str]:
+    """
+    Return the ISO3 code for a country name or alias, or None if it is not known.
+
+    Args:
+        name: Country name in any common spelling (or an ISO3 code)
+
+    Returns:
+        ISO 3166-1 alpha-3 code, or None
+    """
+    if not name:
+        return None
+    return ISO3_INDEX.get(normalize_country_name(name))
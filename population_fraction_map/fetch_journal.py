@@ -0,0 +1,99 @@
+"""
+Durable journal of fetched country payloads, so interrupted runs can resume.
+
+Each successful country is appended to a JSON-lines file and fsynced before the
+fetch moves on, so a crash or kill loses at most the request in flight. A
+resumed run reads the journal back and only requests the countries that are not
+in it yet. The pipeline deletes the journal once the run's history is saved.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Union
+
+import pandas as pd
+from history_store import CountryPayload
+
+DEFAULT_JOURNAL_PATH = Path(__file__).parent / '.cache' / 'fetch_journal.jsonl'
+
+
+class FetchJournal:
+    """Append-only record of the countries a run has fetched so far."""
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_JOURNAL_PATH, resume: bool = True, fsync: bool = True):
+        """
+        Args:
+            path: Journal file (created along with its directory if missing)
+            resume: Keep the payloads already in the journal (False starts a fresh one)
+            fsync: Force every entry to disk before returning (disable for throwaway runs)
+        """
+        self.path = Path(path)
+        self.fsync = fsync
+        self.completed: Dict[str, CountryPayload] = {}
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if resume and self.path.exists():
+            self._replay()
+        else:
+            self.path.write_bytes(b'')
+        self._file = open(self.path, 'ab')
+
+    def _replay(self) -> None:
+        """Load the journal's entries, dropping a line torn by a crash mid-write."""
+        data = self.path.read_bytes()
+        good = 0
+        for line in data.splitlines(keepends=True):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            if not line.endswith(b'\n'):
+                break
+            self.completed[entry['query']] = (
+                entry['country_name'],
+                entry['country_code'],
+                entry['query'],
+                pd.Timestamp(entry['fetched_at']),
+                entry['historical_population'],
+            )
+            good += len(line)
+        if good < len(data):
+            with open(self.path, 'r+b') as f:
+                f.truncate(good)
+
+    def __contains__(self, country: str) -> bool:
+        return country in self.completed
+
+    def __len__(self) -> int:
+        return len(self.completed)
+
+    def record(self, payload: CountryPayload) -> None:
+        """Durably append one country's payload (see history_store.CountryPayload)."""
+        country_name, country_code, query, fetched_at, historical_population = payload
+        entry = {
+            'query': query,
+            'country_name': country_name,
+            'country_code': country_code,
+            'fetched_at': fetched_at.isoformat(),
+            'historical_population': historical_population,
+        }
+        line = json.dumps(entry).encode() + b'\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.completed[query] = payload
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self) -> 'FetchJournal':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,184 @@
+"""
+Raw historical population store and incremental refresh planning.
+
+The map pipeline used to keep only the derived fractions. This module persists
+the raw (country, year, population) rows fetched from the API, tagged with the
+name they were queried under and when they were fetched, so a refresh can
+re-request just the countries that are missing or stale and merge them in.
+
+The store is an uncompressed Feather (Arrow IPC) file with compact typed
+columns: categorical names and codes, int16 years and int64 populations.
+Reading it memory-maps the file, so numeric columns are not copied.
+"""
+
+from pathlib import Path
+from typing import Iterable, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+DEFAULT_HISTORY_PATH = Path(__file__).parent / 'population_history.feather'
+
+HISTORY_COLUMNS = ['country', 'country_code', 'year', 'population', 'query', 'fetched_at']
+
+HISTORY_DTYPES = {
+    'country': 'category',
+    'country_code': 'category',
+    'year': 'int16',
+    'population': 'int64',
+    'query': 'category',
+    'fetched_at': 'datetime64[ns, UTC]',
+}
+
+# (country_name, country_code, query, fetched_at, historical_population) for one country
+CountryPayload = Tuple[str, Optional[str], str, pd.Timestamp, list]
+
+
+def with_history_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Select HISTORY_COLUMNS and cast them to the store's compact dtypes."""
+    return df[HISTORY_COLUMNS].astype(HISTORY_DTYPES)
+
+
+def empty_history() -> pd.DataFrame:
+    """An empty history frame with the expected columns and dtypes."""
+    return with_history_dtypes(pd.DataFrame(columns=HISTORY_COLUMNS))
+
+
+def build_history(payloads: Iterable[CountryPayload]) -> pd.DataFrame:
+    """
+    Build the typed history frame straight from per-country API payloads.
+
+    Years and populations are read into NumPy arrays in one pass, and per-country
+    fields become categoricals by repeating their codes, so no per-row Python
+    objects are created.
+
+    Args:
+        payloads: One CountryPayload per successfully fetched country
+
+    Returns:
+        DataFrame with HISTORY_COLUMNS and HISTORY_DTYPES
+    """
+    payloads = list(payloads)
+    if not payloads:
+        return empty_history()
+
+    lengths = np.fromiter((len(p[4]) for p in payloads), dtype=np.int64, count=len(payloads))
+    n_rows = int(lengths.sum())
+    rows = np.repeat(np.arange(len(payloads)), lengths)
+
+    def per_country(field: int) -> pd.Categorical:
+        values = pd.Categorical([p[field] for p in payloads])
+        return pd.Categorical.from_codes(values.codes[rows], dtype=values.dtype)
+
+    fetched_at = pd.DatetimeIndex([p[3] for p in payloads]).as_unit('ns')
+    df = pd.DataFrame(
+        {
+            'country': per_country(0),
+            'country_code': per_country(1),
+            'year': np.fromiter((y['year'] for p in payloads for y in p[4]), dtype=np.int16, count=n_rows),
+            'population': np.fromiter(
+                (y['population'] for p in payloads for y in p[4]), dtype=np.int64, count=n_rows
+            ),
+            'query': per_country(2),
+            'fetched_at': fetched_at[rows],
+        }
+    )
+    return with_history_dtypes(df)
+
+
+def load_history_table(path: Union[str, Path] = DEFAULT_HISTORY_PATH) -> pa.Table:
+    """
+    Memory-map the raw history store as an Arrow table.
+
+    Analyses that can work on Arrow data read the full history this way without
+    copying it into process memory.
+    """
+    return feather.read_table(path, memory_map=True)
+
+
+def load_history(path: Union[str, Path] = DEFAULT_HISTORY_PATH) -> pd.DataFrame:
+    """
+    Load the raw history store.
+
+    Args:
+        path: History file written by save_history
+
+    Returns:
+        DataFrame with HISTORY_COLUMNS (empty if the file does not exist yet)
+    """
+    path = Path(path)
+    if not path.exists():
+        return empty_history()
+    # The file is one record batch already in the store's dtypes, so split_blocks lets pandas wrap the
+    # memory-mapped numeric buffers directly; casting here would copy every column
+    return load_history_table(path).to_pandas(split_blocks=True)
+
+
+def save_history(df: pd.DataFrame, path: Union[str, Path] = DEFAULT_HISTORY_PATH) -> None:
+    """Write the raw history store, replacing any previous file."""
+    # Uncompressed and in a single record batch so that reads can be memory-mapped without copies
+    df = with_history_dtypes(df).reset_index(drop=True)
+    feather.write_feather(df, path, compression='uncompressed', chunksize=max(len(df), 1))
+
+
+def countries_to_refresh(
+    countries: list[str],
+    history: pd.DataFrame,
+    fractions: Optional[pd.DataFrame] = None,
+    max_age: Optional[float] = None,
+    now: Optional[pd.Timestamp] = None,
+) -> list[str]:
+    """
+    Decide which countries an incremental run has to fetch.
+
+    A country is refreshed when it has no rows in the history (never fetched, or
+    failed last time), when its rows never made it into the fractions CSV, or
+    when it was fetched more than `max_age` seconds ago.
+
+    Args:
+        countries: Country names as they are queried from the API
+        history: Raw history store (see load_history)
+        fractions: Previously written population_fractions.csv, if any
+        max_age: Freshness window in seconds (None = never stale)
+        now: Reference time for staleness (defaults to the current time)
+
+    Returns:
+        The subset of `countries` to fetch, in their original order
+    """
+    if history.empty:
+        return list(countries)
+
+    last_fetched = history.groupby('query', observed=True)['fetched_at'].max()
+    stale = set()
+    if max_age is not None:
+        now = now if now is not None else pd.Timestamp.now(tz='UTC')
+        stale = set(last_fetched.index[last_fetched < now - pd.Timedelta(seconds=max_age)])
+
+    missing_output = set()
+    if fractions is not None:
+        names = history.drop_duplicates('query').set_index('query')['country'].astype(str)
+        missing_output = set(names.index[~names.isin(fractions['country'].astype(str))])
+
+    return [c for c in countries if c not in last_fetched.index or c in stale or c in missing_output]
+
+
+def merge_history(history: pd.DataFrame, fresh: pd.DataFrame) -> pd.DataFrame:
+    """
+    Replace the stored rows of every successfully re-fetched country with the new ones.
+
+    Countries that failed again keep their previous rows, so a transient error
+    never removes a country from the map.
+
+    Args:
+        history: Existing raw history store
+        fresh: Rows returned by fetch_all_country_data for this run
+
+    Returns:
+        Merged history with HISTORY_COLUMNS and HISTORY_DTYPES
+    """
+    kept = history[~history['query'].isin(fresh['query'].unique())]
+    # Concatenating categoricals with different categories falls back to object, so re-type afterwards
+    merged = pd.concat([kept[HISTORY_COLUMNS], fresh[HISTORY_COLUMNS]], ignore_index=True)
+    return with_history_dtypes(merged)
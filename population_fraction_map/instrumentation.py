@@ -0,0 +1,194 @@
+"""
+Run instrumentation for the population pipeline.
+
+PipelineMetrics collects one record per country request (latency, status,
+retries, bytes, cache hit) and one per pipeline stage (wall time). Every
+record can be streamed to a JSON-lines file as it happens, and summary_table()
+renders latency histograms and totals at the end of a run.
+"""
+
+import bisect
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Union
+
+import requests
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+
+def wire_bytes(response: requests.Response) -> int:
+    """
+    Bytes of the response body as transferred, before any gzip/deflate decoding.
+
+    Uses the Content-Length header when the server sent one, otherwise the number
+    of bytes urllib3 pulled off the socket, and only falls back to the decoded body
+    size when neither is available.
+    """
+    length = response.headers.get('Content-Length')
+    if length is not None and length.isdigit():
+        return int(length)
+    body = response.content  # drain the raw stream so its byte count is final
+    tell = getattr(response.raw, 'tell', None)
+    if tell is not None:
+        try:
+            return int(tell())
+        except (OSError, TypeError, ValueError):
+            pass
+    return len(body)
+
+
+class PipelineMetrics:
+    """Thread-safe collector of request and stage measurements."""
+
+    def __init__(self, events_path: Optional[Union[str, Path]] = None):
+        """
+        Args:
+            events_path: JSON-lines file to append every event to (None keeps them in memory only)
+        """
+        self._lock = threading.Lock()
+        self._events = open(events_path, 'a', encoding='utf-8') if events_path is not None else None
+        self.latencies: list[float] = []
+        self.network_latencies: list[float] = []
+        self.status_counts: Counter = Counter()
+        self.retries = 0
+        self.cache_hits = 0
+        self.bytes_received = 0
+        self.stage_seconds: Dict[str, float] = {}
+
+    def emit(self, event: Dict) -> None:
+        """Write one event as a JSON line (if an events file is configured)."""
+        if self._events is None:
+            return
+        line = json.dumps({'ts': time.time(), **event})
+        with self._lock:
+            self._events.write(line + '\n')
+            self._events.flush()
+
+    def record_request(
+        self,
+        country: str,
+        latency: float,
+        status: Optional[int] = None,
+        retries: int = 0,
+        bytes_received: int = 0,
+        cache_hit: bool = False,
+        offline_miss: bool = False,
+    ) -> None:
+        """
+        Record the outcome of one get_population_data_for_country call.
+
+        Args:
+            country: Country queried
+            latency: Wall time of the call in seconds, including retries and throttling
+            status: Final HTTP status, or None if no response was received
+            retries: Retries spent on this country
+            bytes_received: Response body size on the wire, before decompression (see wire_bytes)
+            cache_hit: Whether the payload came from the on-disk cache
+            offline_miss: Whether the cache had no payload and offline mode skipped the request
+        """
+        with self._lock:
+            self.latencies.append(latency)
+            if cache_hit:
+                self.cache_hits += 1
+                self.status_counts['cache'] += 1
+            elif offline_miss:
+                self.status_counts['offline'] += 1
+            else:
+                self.network_latencies.append(latency)
+                self.status_counts[str(status) if status is not None else 'error'] += 1
+            self.retries += retries
+            self.bytes_received += bytes_received
+        self.emit(
+            {
+                'event': 'request',
+                'country': country,
+                'latency': latency,
+                'status': status,
+                'retries': retries,
+                'bytes': bytes_received,
+                'cache_hit': cache_hit,
+                'offline_miss': offline_miss,
+            }
+        )
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a pipeline stage (fetch, compute, render, write, ...)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+            self.emit({'event': 'stage', 'stage': name, 'seconds': seconds})
+
+    def latency_histogram(self, network_only: bool = True) -> Dict[str, int]:
+        """Request counts per LATENCY_BUCKETS bucket, labelled by upper bound."""
+        counts = [0] * len(LATENCY_BUCKETS)
+        for latency in self.network_latencies if network_only else self.latencies:
+            counts[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+        labels = [f"<={bound:g}s" for bound in LATENCY_BUCKETS[:-1]] + [f">{LATENCY_BUCKETS[-2]:g}s"]
+        return dict(zip(labels, counts))
+
+    def summary(self) -> Dict:
+        """Totals, latency percentiles and stage times for the run so far."""
+        network = sorted(self.network_latencies)
+
+        def percentile(q: float) -> Optional[float]:
+            if not network:
+                return None
+            return network[min(len(network) - 1, int(q * len(network)))]
+
+        return {
+            'requests': len(self.latencies),
+            'cache_hits': self.cache_hits,
+            'retries': self.retries,
+            'bytes_received': self.bytes_received,
+            'status_counts': dict(self.status_counts),
+            'latency_p50': percentile(0.5),
+            'latency_p95': percentile(0.95),
+            'latency_max': network[-1] if network else None,
+            'latency_histogram': self.latency_histogram(),
+            'stage_seconds': dict(self.stage_seconds),
+        }
+
+    def summary_table(self) -> str:
+        """Human-readable run summary."""
+        summary = self.summary()
+        lines = ["Stage wall times:"]
+        for stage, seconds in summary['stage_seconds'].items():
+            lines.append(f"  {stage:<12} {seconds:>9.3f}s")
+        lines.append("")
+        lines.append(
+            f"Requests: {summary['requests']}  cache hits: {summary['cache_hits']}  "
+            f"retries: {summary['retries']}  bytes: {summary['bytes_received']:,}"
+        )
+        lines.append("Status codes: " + ", ".join(f"{k}={v}" for k, v in sorted(summary['status_counts'].items())))
+        if summary['latency_p50'] is not None:
+            lines.append(
+                f"Network latency: p50 {summary['latency_p50'] * 1000:.0f} ms, "
+                f"p95 {summary['latency_p95'] * 1000:.0f} ms, max {summary['latency_max'] * 1000:.0f} ms"
+            )
+            peak = max(summary['latency_histogram'].values())
+            for bucket, n in summary['latency_histogram'].items():
+                bar = '█' * round(30 * n / peak) if peak else ''
+                lines.append(f"  {bucket:>8} {n:>6} {bar}")
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        if self._events is not None:
+            self._events.close()
+            self._events = None
+
+    def __enter__(self) -> 'PipelineMetrics':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,157 @@
+"""
+Local stand-in for the API Ninjas population endpoint.
+
+Serves deterministic synthetic histories for any country name, with configurable
+latency, transient error rate and 429 throttling, so the fetch path can be
+benchmarked and exercised without an API key or network access:
+
+    with MockApiServer(latency=0.02, throttle_rate=0.05) as server:
+        df = fetch_all_country_data(countries, 'any-key', base_url=server.url)
+"""
+
+import json
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+LAST_YEAR = 2023
+
+
+def mock_payload(country: str, n_years: int = 50) -> Dict:
+    """
+    Synthetic API Ninjas payload for a country, the same on every call.
+
+    Populations follow a random walk seeded from the name, so peaks land in
+    different years for different countries.
+
+    Args:
+        country: Country name as queried
+        n_years: Years of history to return
+
+    Returns:
+        Dictionary shaped like the live API response
+    """
+    rng = np.random.default_rng(zlib.crc32(country.encode()))
+    base = rng.integers(10_000, 100_000_000)
+    populations = (base * np.exp(rng.normal(0.01, 0.02, size=n_years).cumsum())).astype(np.int64)
+    history = [
+        {'year': LAST_YEAR - i, 'population': int(population)} for i, population in enumerate(populations[::-1])
+    ]
+    return {'country_name': country, 'historical_population': history}
+
+
+class MockPopulationHandler(BaseHTTPRequestHandler):
+    """Answers /v1/population requests according to the owning server's settings."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        country = parse_qs(urlparse(self.path).query).get('country', [''])[0]
+        if server.latency:
+            time.sleep(server.latency)
+
+        status, body, headers = server.respond(country)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockApiServer(ThreadingHTTPServer):
+    """Threaded mock population API, run in the background as a context manager."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        throttle_rate: float = 0.0,
+        retry_after: float = 0.0,
+        n_years: int = 50,
+        seed: int = 0,
+        host: str = '127.0.0.1',
+        port: int = 0,
+    ):
+        """
+        Args:
+            latency: Seconds to wait before answering each request
+            error_rate: Fraction of requests answered with `error_status`
+            error_status: Status code used for injected errors (503 is retried by RateLimiter)
+            throttle_rate: Fraction of requests answered with 429
+            retry_after: Retry-After seconds sent with each 429
+            n_years: Years of history per country
+            seed: Seed for the error and throttle draws
+            host: Interface to bind
+            port: Port to bind (0 picks a free one)
+        """
+        super().__init__((host, port), MockPopulationHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.n_years = n_years
+        self.status_counts: Counter = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """Population endpoint URL to pass as base_url."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1/population"
+
+    def respond(self, country: str) -> tuple[int, bytes, Dict[str, str]]:
+        """Pick the status, body and headers for one request."""
+        with self._lock:
+            draw = self._random.random()
+        if draw < self.throttle_rate:
+            status, body, headers = 429, b'', {'Retry-After': f"{self.retry_after:g}"}
+        elif draw < self.throttle_rate + self.error_rate:
+            status, body, headers = self.error_status, b'', {}
+        else:
+            body = json.dumps(mock_payload(country, self.n_years)).encode()
+            status, headers = 200, {'Content-Type': 'application/json'}
+        with self._lock:
+            self.status_counts[status] += 1
+        return status, body, headers
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-response (e.g. on timeout) are expected
+        pass
+
+    def start(self) -> 'MockApiServer':
+        """Serve requests from a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and release the port."""
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+    def __enter__(self) -> 'MockApiServer':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -0,0 +1,140 @@
+"""
+On-disk cache of API Ninjas payloads.
+
+Historical populations change at most once a year, so after the first run the
+map can be re-rendered entirely from this cache. Entries are stored in SQLite
+under a content address derived from the endpoint and the country name, along
+with the time they were fetched and the ETag the server sent (if any).
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Union
+
+DEFAULT_CACHE_PATH = Path(__file__).parent / '.cache' / 'population_api.sqlite'
+
+# Entries older than this are re-validated against the API (30 days)
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    country TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    etag TEXT,
+    fetched_at REAL NOT NULL
+)
+"""
+
+
+class CachedResponse(NamedTuple):
+    payload: Dict
+    etag: Optional[str]
+    fetched_at: float
+
+
+def cache_key(endpoint: str, country: str) -> str:
+    """Content address for a country's payload from a given endpoint."""
+    normalized = f"{endpoint.rstrip('/')}\n{country.strip().casefold()}"
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    Thread-safe SQLite cache of JSON payloads with TTL and ETag metadata.
+
+    Modes:
+        default: serve fresh entries locally, re-fetch stale or missing ones
+        refresh: always go to the API (still sending the ETag so unchanged data costs a 304)
+        offline: never go to the API; serve whatever is cached, however old
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path] = DEFAULT_CACHE_PATH,
+        max_age: Optional[float] = DEFAULT_MAX_AGE,
+        refresh: bool = False,
+        offline: bool = False,
+    ):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+            max_age: Seconds an entry stays fresh, or None to never expire
+            refresh: Ignore cached entries when deciding whether to fetch
+            offline: Only ever serve from the cache
+        """
+        if refresh and offline:
+            raise ValueError("refresh and offline modes are mutually exclusive")
+        self.path = Path(path)
+        self.max_age = max_age
+        self.refresh = refresh
+        self.offline = offline
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(_SCHEMA)
+
+    def get(self, endpoint: str, country: str) -> Optional[CachedResponse]:
+        """Return the cached entry for a country, fresh or not, or None if absent."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, etag, fetched_at FROM responses WHERE key = ?", (cache_key(endpoint, country),)
+            ).fetchone()
+        if row is None:
+            return None
+        payload, etag, fetched_at = row
+        return CachedResponse(json.loads(payload), etag, fetched_at)
+
+    def is_fresh(self, entry: CachedResponse) -> bool:
+        """Whether an entry is young enough to be served without asking the API."""
+        return self.max_age is None or time.time() - entry.fetched_at <= self.max_age
+
+    def lookup(self, endpoint: str, country: str) -> Optional[Dict]:
+        """
+        Return a payload that may be served without a request, honoring the cache mode.
+
+        Args:
+            endpoint: API endpoint the payload came from
+            country: Country name as queried
+
+        Returns:
+            The cached payload, or None if the API should be asked
+        """
+        if self.refresh:
+            return None
+        entry = self.get(endpoint, country)
+        if entry is not None and (self.offline or self.is_fresh(entry)):
+            return entry.payload
+        return None
+
+    def put(self, endpoint: str, country: str, payload: Dict, etag: Optional[str] = None) -> None:
+        """Store a payload, stamping it with the current time."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, country, payload, etag, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (cache_key(endpoint, country), endpoint, country, json.dumps(payload), etag, time.time()),
+            )
+
+    def touch(self, endpoint: str, country: str) -> None:
+        """Mark an entry as just re-validated (e.g. after a 304 Not Modified)."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE responses SET fetched_at = ? WHERE key = ?", (time.time(), cache_key(endpoint, country))
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> 'ResponseCache':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
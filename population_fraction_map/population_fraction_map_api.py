@@ -1,16 +1,59 @@
+import argparse
 import os
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Iterator, Mapping, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 import requests
+from plotly.offline import get_plotlyjs
+from requests.adapters import HTTPAdapter
+
+from country_codes import ISO3_BY_NAME, lookup_iso3
+from fetch_journal import DEFAULT_JOURNAL_PATH, FetchJournal
+from history_store import (
+    DEFAULT_HISTORY_PATH,
+    CountryPayload,
+    build_history,
+    countries_to_refresh,
+    load_history,
+    merge_history,
+    save_history,
+)
+from instrumentation import PipelineMetrics, wire_bytes
+from population_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_AGE, ResponseCache
+from rate_limiter import DEFAULT_RATE, RateLimiter
+from streaming_fractions import build_fractions_frame, reduce_population_history
 
 # API Configuration
 API_KEY = os.getenv("API_NINJAS_API_KEY")
 API_BASE_URL = "https://api.api-ninjas.com/v1/population"
 
+# Number of requests kept in flight when fetching in parallel
+DEFAULT_MAX_WORKERS = 8
+
+# Seconds to wait for the API to connect and to answer
+REQUEST_TIMEOUT = 10
+
+# Where the shared plotly.js bundle (and optional topojson files) live for the 'shared' map format
+DEFAULT_ASSET_DIR = Path(__file__).parent / 'assets'
+
+# Ways a map can be written: self-contained HTML, HTML sharing one plotly.js bundle,
+# figure JSON only, or a static image (static images need the kaleido package)
+MAP_FORMATS = ('html', 'shared', 'json', 'png', 'svg')
+
+# Hover columns in the order plotly express packs them into each trace's customdata
+MAP_HOVER_DATA = {
+    'country_code': False,
+    'population_fraction': ':.3f',
+    'current_population': ':,.0f',
+    'peak_population': ':,.0f',
+}
+
 # List of countries to query (you can expand this list)
 # Using a mix of full names and ISO codes
 COUNTRIES = [
@@ -214,170 +257,361 @@ COUNTRIES = [
 ]
 
 
-def get_population_data_for_country(country_name: str, api_key: str) -> Dict:
+def create_session(pool_size: int = DEFAULT_MAX_WORKERS) -> requests.Session:
+    """
+    Create a keep-alive HTTP session whose connection pool fits the worker count.
+
+    Args:
+        pool_size: Maximum connections kept open per host (one per concurrent worker)
+
+    Returns:
+        Session that reuses TCP/TLS connections across requests
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive'})
+    return session
+
+
+def connection_stats(session: requests.Session) -> Dict[str, int]:
+    """
+    Count the connections a session opened and the requests that reused one.
+
+    Args:
+        session: Session created by create_session (or any requests.Session)
+
+    Returns:
+        Dictionary with 'requests', 'new_connections' and 'reused_connections'
+    """
+    n_requests = 0
+    n_connections = 0
+    for adapter in set(session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            n_requests += pool.num_requests
+            n_connections += pool.num_connections
+    return {
+        'requests': n_requests,
+        'new_connections': n_connections,
+        'reused_connections': n_requests - n_connections,
+    }
+
+
+def get_population_data_for_country(
+    country_name: str,
+    api_key: str,
+    base_url: str = API_BASE_URL,
+    limiter: Optional[RateLimiter] = None,
+    cache: Optional[ResponseCache] = None,
+    session: Optional[requests.Session] = None,
+    timeout: float = REQUEST_TIMEOUT,
+    metrics: Optional[PipelineMetrics] = None,
+) -> Dict:
     """
     Fetch historical population data for a single country from API Ninjas.
 
+    Throttled (429) and transient responses are retried by the rate limiter, so a
+    country is only dropped once its retry budget is spent. When a cache is given,
+    fresh entries are served without touching the network and stale ones are
+    re-validated with their ETag.
+
     Args:
         country_name: Name of the country
         api_key: API key for API Ninjas
+        base_url: Population endpoint to query (override to point at a local stand-in server)
+        limiter: Rate limiter shared across requests (a private one is used if omitted)
+        cache: On-disk response cache to consult before (and update after) requesting
+        session: Pooled session to send the request on (see create_session)
+        timeout: Seconds to wait for the connection and for the response
+        metrics: Collector to record this request's latency, status, retries and size in
 
     Returns:
         Dictionary with country data or None if request fails
     """
-    headers = {'X-Api-Key': api_key}
-    params = {'country': country_name}
+    start = time.perf_counter()
+    outcome = {'status': None, 'retries': 0, 'bytes_received': 0, 'cache_hit': False, 'offline_miss': False}
 
-    try:
-        response = requests.get(API_BASE_URL, headers=headers, params=params)
+    def count_retry(status: Optional[int]) -> None:
+        outcome['retries'] += 1
 
-        if response.status_code == 200:
-            data = response.json()
-            if data and 'country_name' in data:
+    try:
+        cached = None
+        if cache is not None:
+            data = cache.lookup(base_url, country_name)
+            if data is not None:
+                outcome['cache_hit'] = True
                 return data
+            if cache.offline:
+                outcome['offline_miss'] = True
+                print(f"  ⚠️  No cached data for {country_name} (offline)")
+                return None
+            cached = cache.get(base_url, country_name)
+
+        headers = {'X-Api-Key': api_key}
+        params = {'country': country_name}
+        if cached is not None and cached.etag:
+            headers['If-None-Match'] = cached.etag
+        limiter = limiter or RateLimiter()
+
+        try:
+            response = limiter.get(
+                base_url, session=session, on_retry=count_retry, headers=headers, params=params, timeout=timeout
+            )
+            outcome['status'] = response.status_code
+            outcome['bytes_received'] = wire_bytes(response)
+
+            if response.status_code == 304 and cached is not None:
+                cache.touch(base_url, country_name)
+                return cached.payload
+
+            if response.status_code == 200:
+                data = response.json()
+                if data and 'country_name' in data:
+                    if cache is not None:
+                        cache.put(base_url, country_name, data, response.headers.get('ETag'))
+                    return data
+                else:
+                    print(f"  ⚠️  No data returned for {country_name}")
+                    return None
             else:
-                print(f"  ⚠️  No data returned for {country_name}")
+                print(f"  ❌ Error {response.status_code} for {country_name}")
                 return None
-        else:
-            print(f"  ❌ Error {response.status_code} for {country_name}")
+
+        except Exception as e:
+            print(f"  ❌ Exception for {country_name}: {str(e)}")
             return None
+    finally:
+        if metrics is not None:
+            metrics.record_request(country_name, time.perf_counter() - start, **outcome)
 
-    except Exception as e:
-        print(f"  ❌ Exception for {country_name}: {str(e)}")
-        return None
 
+def get_country_iso3_mapping() -> Mapping[str, str]:
+    """
+    Mapping of country names and common aliases to ISO3 codes.
 
-def get_country_iso3_mapping() -> Dict[str, str]:
+    The mapping is built once at import time (see country_codes). Prefer
+    country_codes.lookup_iso3, which also matches spelling variants.
     """
-    Create a mapping of country names to ISO3 codes.
-    This is a simplified version - you may need to expand this.
+    return ISO3_BY_NAME
+
+
+def country_payload(country: str, data: Optional[Dict]) -> Optional[CountryPayload]:
     """
-    mapping = {
-        "United States": "USA",
-        "China": "CHN",
-        "India": "IND",
-        "Indonesia": "IDN",
-        "Pakistan": "PAK",
-        "Brazil": "BRA",
-        "Nigeria": "NGA",
-        "Bangladesh": "BGD",
-        "Russia": "RUS",
-        "Mexico": "MEX",
-        "Japan": "JPN",
-        "Ethiopia": "ETH",
-        "Philippines": "PHL",
-        "Egypt": "EGY",
-        "Vietnam": "VNM",
-        "DR Congo": "COD",
-        "Turkey": "TUR",
-        "Iran": "IRN",
-        "Germany": "DEU",
-        "Thailand": "THA",
-        "United Kingdom": "GBR",
-        "France": "FRA",
-        "Italy": "ITA",
-        "South Africa": "ZAF",
-        "South Korea": "KOR",
-        "Spain": "ESP",
-        "Argentina": "ARG",
-        "Ukraine": "UKR",
-        "Poland": "POL",
-        "Canada": "CAN",
-        "Australia": "AUS",
-        "Romania": "ROU",
-        "Chile": "CHL",
-        "Netherlands": "NLD",
-        "Ecuador": "ECU",
-        "Guatemala": "GTM",
-        "Belgium": "BEL",
-        "Czech Republic": "CZE",
-        "Greece": "GRC",
-        "Portugal": "PRT",
-        "Sweden": "SWE",
-        "Hungary": "HUN",
-        "Belarus": "BLR",
-        "Austria": "AUT",
-        "Serbia": "SRB",
-        "Switzerland": "CHE",
-        "Bulgaria": "BGR",
-        "Denmark": "DNK",
-        "Finland": "FIN",
-        "Slovakia": "SVK",
-        "Norway": "NOR",
-        "Ireland": "IRL",
-        "Croatia": "HRV",
-        "Moldova": "MDA",
-        "Georgia": "GEO",
-        "Uruguay": "URY",
-        "Bosnia and Herzegovina": "BIH",
-        "Albania": "ALB",
-        "Lithuania": "LTU",
-        "Slovenia": "SVN",
-        "Latvia": "LVA",
-        "Estonia": "EST",
-        "North Macedonia": "MKD",
-        "Luxembourg": "LUX",
-        "Montenegro": "MNE",
-        "Malta": "MLT",
-        "Iceland": "ISL",
-        "Andorra": "AND",
-        "Liechtenstein": "LIE",
-        "Monaco": "MCO",
-        "San Marino": "SMR",
-        "Vatican City": "VAT",
-        "Puerto Rico": "PRI",
-        "Hong Kong": "HKG",
-        "Singapore": "SGP",
-    }
-    return mapping
+    Tag one API payload with its ISO3 code, query name and fetch time.
 
+    Args:
+        country: Name the country was queried under
+        data: Payload from get_population_data_for_country
 
-def fetch_all_country_data(countries: list[str], api_key: str) -> pd.DataFrame:
+    Returns:
+        CountryPayload ready for build_history, or None if the fetch failed
     """
-    Fetch population data for all countries and compile into a dataframe.
+    if not data or 'historical_population' not in data:
+        return None
+    country_name = data['country_name']
+    # Try the returned name first, then the name we queried under
+    iso3 = lookup_iso3(country_name) or lookup_iso3(country)
+    if iso3 is None:
+        print(f"  ⚠️  No ISO3 code for {country_name}; it will not appear on the map")
+    fetched_at = pd.Timestamp.now(tz='UTC')
+    return (country_name, iso3, country, fetched_at, data['historical_population'])
+
+
+def country_history(country: str, data: Optional[Dict]) -> Optional[pd.DataFrame]:
+    """
+    Turn one API payload into history rows, or None if the fetch failed.
 
     Args:
+        country: Name the country was queried under
+        data: Payload from get_population_data_for_country
+
+    Returns:
+        Single-country DataFrame in the history store schema, or None
+    """
+    payload = country_payload(country, data)
+    return build_history([payload]) if payload is not None else None
 
+
+def iter_country_payloads(
+    countries: list[str],
+    api_key: str,
+    max_workers: int = 1,
+    base_url: str = API_BASE_URL,
+    limiter: Optional[RateLimiter] = None,
+    cache: Optional[ResponseCache] = None,
+    session: Optional[requests.Session] = None,
+    metrics: Optional[PipelineMetrics] = None,
+    journal: Optional[FetchJournal] = None,
+) -> Iterator[Tuple[str, Optional[CountryPayload]]]:
+    """
+    Yield each country's tagged payload as soon as its request completes.
+
+    This is iter_country_data without the per-country DataFrame, for callers
+    that build one history frame from all payloads at the end. Arguments are
+    the same as for iter_country_data.
+
+    Yields:
+        (country, payload) in completion order, starting with any countries
+        resumed from the journal; payload is None if the fetch failed
+    """
+    if max_workers < 1:
+        raise ValueError(f"max_workers must be at least 1, got {max_workers}")
+
+    limiter = limiter or RateLimiter()
+    owns_session = session is None
+    if owns_session:
+        session = create_session(pool_size=max_workers)
+
+    def fetch(country: str) -> Optional[CountryPayload]:
+        data = get_population_data_for_country(country, api_key, base_url, limiter, cache, session, metrics=metrics)
+        payload = country_payload(country, data)
+        if journal is not None and payload is not None:
+            journal.record(payload)
+        return payload
+
+    try:
+        if journal is not None:
+            for country in dict.fromkeys(countries):
+                if country in journal:
+                    yield country, journal.completed[country]
+            countries = [c for c in countries if c not in journal]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            queued = iter(countries)
+            pending = {}
+
+            def submit_next() -> None:
+                country = next(queued, None)
+                if country is not None:
+                    pending[pool.submit(fetch, country)] = country
+
+            for _ in range(2 * max_workers):
+                submit_next()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    country = pending.pop(future)
+                    submit_next()
+                    yield country, future.result()
+    finally:
+        if owns_session:
+            session.close()
+
+
+def iter_country_data(
+    countries: list[str],
+    api_key: str,
+    max_workers: int = 1,
+    base_url: str = API_BASE_URL,
+    limiter: Optional[RateLimiter] = None,
+    cache: Optional[ResponseCache] = None,
+    session: Optional[requests.Session] = None,
+    metrics: Optional[PipelineMetrics] = None,
+    journal: Optional[FetchJournal] = None,
+) -> Iterator[Tuple[str, Optional[pd.DataFrame]]]:
+    """
+    Yield each country's history as soon as its request completes.
+
+    A slow country no longer holds back the others. At most 2 * max_workers
+    requests are queued at a time, so finished results never pile up unconsumed.
+    Feed the results to streaming_fractions.FractionAccumulator or
+    write_fractions_incrementally to get partial fractions early.
+
+    Args:
+        countries: Country names to query
         api_key: API key for API Ninjas
+        max_workers: Maximum number of requests in flight at once (1 = serial)
+        base_url: Population endpoint to query
+        limiter: Rate limiter shared by all requests (defaults to a fresh RateLimiter)
+        cache: On-disk response cache shared by all requests (None disables caching)
+        session: Pooled session shared by all requests (defaults to one sized to max_workers)
+        metrics: Collector every request is recorded in (see instrumentation.PipelineMetrics)
+        journal: Checkpoint journal; countries already in it are not re-requested and
+            every new success is appended to it before it is yielded
 
-    Returns:
-        DataFrame with historical population data
+    Yields:
+        (country, history) in completion order; history is None if the fetch failed
+    """
+    payloads = iter_country_payloads(
+        countries, api_key, max_workers, base_url, limiter, cache, session, metrics, journal
+    )
+    for country, payload in payloads:
+        yield country, build_history([payload]) if payload is not None else None
+
+
+def fetch_all_country_data(
+    countries: list[str],
+    api_key: str,
+    max_workers: int = 1,
+    base_url: str = API_BASE_URL,
+    limiter: Optional[RateLimiter] = None,
+    cache: Optional[ResponseCache] = None,
+    session: Optional[requests.Session] = None,
+    metrics: Optional[PipelineMetrics] = None,
+    journal: Optional[FetchJournal] = None,
+) -> pd.DataFrame:
     """
-    all_data = []
-    iso3_mapping = get_country_iso3_mapping()
+    Fetch population data for all countries and compile into a dataframe.
 
-    print(f"Fetching data for {len(countries)} countries...")
-    print("This may take a few minutes due to API rate limits.\n")
+    With max_workers > 1 the requests are issued from a bounded thread pool, so a
+    refresh costs roughly one round-trip per worker instead of one per country.
+    Rows come back in the order of `countries` either way. All workers share one
+    rate limiter, so the request rate stays at the provider's limit regardless of
+    how many are in flight. The history frame is built once from all payloads,
+    since building a small frame per country costs more than the request itself
+    against a fast endpoint. Use iter_country_data to consume results as they arrive.
 
-    for i, country in enumerate(countries, 1):
-        print(f"[{i}/{len(countries)}] Fetching {country}...", end=" ")
+    Args:
+        countries: Country names to query
+        api_key: API key for API Ninjas
+        max_workers: Maximum number of requests in flight at once (1 = serial)
+        base_url: Population endpoint to query
+        limiter: Rate limiter shared by all requests (defaults to a fresh RateLimiter)
+        cache: On-disk response cache shared by all requests (None disables caching)
+        session: Pooled session shared by all requests (defaults to one sized to max_workers)
+        metrics: Collector every request is recorded in (see instrumentation.PipelineMetrics)
+        journal: Checkpoint journal; countries already in it are not re-requested and
+            every new success is appended to it before it is yielded
 
-        data = get_population_data_for_country(country, api_key)
+    Returns:
+        DataFrame with historical population data, tagged with the queried name
+        and fetch time of each country (see history_store.HISTORY_DTYPES)
+    """
+    if max_workers < 1:
+        raise ValueError(f"max_workers must be at least 1, got {max_workers}")
 
-        if data and 'historical_population' in data:
-            country_name = data['country_name']
-            iso3 = iso3_mapping.get(country_name, country_name[:3].upper())
+    limiter = limiter or RateLimiter()
+    owns_session = session is None
+    if owns_session:
+        session = create_session(pool_size=max_workers)
 
-            # Extract historical population data
-            for year_data in data['historical_population']:
-                all_data.append(
-                    {
-                        'country': country_name,
-                        'country_code': iso3,
-                        'year': year_data['year'],
-                        'population': year_data['population'],
-                    }
-                )
+    print(f"Fetching data for {len(countries)} countries ({max_workers} at a time)...")
+    print(f"Requests are limited to {limiter.bucket.rate:g} per second.\n")
+    if journal is not None and len(journal):
+        resumed = sum(c in journal for c in dict.fromkeys(countries))
+        print(f"♻️  Resuming: {resumed} countries already fetched in {journal.path}\n")
 
-            print("✓")
-        else:
-            print("")
+    payloads = {}
+    results = iter_country_payloads(
+        countries, api_key, max_workers, base_url, limiter, cache, session, metrics, journal
+    )
+    for i, (country, payload) in enumerate(results, 1):
+        payloads[country] = payload
+        print(f"[{i}/{len(countries)}] {country} {'✓' if payload is not None else '✗'}")
 
-        # Be nice to the API - add a small delay
-        time.sleep(0.1)
+    stats = connection_stats(session)
+    if owns_session:
+        session.close()
 
-    df = pd.DataFrame(all_data)
+    df = build_history(payloads[c] for c in dict.fromkeys(countries) if payloads.get(c) is not None)
     print(f"\n✅ Successfully fetched data for {df['country'].nunique()} countries")
+    print(
+        f"🔌 {stats['requests']} requests over {stats['new_connections']} connections "
+        f"({stats['reused_connections']} reused)"
+    )
     return df
 
 
@@ -385,31 +619,19 @@ def calculate_population_fractions(df: pd.DataFrame) -> pd.DataFrame:
     """
     Calculate each country's current population as a fraction of its historical peak.
 
+    "Current" is each country's own latest year, so a country whose data stops
+    earlier than the others is still included.
+
     Args:
         df: DataFrame with historical population data
 
     Returns:
         DataFrame with population fractions calculated
     """
-    # Get the most recent year's data for current population
-    latest_year = df['year'].max()
-    current_pop = df[df['year'] == latest_year][['country', 'country_code', 'population']].copy()
-    current_pop.columns = ['country', 'country_code', 'current_population']
-
-    # Get historical peak for each country
-    peak_pop = df.groupby('country_code').agg({'population': 'max', 'country': 'first'}).reset_index()
-    peak_pop.columns = ['country_code', 'peak_population', 'country']
-
-    # Merge current and peak populations
-    result = current_pop.merge(peak_pop, on=['country', 'country_code'])
-
-    # Calculate fraction
-    result['population_fraction'] = result['current_population'] / result['peak_population']
-
-    # Round for display
-    result['fraction_display'] = result['population_fraction'].round(3)
-
-    return result
+    keys, countries = pd.factorize(df['country'])
+    stats = reduce_population_history(keys, len(countries), df['year'].to_numpy(), df['population'].to_numpy())
+    codes = df['country_code'].to_numpy(dtype=object)[stats['latest_row']]
+    return build_fractions_frame(np.asarray(countries, dtype=object), codes, stats)
 
 
 def create_map(df_fractions: pd.DataFrame) -> object:
@@ -427,12 +649,7 @@ def create_map(df_fractions: pd.DataFrame) -> object:
         locations='country_code',
         color='population_fraction',
         hover_name='country',
-        hover_data={
-            'country_code': False,
-            'population_fraction': ':.3f',
-            'current_population': ':,.0f',
-            'peak_population': ':,.0f',
-        },
+        hover_data=MAP_HOVER_DATA,
         color_continuous_scale='RdYlGn',
         range_color=[0.5, 1.0],
         labels={
@@ -450,24 +667,319 @@ def create_map(df_fractions: pd.DataFrame) -> object:
     return fig
 
 
-def main():
+def update_map(fig: go.Figure, df_fractions: pd.DataFrame) -> go.Figure:
+    """
+    Swap new data into a figure from create_map, keeping its layout and styling.
+
+    Much cheaper than create_map when drawing many maps with the same look
+    (e.g. one per year), since plotly express is not re-run.
+
+    Args:
+        fig: Figure previously returned by create_map
+        df_fractions: DataFrame with population fractions
+
+    Returns:
+        The same figure, updated in place
+    """
+    fig.update_traces(
+        locations=df_fractions['country_code'],
+        z=df_fractions['population_fraction'],
+        hovertext=df_fractions['country'],
+        customdata=df_fractions[list(MAP_HOVER_DATA)].to_numpy(),
+        selector=dict(type='choropleth'),
+    )
+    return fig
+
+
+def ensure_plotly_bundle(asset_dir: Path = DEFAULT_ASSET_DIR) -> Path:
+    """Write plotly.min.js into the asset directory once and return its path."""
+    bundle = Path(asset_dir) / 'plotly.min.js'
+    if not bundle.exists():
+        bundle.parent.mkdir(parents=True, exist_ok=True)
+        bundle.write_text(get_plotlyjs(), encoding='utf-8')
+    return bundle
+
+
+def write_map(
+    fig: go.Figure,
+    output: Path,
+    fmt: str = 'html',
+    asset_dir: Path = DEFAULT_ASSET_DIR,
+    topojson_url: Optional[str] = None,
+) -> Path:
+    """
+    Save a map in one of MAP_FORMATS.
+
+    'html' embeds the ~4.5 MB plotly.js bundle in every file. 'shared' writes the
+    bundle once to `asset_dir` and emits a small HTML page that references it, so
+    many maps cost a few kilobytes each. 'json' writes only the figure data.
+
+    Args:
+        fig: Figure to save
+        output: Output path; its suffix is replaced to match the format
+        fmt: One of MAP_FORMATS
+        asset_dir: Shared asset directory for the 'shared' format
+        topojson_url: Base URL (or path relative to the page) to load map topology from
+            instead of the plotly CDN, e.g. 'assets/topojson/'
+
+    Returns:
+        Path of the file written
+    """
+    if fmt not in MAP_FORMATS:
+        raise ValueError(f"Unknown map format {fmt!r}, expected one of {MAP_FORMATS}")
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    config = {'topojsonURL': topojson_url} if topojson_url else None
+
+    if fmt == 'html':
+        output = output.with_suffix('.html')
+        fig.write_html(output, config=config)
+    elif fmt == 'shared':
+        output = output.with_suffix('.html')
+        bundle = ensure_plotly_bundle(asset_dir)
+        fig.write_html(
+            output, include_plotlyjs=Path(os.path.relpath(bundle, output.parent)).as_posix(), config=config
+        )
+    elif fmt == 'json':
+        output = output.with_suffix('.json')
+        fig.write_json(output)
+    else:
+        output = output.with_suffix(f'.{fmt}')
+        fig.write_image(output)
+    return output
+
+
+def calculate_population_fractions_by_year(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calculate every country's population as a fraction of its peak-to-date, for every year.
+
+    The peak-to-date is a running maximum per country, computed in one grouped
+    cumulative pass over the history sorted by (country, year).
+
+    Args:
+        df: DataFrame with historical population data
+
+    Returns:
+        DataFrame with country, country_code, year, population, peak_to_date and
+        population_fraction, one row per (country, year)
+    """
+    keys, _ = pd.factorize(df['country'])
+    order = np.lexsort((df['year'].to_numpy(), keys))
+    history = df.iloc[order][['country', 'country_code', 'year', 'population']]
+    history = history.drop_duplicates(['country', 'year'], keep='last').reset_index(drop=True)
+
+    history['peak_to_date'] = history.groupby('country', sort=False, observed=True)['population'].cummax()
+    history['population_fraction'] = history['population'] / history['peak_to_date']
+    return history
+
+
+def create_animated_map(df_by_year: pd.DataFrame) -> go.Figure:
+    """
+    Create a choropleth with a year slider from calculate_population_fractions_by_year output.
+
+    Country locations, names and styling are set once on the base trace; each
+    frame carries only that year's colour values and hover numbers, so the
+    figure grows by two short arrays per year rather than a full trace.
+
+    Args:
+        df_by_year: Per-year population fractions
+
+    Returns:
+        Plotly figure with one animation frame per year
+    """
+    country_keys, countries = pd.factorize(df_by_year['country'])
+    year_keys, years = pd.factorize(df_by_year['year'], sort=True)
+    codes = np.empty(len(countries), dtype=object)
+    codes[country_keys] = df_by_year['country_code'].to_numpy(dtype=object)
+
+    # Dense (year, country) grids; countries without data in a year stay blank
+    shape = (len(years), len(countries))
+    fractions = np.full(shape, np.nan)
+    fractions[year_keys, country_keys] = df_by_year['population_fraction'].to_numpy()
+    hover = np.full(shape + (2,), np.nan)
+    hover[year_keys, country_keys] = df_by_year[['population', 'peak_to_date']].to_numpy(dtype=float)
+
+    fig = go.Figure(
+        data=[
+            go.Choropleth(
+                locations=codes,
+                z=fractions[-1],
+                customdata=hover[-1],
+                hovertext=np.asarray(countries, dtype=object),
+                hovertemplate=(
+                    '<b>%{hovertext}</b><br><br>Population Fraction=%{z:.3f}<br>'
+                    'Population=%{customdata[0]:,.0f}<br>Peak to Date=%{customdata[1]:,.0f}<extra></extra>'
+                ),
+                coloraxis='coloraxis',
+            )
+        ],
+        frames=[
+            go.Frame(name=str(year), data=[go.Choropleth(z=fractions[i], customdata=hover[i])], traces=[0])
+            for i, year in enumerate(years)
+        ],
+    )
+
+    slider_steps = [
+        dict(
+            label=str(year),
+            method='animate',
+            args=[[str(year)], dict(mode='immediate', frame=dict(duration=0, redraw=True), transition=dict(duration=0))],
+        )
+        for year in years
+    ]
+    fig.update_layout(
+        title='Countries\' Population as Fraction of Peak to Date, by Year (API Ninjas Data)',
+        coloraxis=dict(colorscale='RdYlGn', cmin=0.5, cmax=1.0, colorbar=dict(title='Population Fraction')),
+        geo=dict(showframe=False, showcoastlines=True, projection_type='natural earth'),
+        height=650,
+        width=1200,
+        sliders=[dict(active=len(years) - 1, steps=slider_steps, currentvalue=dict(prefix='Year: '))],
+        updatemenus=[
+            dict(
+                type='buttons',
+                showactive=False,
+                x=0.05,
+                y=0,
+                buttons=[
+                    dict(
+                        label='▶',
+                        method='animate',
+                        args=[None, dict(frame=dict(duration=300, redraw=True), fromcurrent=True)],
+                    ),
+                    dict(label='❚❚', method='animate', args=[[None], dict(mode='immediate', frame=dict(duration=0))]),
+                ],
+            )
+        ],
+    )
+    return fig
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    """Parse command-line options for the map pipeline."""
+    parser = argparse.ArgumentParser(description="Map each country's population as a fraction of its peak.")
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help=f"number of concurrent API requests (default: {DEFAULT_MAX_WORKERS})",
+    )
+    parser.add_argument(
+        '--rate',
+        type=float,
+        default=DEFAULT_RATE,
+        help=f"maximum API requests per second (default: {DEFAULT_RATE:g})",
+    )
+    parser.add_argument(
+        '--max-age',
+        type=float,
+        default=DEFAULT_MAX_AGE / 86400,
+        metavar='DAYS',
+        help=f"re-fetch countries cached or stored longer ago than this (default: {DEFAULT_MAX_AGE / 86400:g} days)",
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help="only fetch countries that are missing, failed last time, or older than --max-age",
+    )
+    parser.add_argument('--history', type=Path, default=DEFAULT_HISTORY_PATH, help="raw history store file")
+    parser.add_argument(
+        '--map-format',
+        choices=MAP_FORMATS,
+        default='html',
+        help="self-contained html, html sharing one plotly.js in --asset-dir, json, png or svg (default: html)",
+    )
+    parser.add_argument('--asset-dir', type=Path, default=DEFAULT_ASSET_DIR, help="shared plotly.js directory")
+    parser.add_argument('--topojson-url', help="load map topology from here instead of the plotly CDN")
+    parser.add_argument('--animate', action='store_true', help="also write a per-year animated map of the full history")
+    parser.add_argument('--cache', type=Path, default=DEFAULT_CACHE_PATH, help="response cache file")
+    parser.add_argument('--journal', type=Path, default=DEFAULT_JOURNAL_PATH, help="checkpoint journal file")
+    parser.add_argument(
+        '--resume', action='store_true', help="continue an interrupted run, skipping countries already in --journal"
+    )
+    parser.add_argument('--metrics-log', type=Path, help="append per-request and per-stage metrics here as JSON lines")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--refresh', action='store_true', help="ignore cached responses and re-fetch everything")
+    mode.add_argument('--offline', action='store_true', help="use only cached responses, never call the API")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None):
     """Main execution function."""
+    args = parse_args(argv)
+    max_age = args.max_age * 86400
 
-    # Fetch data from API
-    print("=" * 70)
-    print("FETCHING POPULATION DATA FROM API")
-    print("=" * 70)
-    df = fetch_all_country_data(COUNTRIES, API_KEY)
+    # Save outputs to the script's directory
+    script_dir = Path(__file__).parent
+    output_map = script_dir / 'population_fraction_map.html'
+    output_csv = script_dir / 'population_fractions.csv'
+
+    with PipelineMetrics(args.metrics_log) as metrics:
+        fig = run_pipeline(args, metrics, max_age, script_dir, output_map, output_csv)
+
+        print("\n" + "=" * 70)
+        print("RUN SUMMARY")
+        print("=" * 70)
+        print(metrics.summary_table())
+        metrics.emit({'event': 'summary', **metrics.summary()})
+
+    return fig
+
+
+def run_pipeline(
+    args: argparse.Namespace,
+    metrics: PipelineMetrics,
+    max_age: float,
+    script_dir: Path,
+    output_map: Path,
+    output_csv: Path,
+) -> Optional[go.Figure]:
+    """Fetch, compute, render and write, timing each stage in `metrics`."""
+    with metrics.stage('fetch'):
+        # Fetch data from API
+        print("=" * 70)
+        print("FETCHING POPULATION DATA FROM API")
+        print("=" * 70)
+
+        # Work out which countries need fetching
+        countries = COUNTRIES
+        history = load_history(args.history) if args.incremental else None
+        if history is not None:
+            previous = pd.read_csv(output_csv) if output_csv.exists() else None
+            countries = countries_to_refresh(COUNTRIES, history, previous, max_age)
+            print(f"Incremental refresh: {len(countries)} of {len(COUNTRIES)} countries are missing or stale")
+        limiter = RateLimiter(rate=args.rate)
+        cache = ResponseCache(args.cache, max_age=max_age, refresh=args.refresh, offline=args.offline)
+        with cache, FetchJournal(args.journal, resume=args.resume) as journal:
+            df = fetch_all_country_data(
+                countries,
+                API_KEY,
+                max_workers=args.workers,
+                limiter=limiter,
+                cache=cache,
+                metrics=metrics,
+                journal=journal,
+            )
+
+        if history is not None:
+            df = merge_history(history, df)
 
     if df.empty:
         print("\n❌ No data was fetched. Please check your API key and internet connection.")
-        return
+        return None
+
+    with metrics.stage('write'):
+        save_history(df, args.history)
+    print(f"✅ Raw history saved to: {args.history}")
+    # Everything the journal protected is in the history store now
+    args.journal.unlink(missing_ok=True)
 
     # Calculate fractions
     print("\n" + "=" * 70)
     print("CALCULATING POPULATION FRACTIONS")
     print("=" * 70)
-    df_fractions = calculate_population_fractions(df)
+    with metrics.stage('compute'):
+        df_fractions = calculate_population_fractions(df)
+        df_by_year = calculate_population_fractions_by_year(df) if args.animate else None
 
     # Display interesting results
     print("\n=== COUNTRIES AT PEAK POPULATION (fraction ≥ 0.99) ===")
@@ -490,18 +1002,26 @@ def main():
     print("\n" + "=" * 70)
     print("CREATING MAP VISUALIZATION")
     print("=" * 70)
-    fig = create_map(df_fractions)
+    with metrics.stage('render'):
+        fig = create_map(df_fractions)
+        fig_animated = create_animated_map(df_by_year) if df_by_year is not None else None
 
-    # Save outputs to the script's directory
-    script_dir = Path(__file__).parent
-    output_html = script_dir / 'population_fraction_map.html'
-    output_csv = script_dir / 'population_fractions.csv'
+    with metrics.stage('write'):
+        output_map = write_map(fig, output_map, args.map_format, args.asset_dir, args.topojson_url)
+        print(f"✅ Map saved to: {output_map}")
 
-    fig.write_html(output_html)
-    print(f"✅ Map saved to: {output_html}")
+        if fig_animated is not None:
+            output_animated = write_map(
+                fig_animated,
+                script_dir / 'population_fraction_animation.html',
+                args.map_format,
+                args.asset_dir,
+                args.topojson_url,
+            )
+            print(f"✅ Animated map saved to: {output_animated}")
 
-    df_fractions.sort_values('population_fraction').to_csv(output_csv, index=False)
-    print(f"✅ Data saved to: {output_csv}")
+        df_fractions.sort_values('population_fraction').to_csv(output_csv, index=False)
+        print(f"✅ Data saved to: {output_csv}")
 
     print("\n" + "=" * 70)
     print("✨ COMPLETE! Open the HTML file in your browser to view the map.")
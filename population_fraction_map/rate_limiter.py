@@ -0,0 +1,198 @@
+"""
+Token-bucket rate limiting with 429-aware retries for the API Ninjas client.
+
+One RateLimiter is shared by every request of a run, so parallel workers draw
+from the same budget and all of them back off together when the provider
+answers 429 Too Many Requests.
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+
+import requests
+
+# Requests per second we aim for; the bucket refills at this rate
+DEFAULT_RATE = 10.0
+
+# Attempts allowed per request after the first one fails with a retryable error
+DEFAULT_MAX_RETRIES = 5
+
+# Status codes that mean "try again later" rather than "this request is wrong"
+RETRYABLE_STATUS_CODES = frozenset({429, 502, 503, 504})
+
+
+class TokenBucket:
+    """Thread-safe token bucket that refills continuously at `rate` tokens per second."""
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum burst size (defaults to one second's worth of tokens)
+            clock: Monotonic time source, replaceable in tests
+            sleep: Sleep function, replaceable in tests
+        """
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        start = max(self._updated, self._paused_until)
+        if now > start:
+            self._tokens = min(self.capacity, self._tokens + (now - start) * self.rate)
+        self._updated = max(self._updated, now)
+
+    def acquire(self) -> float:
+        """
+        Take one token, blocking until one is available.
+
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                else:
+                    delay = (1 - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for `seconds` and drop any saved-up burst."""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self._tokens = 0.0
+            self._paused_until = max(self._paused_until, now + seconds)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header given either as delta-seconds or as an HTTP date.
+
+    Args:
+        value: Raw header value, or None if the header was absent
+
+    Returns:
+        Seconds to wait (never negative), or None if the header is missing or malformed
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RateLimiter:
+    """Shared request budget with exponential backoff and Retry-After support."""
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE,
+        burst: Optional[float] = None,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Args:
+            rate: Sustained requests per second
+            burst: Requests allowed back-to-back before throttling kicks in
+            max_retries: Retry budget for each request
+            backoff_base: Backoff ceiling for the first retry, doubled on each further retry
+            backoff_max: Upper bound on any single backoff delay
+            sleep: Sleep function, replaceable in tests
+        """
+        self.bucket = TokenBucket(rate, burst, sleep=sleep)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sleep = sleep
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff delay for the given retry attempt (0-based)."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def get(
+        self,
+        url: str,
+        session: Optional[requests.Session] = None,
+        on_retry: Optional[Callable[[Optional[int]], None]] = None,
+        **kwargs,
+    ) -> requests.Response:
+        """
+        Issue a GET within the rate limit, retrying throttled and transient failures.
+
+        A 429 pauses the shared bucket, so every worker waits out the Retry-After
+        period instead of hammering the API in parallel.
+
+        Args:
+            url: URL to fetch
+            session: Session to send the request on (defaults to module-level requests)
+            on_retry: Called before each retry with the status that triggered it (None for connection errors)
+            **kwargs: Passed through to `get`
+
+        Returns:
+            The last response received; its status is retryable only if the budget ran out
+
+        Raises:
+            requests.ConnectionError, requests.Timeout: If the final attempt failed to connect
+        """
+        send = session.get if session is not None else requests.get
+
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            try:
+                response = send(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                if on_retry is not None:
+                    on_retry(None)
+                self._sleep(self.backoff(attempt))
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                    return response
+                if on_retry is not None:
+                    on_retry(response.status_code)
+
+                delay = parse_retry_after(response.headers.get('Retry-After'))
+                if delay is None:
+                    delay = self.backoff(attempt)
+                if response.status_code == 429:
+                    self.bucket.pause(delay)
+                else:
+                    self._sleep(delay)
+            attempt += 1
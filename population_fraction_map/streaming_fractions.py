@@ -0,0 +1,319 @@
+"""
+Population fraction reductions, including a streaming mode for inputs too big for memory.
+
+reduce_population_history is the core used by calculate_population_fractions.
+For streaming, input is read in chunks of (key, year, population) rows, e.g.
+sub-national regions from local CSV dumps or per-country API results as they
+arrive. Each chunk is reduced and folded into per-key running accumulators held
+in flat NumPy arrays, so memory grows with the number of distinct keys, not rows.
+
+    python streaming_fractions.py regions.csv -o region_fractions.csv --key region --code region_code
+"""
+
+import argparse
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNKSIZE = 1_000_000
+
+_MIN_INT = np.iinfo(np.int64).min
+_MAX_INT = np.iinfo(np.int64).max
+
+
+def reduce_population_history(
+    keys: np.ndarray, n_keys: int, years: np.ndarray, populations: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """
+    Reduce (key, year, population) rows to per-key latest and peak figures.
+
+    Every step is an unbuffered ufunc scatter over the integer keys, so the cost
+    is linear in the number of rows and no sort or string comparison is needed.
+    When a key has several rows for its latest year, the last one wins; when the
+    peak is reached more than once, the earliest year is reported.
+
+    Args:
+        keys: Integer key of each row, in range(n_keys)
+        n_keys: Number of distinct keys
+        years: Year of each row
+        populations: Population of each row
+
+    Returns:
+        Dictionary of length-n_keys arrays: 'latest_year', 'current_population',
+        'peak_year', 'peak_population' and 'latest_row' (row index the current
+        population was taken from)
+    """
+    years = np.asarray(years, dtype=np.int64)
+    populations = np.asarray(populations, dtype=np.int64)
+    rows = np.arange(len(keys))
+
+    latest_year = np.full(n_keys, np.iinfo(np.int64).min)
+    np.maximum.at(latest_year, keys, years)
+    peak_population = np.full(n_keys, np.iinfo(np.int64).min)
+    np.maximum.at(peak_population, keys, populations)
+
+    latest_row = np.full(n_keys, -1)
+    is_latest = years == latest_year[keys]
+    np.maximum.at(latest_row, keys[is_latest], rows[is_latest])
+
+    peak_year = np.full(n_keys, np.iinfo(np.int64).max)
+    is_peak = populations == peak_population[keys]
+    np.minimum.at(peak_year, keys[is_peak], years[is_peak])
+
+    return {
+        'latest_year': latest_year,
+        'current_population': populations[latest_row],
+        'peak_year': peak_year,
+        'peak_population': peak_population,
+        'latest_row': latest_row,
+    }
+
+
+def build_fractions_frame(countries: np.ndarray, codes: np.ndarray, stats: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """
+    Assemble the population fractions output from per-country reductions.
+
+    Args:
+        countries: Country (or region) name per key
+        codes: ISO3 (or region) code per key
+        stats: Per-key arrays as returned by reduce_population_history
+
+    Returns:
+        DataFrame in the population_fractions.csv schema
+    """
+    result = pd.DataFrame(
+        {
+            'country': countries,
+            'country_code': codes,
+            'latest_year': stats['latest_year'],
+            'current_population': stats['current_population'],
+            'peak_year': stats['peak_year'],
+            'peak_population': stats['peak_population'],
+        }
+    )
+
+    # Calculate fraction
+    result['population_fraction'] = result['current_population'] / result['peak_population']
+
+    # Round for display
+    result['fraction_display'] = result['population_fraction'].round(3)
+
+    return result
+
+
+class FractionAccumulator:
+    """Running per-key latest and peak populations, merged one chunk at a time."""
+
+    def __init__(
+        self,
+        key: str = 'country',
+        code: Optional[str] = 'country_code',
+        year: str = 'year',
+        population: str = 'population',
+        capacity: int = 1024,
+    ):
+        """
+        Args:
+            key: Column identifying the country or region
+            code: Column with the code to report for each key (None if there is none)
+            year: Year column
+            population: Population column
+            capacity: Initial number of keys to allocate room for (grown by doubling)
+        """
+        self.columns = {'key': key, 'code': code, 'year': year, 'population': population}
+        self._index: Dict[object, int] = {}
+        self._names = np.empty(capacity, dtype=object)
+        self._codes = np.empty(capacity, dtype=object)
+        self._latest_year = np.full(capacity, _MIN_INT)
+        self._current = np.zeros(capacity, dtype=np.int64)
+        self._peak_year = np.full(capacity, _MAX_INT)
+        self._peak = np.full(capacity, _MIN_INT)
+        self.rows = 0
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self._names)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, 2 * capacity)
+        for name, fill in [
+            ('_names', None),
+            ('_codes', None),
+            ('_latest_year', _MIN_INT),
+            ('_current', 0),
+            ('_peak_year', _MAX_INT),
+            ('_peak', _MIN_INT),
+        ]:
+            old = getattr(self, name)
+            new = np.full(new_capacity, fill, dtype=old.dtype)
+            new[:capacity] = old
+            setattr(self, name, new)
+
+    def _slots(self, uniques: Iterable) -> np.ndarray:
+        """Global slot for each of a chunk's distinct keys, registering new ones."""
+        uniques = list(uniques)
+        index = self._index
+        new_keys = [k for k in uniques if k not in index]
+        if new_keys:
+            start = len(index)
+            self._grow(start + len(new_keys))
+            for offset, k in enumerate(new_keys):
+                index[k] = start + offset
+            self._names[start : start + len(new_keys)] = new_keys
+        return np.fromiter((index[k] for k in uniques), dtype=np.int64, count=len(uniques))
+
+    def update(self, chunk: pd.DataFrame) -> np.ndarray:
+        """
+        Fold a chunk of rows into the running totals.
+
+        Rows in later chunks count as later rows, so for ties on a key's latest
+        year the last row seen wins, exactly as in calculate_population_fractions.
+
+        Args:
+            chunk: DataFrame with the configured key, code, year and population columns
+
+        Returns:
+            Slots of the keys this chunk touched (pass to result() for just those rows)
+        """
+        if chunk.empty:
+            return np.empty(0, dtype=np.int64)
+        cols = self.columns
+        keys, uniques = pd.factorize(chunk[cols['key']])
+        if (keys < 0).any():
+            # Rows without a key cannot be attributed to any region
+            chunk, keys = chunk[keys >= 0], keys[keys >= 0]
+        stats = reduce_population_history(
+            keys, len(uniques), chunk[cols['year']].to_numpy(), chunk[cols['population']].to_numpy()
+        )
+        slots = self._slots(uniques)
+        self.rows += len(chunk)
+
+        newer = stats['latest_year'] >= self._latest_year[slots]
+        self._latest_year[slots[newer]] = stats['latest_year'][newer]
+        self._current[slots[newer]] = stats['current_population'][newer]
+        if cols['code'] is not None:
+            codes = chunk[cols['code']].to_numpy(dtype=object)[stats['latest_row']]
+            self._codes[slots[newer]] = codes[newer]
+
+        old_peak = self._peak[slots]
+        old_peak_year = self._peak_year[slots]
+        higher = stats['peak_population'] > old_peak
+        tied = stats['peak_population'] == old_peak
+        self._peak[slots[higher]] = stats['peak_population'][higher]
+        self._peak_year[slots[higher]] = stats['peak_year'][higher]
+        self._peak_year[slots[tied]] = np.minimum(old_peak_year[tied], stats['peak_year'][tied])
+        return slots
+
+    def result(self, slots: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """
+        Population fractions so far, in the calculate_population_fractions schema.
+
+        Args:
+            slots: Only report these keys (as returned by update); all keys if None
+        """
+        if slots is None:
+            slots = slice(0, len(self))
+        stats = {
+            'latest_year': self._latest_year[slots],
+            'current_population': self._current[slots],
+            'peak_year': self._peak_year[slots],
+            'peak_population': self._peak[slots],
+        }
+        return build_fractions_frame(self._names[slots], self._codes[slots], stats)
+
+
+def stream_population_fractions(
+    source: Union[str, Path, Iterable[pd.DataFrame]],
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    key: str = 'country',
+    code: Optional[str] = 'country_code',
+    year: str = 'year',
+    population: str = 'population',
+) -> pd.DataFrame:
+    """
+    Compute population fractions from a CSV file or an iterable of chunks.
+
+    Args:
+        source: CSV path, or an iterable of DataFrames (e.g. from pd.read_csv(..., chunksize=...))
+        chunksize: Rows per chunk when reading a CSV path
+        key: Column identifying the country or region
+        code: Column with the code to report for each key (None if there is none)
+        year: Year column
+        population: Population column
+
+    Returns:
+        DataFrame in the population_fractions.csv schema, one row per key
+    """
+    accumulator = FractionAccumulator(key, code, year, population)
+    if isinstance(source, (str, Path)):
+        usecols = [c for c in (key, code, year, population) if c is not None]
+        source = pd.read_csv(
+            source, usecols=usecols, chunksize=chunksize, dtype={year: np.int32, population: np.int64}
+        )
+    for chunk in source:
+        accumulator.update(chunk)
+    return accumulator.result()
+
+
+def write_fractions_incrementally(
+    results: Iterable[Tuple[str, Optional[pd.DataFrame]]],
+    path: Union[str, Path],
+    accumulator: Optional[FractionAccumulator] = None,
+) -> pd.DataFrame:
+    """
+    Consume per-country results as they arrive, appending fraction rows to a CSV.
+
+    Each country's row is written and flushed as soon as its history arrives, so
+    a partial CSV is readable while the fetch is still running. When the input is
+    exhausted the file is rewritten sorted by fraction, like the batch pipeline.
+    Histories are dropped after they are folded in, so memory stays bounded.
+
+    Args:
+        results: (country, history) pairs, e.g. from iter_country_data
+        path: CSV to write
+        accumulator: Accumulator to fold results into (e.g. to draw partial maps from)
+
+    Returns:
+        The final fractions for every country received
+    """
+    accumulator = accumulator if accumulator is not None else FractionAccumulator()
+    with open(path, 'w', newline='') as f:
+        header = True
+        for _, history in results:
+            if history is None or history.empty:
+                continue
+            slots = accumulator.update(history)
+            accumulator.result(slots).to_csv(f, header=header, index=False)
+            f.flush()
+            header = False
+
+    df_fractions = accumulator.result()
+    df_fractions.sort_values('population_fraction').to_csv(path, index=False)
+    return df_fractions
+
+
+def main(argv: Optional[list[str]] = None):
+    """Stream a CSV of (key, year, population) rows into a fractions CSV."""
+    parser = argparse.ArgumentParser(description="Population fraction of peak for large CSV inputs.")
+    parser.add_argument('input', type=Path, help="CSV with key, year and population columns")
+    parser.add_argument('-o', '--output', type=Path, required=True, help="where to write the fractions CSV")
+    parser.add_argument('--key', default='country', help="column identifying each region (default: country)")
+    parser.add_argument('--code', default=None, help="column with each region's code, if any")
+    parser.add_argument('--year', default='year', help="year column (default: year)")
+    parser.add_argument('--population', default='population', help="population column (default: population)")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="rows read per chunk")
+    args = parser.parse_args(argv)
+
+    df_fractions = stream_population_fractions(
+        args.input, args.chunksize, args.key, args.code, args.year, args.population
+    )
+    df_fractions.sort_values('population_fraction').to_csv(args.output, index=False)
+    print(f"✅ {len(df_fractions):,} regions saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
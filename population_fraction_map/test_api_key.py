@@ -6,6 +6,7 @@ Run this before running the full population map script.
 import os
 
 import requests
+from rate_limiter import RateLimiter
 
 API_KEY = os.getenv("API_NINJAS_API_KEY")
 
@@ -25,7 +26,11 @@ def test_api_connection():
     params = {'country': 'United States'}
 
     try:
-        response = requests.get('https://api.api-ninjas.com/v1/population', headers=headers, params=params, timeout=10)
+        # Retries transient throttling, so a 429 below means the retry budget ran out
+        limiter = RateLimiter(max_retries=3)
+        response = limiter.get(
+            'https://api.api-ninjas.com/v1/population', headers=headers, params=params, timeout=10
+        )
 
         print(f"   Status Code: {response.status_code}")
 
@@ -57,7 +62,7 @@ def test_api_connection():
 
         elif response.status_code == 429:
             print("\n⚠️  Rate limit exceeded")
-            print("   You've made too many requests. Wait a bit and try again.")
+            print("   Still throttled after retrying. Wait a bit and try again.")
             return False
 
         else:
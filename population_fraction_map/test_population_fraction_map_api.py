@@ -0,0 +1,801 @@
+"""Tests for the population fraction map pipeline, run against a local stand-in API"""
+import gzip
+import io
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import history_store
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+import urllib3
+from benchmark_pipeline import bench_pipeline, compare_to_baseline, load_baseline, save_baseline, synthetic_history
+from country_codes import ISO3_INDEX, ISO3_NAMES, lookup_iso3, normalize_country_name
+from fetch_journal import FetchJournal
+from history_store import (
+    HISTORY_DTYPES,
+    countries_to_refresh,
+    load_history,
+    load_history_table,
+    merge_history,
+    save_history,
+)
+from instrumentation import PipelineMetrics, wire_bytes
+from mock_api import MockApiServer, mock_payload
+from population_cache import ResponseCache
+from population_fraction_map_api import (
+    calculate_population_fractions,
+    calculate_population_fractions_by_year,
+    COUNTRIES,
+    connection_stats,
+    create_animated_map,
+    create_map,
+    create_session,
+    fetch_all_country_data,
+    get_population_data_for_country,
+    iter_country_data,
+    update_map,
+    write_map,
+)
+from rate_limiter import RateLimiter, TokenBucket, parse_retry_after
+from streaming_fractions import FractionAccumulator, stream_population_fractions, write_fractions_incrementally
+
+
+def make_payload(country):
+    """Build a fake API Ninjas response with a peak a few years back"""
+    base = 1000 + 10 * len(country)
+    history = [{'year': 2023 - i, 'population': base - abs(i - 3) * 10} for i in range(6)]
+    return {'country_name': country, 'historical_population': history}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers /v1/population like API Ninjas, after an optional delay
+
+    The first `throttle` requests for each country are answered with 429. When
+    `etag` is set it is sent with every payload and honored in If-None-Match.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+    delays = {}
+    unknown = frozenset()
+    throttle = 0
+    etag = None
+
+    def do_GET(self):
+        country = parse_qs(urlparse(self.path).query).get('country', [''])[0]
+        time.sleep(self.latency + self.delays.get(country, 0.0))
+        with self.lock:
+            self.hits[country] = self.hits.get(country, 0) + 1
+            throttled = self.hits[country] <= self.throttle
+        if throttled:
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.etag and self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if country in self.unknown:
+            body = b'{}'
+        else:
+            body = json.dumps(make_payload(country)).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if self.etag:
+            self.send_header('ETag', self.etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Threaded server that ignores clients hanging up mid-response (e.g. on timeout)"""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+@pytest.fixture
+def api_server():
+    """Start a stand-in API server and yield a factory for its population URL"""
+    servers = []
+
+    def start(**handler_attrs):
+        handler = type('Handler', (StandInHandler,), {'hits': {}, 'lock': threading.Lock(), **handler_attrs})
+        server = StandInServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        start.hits = handler.hits
+        return f"http://127.0.0.1:{server.server_port}/v1/population"
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class TestFetch:
+    def test_get_population_data_for_country_returns_payload(self, api_server):
+        """Single-country fetch returns the decoded JSON payload"""
+        url = api_server()
+
+        data = get_population_data_for_country('France', 'key', base_url=url)
+
+        assert data == make_payload('France')
+
+    def test_get_population_data_for_country_missing_data(self, api_server):
+        """A payload without country_name is treated as no data"""
+        url = api_server(unknown=frozenset({'Atlantis'}))
+
+        assert get_population_data_for_country('Atlantis', 'key', base_url=url) is None
+
+    def test_parallel_fetch_matches_serial_fetch(self, api_server):
+        """Parallel mode returns exactly the DataFrame the serial mode does"""
+        url = api_server(unknown=frozenset({'Atlantis'}))
+        countries = ['France', 'Atlantis', 'Japan', 'Chile', 'Kenya']
+
+        serial = fetch_all_country_data(countries, 'key', max_workers=1, base_url=url)
+        parallel = fetch_all_country_data(countries, 'key', max_workers=4, base_url=url)
+
+        pd.testing.assert_frame_equal(serial.drop(columns='fetched_at'), parallel.drop(columns='fetched_at'))
+        assert list(parallel['country'].unique()) == ['France', 'Japan', 'Chile', 'Kenya']
+
+    def test_parallel_fetch_overlaps_round_trips(self, api_server):
+        """With one worker per country the refresh takes about one round-trip"""
+        url = api_server(latency=0.3)
+        countries = [f'Country {i}' for i in range(8)]
+
+        start = time.perf_counter()
+        df = fetch_all_country_data(countries, 'key', max_workers=8, base_url=url)
+        elapsed = time.perf_counter() - start
+
+        assert df['country'].nunique() == 8
+        assert elapsed < 8 * 0.3 / 2
+
+    def test_fetch_rejects_invalid_worker_count(self):
+        """A concurrency limit below one is an error"""
+        with pytest.raises(ValueError):
+            fetch_all_country_data(['France'], 'key', max_workers=0)
+
+
+class FakeClock:
+    """Deterministic clock whose sleep just advances time"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestRateLimiter:
+    def test_token_bucket_allows_burst_then_paces(self):
+        """Bucket hands out its capacity at once, then one token per 1/rate seconds"""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=4, capacity=2, clock=clock, sleep=clock.sleep)
+
+        waits = [bucket.acquire() for _ in range(4)]
+
+        assert waits[:2] == [0.0, 0.0]
+        assert waits[2:] == pytest.approx([0.25, 0.25])
+
+    def test_token_bucket_pause_blocks_all_tokens(self):
+        """Pausing drops the saved burst and blocks until the pause ends"""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, capacity=10, clock=clock, sleep=clock.sleep)
+
+        bucket.pause(2.0)
+        bucket.acquire()
+
+        assert clock.now >= 2.0
+
+    def test_parse_retry_after(self):
+        """Retry-After accepts delta-seconds and HTTP dates, rejects garbage"""
+        assert parse_retry_after('3') == 3.0
+        assert parse_retry_after(None) is None
+        assert parse_retry_after('soon') is None
+        assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+
+    def test_throttled_country_is_retried_not_dropped(self, api_server):
+        """A country answered with 429 is retried until it succeeds"""
+        url = api_server(throttle=2)
+        limiter = RateLimiter(rate=100, backoff_base=0.01)
+
+        df = fetch_all_country_data(['France', 'Japan'], 'key', max_workers=2, base_url=url, limiter=limiter)
+
+        assert sorted(df['country'].unique()) == ['France', 'Japan']
+
+    def test_retry_budget_is_bounded(self, api_server):
+        """Once the retry budget is spent the country is reported as failed"""
+        url = api_server(throttle=10)
+        limiter = RateLimiter(rate=100, max_retries=2, backoff_base=0.01)
+
+        assert get_population_data_for_country('France', 'key', base_url=url, limiter=limiter) is None
+
+
+class TestResponseCache:
+    def test_fresh_cache_entry_skips_the_api(self, api_server, tmp_path):
+        """A second fetch within max_age is served entirely from disk"""
+        url = api_server()
+        countries = ['France', 'Japan']
+
+        with ResponseCache(tmp_path / 'cache.sqlite') as cache:
+            first = fetch_all_country_data(countries, 'key', base_url=url, cache=cache)
+            second = fetch_all_country_data(countries, 'key', base_url=url, cache=cache)
+
+        pd.testing.assert_frame_equal(first.drop(columns='fetched_at'), second.drop(columns='fetched_at'))
+        assert api_server.hits == {'France': 1, 'Japan': 1}
+
+    def test_offline_mode_never_calls_the_api(self, api_server, tmp_path):
+        """Offline mode serves stale entries and reports uncached countries as missing"""
+        url = api_server()
+        path = tmp_path / 'cache.sqlite'
+        with ResponseCache(path) as cache:
+            get_population_data_for_country('France', 'key', base_url=url, cache=cache)
+
+        with ResponseCache(path, max_age=0, offline=True) as cache:
+            assert get_population_data_for_country('France', None, base_url=url, cache=cache) == make_payload('France')
+            assert get_population_data_for_country('Japan', None, base_url=url, cache=cache) is None
+
+        assert api_server.hits == {'France': 1}
+
+    def test_stale_entry_is_revalidated_with_etag(self, api_server, tmp_path):
+        """An expired entry is re-checked with If-None-Match and kept on 304"""
+        url = api_server(etag='"v1"')
+
+        with ResponseCache(tmp_path / 'cache.sqlite', max_age=0) as cache:
+            get_population_data_for_country('France', 'key', base_url=url, cache=cache)
+            fetched_at = cache.get(url, 'France').fetched_at
+            data = get_population_data_for_country('France', 'key', base_url=url, cache=cache)
+
+            assert data == make_payload('France')
+            assert cache.get(url, 'France').fetched_at >= fetched_at
+        assert api_server.hits == {'France': 2}
+
+    def test_refresh_mode_refetches(self, api_server, tmp_path):
+        """Refresh mode goes to the API even when the entry is fresh"""
+        url = api_server()
+        path = tmp_path / 'cache.sqlite'
+        with ResponseCache(path) as cache:
+            get_population_data_for_country('France', 'key', base_url=url, cache=cache)
+        with ResponseCache(path, refresh=True) as cache:
+            get_population_data_for_country('France', 'key', base_url=url, cache=cache)
+
+        assert api_server.hits == {'France': 2}
+
+
+class TestSession:
+    def test_session_reuses_connections(self, api_server):
+        """Requests on a pooled session share keep-alive connections"""
+        url = api_server()
+        countries = [f'Country {i}' for i in range(10)]
+
+        with create_session(pool_size=2) as session:
+            fetch_all_country_data(countries, 'key', max_workers=2, base_url=url, session=session)
+            stats = connection_stats(session)
+
+        assert stats['requests'] == 10
+        assert stats['new_connections'] <= 2
+        assert stats['reused_connections'] == stats['requests'] - stats['new_connections']
+
+    def test_request_timeout_fails_the_country(self, api_server):
+        """A response slower than the timeout counts as a failed fetch"""
+        url = api_server(latency=0.5)
+        limiter = RateLimiter(max_retries=0)
+
+        data = get_population_data_for_country('France', 'key', base_url=url, limiter=limiter, timeout=0.1)
+
+        assert data is None
+
+
+class TestIncrementalRefresh:
+    def test_history_round_trips_through_store(self, api_server, tmp_path):
+        """Fetched rows survive save_history/load_history unchanged"""
+        url = api_server()
+        df = fetch_all_country_data(['France', 'Japan'], 'key', base_url=url)
+
+        save_history(df, tmp_path / 'history.feather')
+        loaded = load_history(tmp_path / 'history.feather')
+
+        pd.testing.assert_frame_equal(loaded, df)
+
+    def test_load_history_does_not_copy_numeric_columns(self, tmp_path, monkeypatch):
+        """Loaded years and populations are views of the memory-mapped file, not copies"""
+        df = synthetic_history(100, n_years=1000).assign(fetched_at=pd.Timestamp('2024-01-01', tz='UTC'))
+        save_history(df.assign(query=df['country']), tmp_path / 'history.feather')
+        tables = []
+
+        def recording_load(path):
+            tables.append(load_history_table(path))
+            return tables[-1]
+
+        monkeypatch.setattr(history_store, 'load_history_table', recording_load)
+
+        loaded = load_history(tmp_path / 'history.feather')
+
+        for column, dtype in [('year', np.int16), ('population', np.int64)]:
+            chunks = tables[0].column(column).chunks
+            mapped = np.frombuffer(chunks[0].buffers()[1], dtype=dtype)
+            assert len(chunks) == 1
+            assert np.shares_memory(loaded[column].to_numpy(), mapped)
+        assert {col: str(dtype) for col, dtype in loaded.dtypes.items()} == HISTORY_DTYPES
+
+    def test_history_uses_compact_dtypes(self, api_server, tmp_path):
+        """The store keeps categorical names, int16 years and int64 populations"""
+        url = api_server()
+        df = fetch_all_country_data(['France', 'Japan'], 'key', base_url=url)
+        save_history(df, tmp_path / 'history.feather')
+
+        table = load_history_table(tmp_path / 'history.feather')
+
+        assert {col: str(dtype) for col, dtype in df.dtypes.items()} == HISTORY_DTYPES
+        assert str(table.schema.field('year').type) == 'int16'
+        assert str(table.schema.field('country_code').type).startswith('dictionary')
+
+    def test_countries_to_refresh_picks_missing_failed_and_stale(self, api_server):
+        """Only absent, previously dropped and stale countries are re-fetched"""
+        url = api_server()
+        history = fetch_all_country_data(['France', 'Japan', 'Chile'], 'key', base_url=url)
+        history.loc[history['query'] == 'Chile', 'fetched_at'] -= pd.Timedelta(days=60)
+        fractions = pd.DataFrame({'country': ['France', 'Chile']})
+
+        todo = countries_to_refresh(
+            ['France', 'Japan', 'Chile', 'Kenya'], history, fractions, max_age=30 * 86400
+        )
+
+        assert todo == ['Japan', 'Chile', 'Kenya']
+
+    def test_merge_history_replaces_refetched_and_keeps_failed(self, api_server):
+        """Re-fetched countries are replaced; countries that failed again keep old rows"""
+        url = api_server(unknown=frozenset({'Japan'}))
+        history = fetch_all_country_data(['France', 'Japan'], 'key', base_url=api_server())
+        fresh = fetch_all_country_data(['France', 'Japan'], 'key', base_url=url)
+
+        merged = merge_history(history, fresh)
+
+        assert sorted(merged['query'].unique()) == ['France', 'Japan']
+        assert len(merged) == len(history)
+        france = merged[merged['query'] == 'France']
+        assert (france['fetched_at'] == fresh['fetched_at'].iloc[0]).all()
+
+
+class TestPopulationFractions:
+    def test_fractions_use_each_countrys_latest_year(self):
+        """A country whose data ends early is kept, using its own latest year"""
+        df = pd.DataFrame(
+            {
+                'country': ['A', 'A', 'A', 'B', 'B'],
+                'country_code': ['AAA', 'AAA', 'AAA', 'BBB', 'BBB'],
+                'year': [2020, 2021, 2022, 2019, 2020],
+                'population': [100, 120, 90, 50, 40],
+            }
+        )
+
+        result = calculate_population_fractions(df).set_index('country')
+
+        assert result.loc['A', 'latest_year'] == 2022
+        assert result.loc['A', 'peak_year'] == 2021
+        assert result.loc['A', 'population_fraction'] == pytest.approx(90 / 120)
+        assert result.loc['B', 'latest_year'] == 2020
+        assert result.loc['B', 'current_population'] == 40
+        assert result.loc['B', 'peak_population'] == 50
+
+    def test_fractions_report_earliest_peak_year(self):
+        """When the peak is reached twice, the first year it was reached is reported"""
+        df = pd.DataFrame(
+            {'country': ['A'] * 3, 'country_code': ['AAA'] * 3, 'year': [2002, 2000, 2001], 'population': [5, 5, 3]}
+        )
+
+        assert calculate_population_fractions(df)['peak_year'].iloc[0] == 2000
+
+    def test_fractions_match_groupby_reference(self):
+        """The vectorized reduction agrees with a straightforward pandas groupby"""
+        df = synthetic_history(300, n_years=20, seed=1).sample(frac=1, random_state=1)
+
+        result = calculate_population_fractions(df).set_index('country').sort_index()
+        latest = df.sort_values('year').groupby('country', observed=True).last()
+        peak = df.groupby('country', observed=True)['population'].max()
+
+        np.testing.assert_array_equal(result['current_population'], latest.sort_index()['population'])
+        np.testing.assert_array_equal(result['peak_population'], peak.sort_index())
+
+
+class TestStreamingFractions:
+    def test_streamed_chunks_match_in_memory_result(self):
+        """Folding shuffled chunks gives the same fractions as one in-memory pass"""
+        df = synthetic_history(500, n_years=30, seed=2).sample(frac=1, random_state=2)
+        chunks = (df.iloc[i : i + 997] for i in range(0, len(df), 997))
+
+        streamed = stream_population_fractions(chunks)
+        expected = calculate_population_fractions(df)
+
+        pd.testing.assert_frame_equal(
+            streamed.set_index('country').sort_index(), expected.set_index('country').sort_index(), check_dtype=False
+        )
+
+    def test_stream_from_csv_with_custom_columns(self, tmp_path):
+        """Region dumps with their own column names stream from disk in small chunks"""
+        df = synthetic_history(50, n_years=10).rename(
+            columns={'country': 'region', 'country_code': 'region_code', 'population': 'pop'}
+        )
+        df.to_csv(tmp_path / 'regions.csv', index=False)
+
+        result = stream_population_fractions(
+            tmp_path / 'regions.csv', chunksize=37, key='region', code='region_code', population='pop'
+        )
+
+        assert len(result) == 50
+        assert list(result.columns) == list(calculate_population_fractions(synthetic_history(1)).columns)
+        assert result['country_code'].str.startswith('R').all()
+
+    def test_accumulator_memory_tracks_keys_not_rows(self):
+        """The accumulator only grows with the number of distinct keys"""
+        accumulator = FractionAccumulator(capacity=8)
+        chunk = synthetic_history(5, n_years=40)
+
+        for _ in range(20):
+            accumulator.update(chunk)
+
+        assert len(accumulator) == 5
+        assert accumulator.rows == 20 * len(chunk)
+        assert len(accumulator._names) == 8
+
+
+class TestMapOutput:
+    def fractions(self, seed=0):
+        return calculate_population_fractions(synthetic_history(20, n_years=5, seed=seed))
+
+    def test_shared_format_writes_bundle_once(self, tmp_path):
+        """Shared-bundle maps reference one plotly.js and stay small"""
+        fig = create_map(self.fractions())
+        assets = tmp_path / 'assets'
+
+        first = write_map(fig, tmp_path / 'maps' / 'a.html', 'shared', asset_dir=assets)
+        bundle_mtime = (assets / 'plotly.min.js').stat().st_mtime_ns
+        second = write_map(fig, tmp_path / 'b.html', 'shared', asset_dir=assets)
+
+        assert (assets / 'plotly.min.js').stat().st_mtime_ns == bundle_mtime
+        assert first.stat().st_size < 100_000
+        assert '../assets/plotly.min.js' in first.read_text()
+        assert 'assets/plotly.min.js' in second.read_text()
+
+    def test_json_format_changes_suffix(self, tmp_path):
+        """The data-only format writes figure JSON next to the requested path"""
+        path = write_map(create_map(self.fractions()), tmp_path / 'map.html', 'json')
+
+        assert path == tmp_path / 'map.json'
+        assert json.loads(path.read_text())['data'][0]['type'] == 'choropleth'
+
+    def test_write_map_rejects_unknown_format(self, tmp_path):
+        """Unknown formats are an error"""
+        with pytest.raises(ValueError):
+            write_map(create_map(self.fractions()), tmp_path / 'map.html', 'gif')
+
+    def test_update_map_matches_fresh_figure(self):
+        """Updating a figure in place gives the same traces as rebuilding it"""
+        new = self.fractions(seed=1)
+
+        updated = update_map(create_map(self.fractions()), new)
+        rebuilt = create_map(new)
+
+        assert updated.to_json() == rebuilt.to_json()
+
+
+class TestAnimatedMap:
+    def test_fractions_by_year_use_peak_to_date(self):
+        """Each year's fraction is relative to the highest population up to that year"""
+        df = pd.DataFrame(
+            {
+                'country': ['A'] * 4 + ['B'] * 2,
+                'country_code': ['AAA'] * 4 + ['BBB'] * 2,
+                'year': [2003, 2000, 2002, 2001, 2000, 2001],
+                'population': [60, 50, 80, 100, 10, 20],
+            }
+        )
+
+        result = calculate_population_fractions_by_year(df)
+        a = result[result['country'] == 'A']
+
+        assert list(a['year']) == [2000, 2001, 2002, 2003]
+        assert list(a['peak_to_date']) == [50, 100, 100, 100]
+        assert list(a['population_fraction']) == pytest.approx([1.0, 1.0, 0.8, 0.6])
+        assert list(result[result['country'] == 'B']['population_fraction']) == [1.0, 1.0]
+
+    def test_fractions_by_year_final_year_matches_snapshot(self):
+        """The last year's fraction per country equals the latest-year snapshot"""
+        df = synthetic_history(30, n_years=15, seed=3)
+
+        by_year = calculate_population_fractions_by_year(df).groupby('country', observed=True).last()
+        snapshot = calculate_population_fractions(df).set_index('country')
+
+        np.testing.assert_allclose(
+            by_year.sort_index()['population_fraction'], snapshot.sort_index()['population_fraction']
+        )
+
+    def test_animated_map_frames_carry_only_changing_data(self):
+        """One frame per year; locations and names live only on the base trace"""
+        df = synthetic_history(10, n_years=6)
+
+        fig = create_animated_map(calculate_population_fractions_by_year(df))
+
+        assert [frame.name for frame in fig.frames] == [str(y) for y in range(2018, 2024)]
+        assert len(fig.data[0].locations) == 10
+        for frame in fig.frames:
+            assert frame.data[0].locations is None
+            assert frame.data[0].hovertext is None
+            assert len(frame.data[0].z) == 10
+
+
+class TestCountryCodes:
+    def test_every_queried_country_has_a_code(self):
+        """No entry in COUNTRIES falls through to a made-up code"""
+        missing = [country for country in COUNTRIES if lookup_iso3(country) is None]
+
+        assert missing == []
+
+    def test_aliases_and_spelling_variants_resolve(self):
+        """Official long forms, abbreviations, accents and '&' all find the same code"""
+        assert lookup_iso3('Nigeria') == 'NGA'
+        assert lookup_iso3('Niger') == 'NER'
+        assert lookup_iso3('Congo, Dem. Rep.') == 'COD'
+        assert lookup_iso3('Congo (Brazzaville)') == 'COG'
+        assert lookup_iso3('São Tomé & Príncipe') == 'STP'
+        assert lookup_iso3('The Gambia') == 'GMB'
+        assert lookup_iso3('St. Vincent and the Grenadines') == 'VCT'
+        assert lookup_iso3('Türkiye') == 'TUR'
+        assert lookup_iso3('fra') == 'FRA'
+        assert lookup_iso3('Atlantis') is None
+
+    def test_index_is_read_only(self):
+        """The lookup table is frozen at import time"""
+        with pytest.raises(TypeError):
+            ISO3_INDEX['atlantis'] = 'ATL'
+
+    def test_canonical_names_normalize_to_their_own_code(self):
+        """Every canonical name maps back to its own code"""
+        for iso3, name in ISO3_NAMES.items():
+            assert ISO3_INDEX[normalize_country_name(name)] == iso3
+
+    def test_fetch_assigns_real_codes(self, api_server):
+        """Fetched countries get proper ISO3 codes and unknown names get none"""
+        url = api_server()
+
+        df = fetch_all_country_data(['Nigeria', 'Niger', 'Atlantis'], 'key', base_url=url)
+        codes = df.drop_duplicates('country').set_index('country')['country_code']
+
+        assert codes['Nigeria'] == 'NGA'
+        assert codes['Niger'] == 'NER'
+        assert pd.isna(codes['Atlantis'])
+        create_map(calculate_population_fractions(df))
+
+
+class TestStreamingFetch:
+    def test_results_arrive_in_completion_order(self, api_server):
+        """A slow country is yielded last instead of holding back the rest"""
+        url = api_server(delays={'France': 0.5})
+
+        results = list(iter_country_data(['France', 'Japan', 'Chile'], 'key', max_workers=3, base_url=url))
+
+        assert results[-1][0] == 'France'
+        assert all(history is not None for _, history in results)
+
+    def test_failed_countries_are_reported(self, api_server):
+        """Countries without data are yielded with no history"""
+        url = api_server(unknown=frozenset({'Atlantis'}))
+
+        results = dict(iter_country_data(['France', 'Atlantis'], 'key', max_workers=2, base_url=url))
+
+        assert results['Atlantis'] is None
+        assert set(results['France']['country']) == {'France'}
+
+    def test_partial_csv_is_written_while_fetching(self, api_server, tmp_path):
+        """Rows land in the CSV as countries arrive, then the file is finalized sorted"""
+        url = api_server(delays={'Japan': 0.5})
+        path = tmp_path / 'fractions.csv'
+        rows_seen = []
+
+        def watch(results):
+            # Resumed once the writer has handled the previous item
+            for item in results:
+                yield item
+                rows_seen.append(len(pd.read_csv(path)))
+
+        final = write_fractions_incrementally(
+            watch(iter_country_data(['France', 'Japan', 'Chile'], 'key', max_workers=3, base_url=url)), path
+        )
+
+        assert rows_seen == [1, 2, 3]
+        pd.testing.assert_frame_equal(
+            pd.read_csv(path), final.sort_values('population_fraction').reset_index(drop=True), check_dtype=False
+        )
+
+
+class TestInstrumentation:
+    def test_requests_retries_and_bytes_are_recorded(self, api_server):
+        """Each country is recorded once, with the retries the limiter spent on it"""
+        url = api_server(throttle=1, unknown=frozenset({'Atlantis'}))
+        limiter = RateLimiter(rate=100, backoff_base=0.01)
+        metrics = PipelineMetrics()
+
+        fetch_all_country_data(['France', 'Atlantis'], 'key', base_url=url, limiter=limiter, metrics=metrics)
+
+        summary = metrics.summary()
+        assert summary['requests'] == 2
+        assert summary['retries'] == 2
+        assert summary['status_counts'] == {'200': 2}
+        assert summary['bytes_received'] == len(json.dumps(make_payload('France'))) + len('{}')
+        assert sum(summary['latency_histogram'].values()) == 2
+
+    def test_wire_bytes_counts_compressed_body(self):
+        """Gzip responses are measured by their transferred size, not the decoded body"""
+        body = gzip.compress(json.dumps(make_payload('France')).encode() * 20)
+        response = requests.Response()
+        response.headers['Content-Encoding'] = 'gzip'
+        response.raw = urllib3.HTTPResponse(
+            body=io.BytesIO(body), headers={'Content-Encoding': 'gzip'}, preload_content=False
+        )
+
+        assert wire_bytes(response) == len(body) < len(response.content)
+        response.headers['Content-Length'] = str(len(body))
+        assert wire_bytes(response) == len(body)
+
+    def test_cache_hits_are_counted_separately(self, api_server, tmp_path):
+        """Cache hits show up in the counts but not in the network latency histogram"""
+        url = api_server()
+        metrics = PipelineMetrics()
+
+        with ResponseCache(tmp_path / 'cache.sqlite') as cache:
+            for _ in range(2):
+                get_population_data_for_country('France', 'key', base_url=url, cache=cache, metrics=metrics)
+
+        summary = metrics.summary()
+        assert summary['cache_hits'] == 1
+        assert summary['status_counts'] == {'200': 1, 'cache': 1}
+        assert sum(summary['latency_histogram'].values()) == 1
+
+    def test_offline_misses_are_not_counted_as_errors(self, tmp_path):
+        """A cold cache in offline mode is reported as 'offline', outside the network latencies"""
+        metrics = PipelineMetrics()
+
+        with ResponseCache(tmp_path / 'cache.sqlite', offline=True) as cache:
+            data = get_population_data_for_country('France', 'key', cache=cache, metrics=metrics)
+
+        summary = metrics.summary()
+        assert data is None
+        assert summary['requests'] == 1
+        assert summary['status_counts'] == {'offline': 1}
+        assert sum(summary['latency_histogram'].values()) == 0
+
+    def test_events_are_written_as_json_lines(self, tmp_path):
+        """Requests and stages are appended to the events file one JSON object per line"""
+        path = tmp_path / 'metrics.jsonl'
+
+        with PipelineMetrics(path) as metrics:
+            with metrics.stage('compute'):
+                metrics.record_request('France', 0.2, status=503, retries=5)
+
+        events = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [e['event'] for e in events] == ['request', 'stage']
+        assert events[0]['status'] == 503
+        assert events[1]['stage'] == 'compute'
+        assert metrics.stage_seconds['compute'] >= 0
+        assert '503=1' in metrics.summary_table()
+
+
+class TestBenchmarkHarness:
+    def test_mock_api_serves_deterministic_payloads(self):
+        """The mock answers any country with the same synthetic history every time"""
+        with MockApiServer(n_years=10) as server:
+            data = get_population_data_for_country('Region 7', 'key', base_url=server.url)
+
+        assert data == mock_payload('Region 7', 10)
+        assert len(data['historical_population']) == 10
+
+    def test_mock_api_errors_and_throttling_are_retried(self):
+        """Injected 429s and 503s cost retries but every country still arrives"""
+        countries = [f"Region {i}" for i in range(20)]
+        limiter = RateLimiter(rate=1000, max_retries=10, backoff_base=0.001)
+
+        with MockApiServer(error_rate=0.2, throttle_rate=0.2, seed=1) as server:
+            df = fetch_all_country_data(countries, 'key', max_workers=4, base_url=server.url, limiter=limiter)
+
+        assert df['country'].nunique() == 20
+        assert server.status_counts[200] == 20
+        assert server.status_counts[429] > 0 and server.status_counts[503] > 0
+
+    def test_bench_pipeline_times_every_stage(self):
+        """Each size reports fetch, compute, render and write timings"""
+        results = bench_pipeline([5, 10], workers=2, n_years=5, repeat=1)
+
+        assert len(results) == 14
+        assert set(results['stage']) >= {'fetch', 'fractions', 'create_map', 'write_html', 'write_csv'}
+        assert (results['seconds'] > 0).all()
+
+    def test_regressions_are_flagged_against_the_baseline(self, tmp_path):
+        """Stages slower than baseline by more than the tolerance are reported"""
+        path = tmp_path / 'baseline.json'
+        assert load_baseline(path) is None
+        baseline = pd.DataFrame({'stage': ['fetch', 'fractions'], 'countries': [200, 200], 'seconds': [1.0, 0.1]})
+        save_baseline(baseline, path)
+        results = baseline.assign(seconds=[1.1, 0.2])
+
+        comparison = compare_to_baseline(results, load_baseline(path), tolerance=0.25)
+
+        assert comparison.set_index('stage')['regression'].to_dict() == {'fetch': False, 'fractions': True}
+
+
+class TestCheckpointedFetch:
+    def test_interrupted_run_resumes_without_refetching(self, api_server, tmp_path):
+        """Countries journaled before a crash are not requested again on resume"""
+        url = api_server()
+        countries = ['France', 'Japan', 'Chile', 'Peru', 'Kenya']
+        path = tmp_path / 'journal.jsonl'
+
+        with FetchJournal(path) as journal:
+            for _ in iter_country_data(countries, 'key', base_url=url, journal=journal):
+                break  # the process dies after the first result
+        done = set(FetchJournal(path).completed)
+
+        with FetchJournal(path, resume=True) as journal:
+            df = fetch_all_country_data(countries, 'key', base_url=url, journal=journal)
+
+        assert 0 < len(done) < len(countries)
+        assert list(df['query'].unique()) == countries
+        assert api_server.hits == {c: 1 for c in countries}
+
+    def test_resumed_payloads_keep_their_fetch_time(self, api_server, tmp_path):
+        """A resumed country comes back exactly as it was first fetched"""
+        url = api_server()
+        path = tmp_path / 'journal.jsonl'
+        with FetchJournal(path) as journal:
+            first = fetch_all_country_data(['France'], 'key', base_url=url, journal=journal)
+        with FetchJournal(path) as journal:
+            resumed = fetch_all_country_data(['France'], 'key', base_url=url, journal=journal)
+
+        pd.testing.assert_frame_equal(first, resumed)
+
+    def test_torn_last_entry_is_dropped(self, api_server, tmp_path):
+        """A line cut short by a crash is discarded and later entries append cleanly"""
+        url = api_server()
+        path = tmp_path / 'journal.jsonl'
+        with FetchJournal(path) as journal:
+            fetch_all_country_data(['France'], 'key', base_url=url, journal=journal)
+        with open(path, 'ab') as f:
+            f.write(b'{"query": "Jap')
+
+        with FetchJournal(path) as journal:
+            assert set(journal.completed) == {'France'}
+            fetch_all_country_data(['France', 'Japan'], 'key', base_url=url, journal=journal)
+
+        assert set(FetchJournal(path).completed) == {'France', 'Japan'}
+        assert api_server.hits == {'France': 1, 'Japan': 1}
+
+    def test_fresh_journal_discards_previous_entries(self, api_server, tmp_path):
+        """Without resume a new run starts from an empty journal"""
+        url = api_server()
+        path = tmp_path / 'journal.jsonl'
+        with FetchJournal(path) as journal:
+            fetch_all_country_data(['France'], 'key', base_url=url, journal=journal)
+
+        with FetchJournal(path, resume=False) as journal:
+            assert len(journal) == 0
+            fetch_all_country_data(['France'], 'key', base_url=url, journal=journal)
+
+        assert api_server.hits == {'France': 2}